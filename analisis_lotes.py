@@ -0,0 +1,287 @@
+# analisis_lotes.py
+
+"""
+Análisis por lotes (sin GUI) de videos de ejercicios grabados.
+
+Cada archivo se procesa en su propio proceso de trabajo con su propia
+instancia de mp_pose.Pose, usando el mismo pipeline que la GUI:
+detectar_codo/detectar_rodilla -> obtener_rango_ejercicio -> conteo de
+repeticiones y series.
+
+Uso:
+    python analisis_lotes.py videos/ --salida resultados/ --ejercicio 2 --lado der
+"""
+
+import argparse
+import json
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import cv2
+import mediapipe as mp
+import numpy as np
+
+from contador import ContadorRepeticiones
+from pose_utils import (
+    NOMBRES_ARTICULACIONES,
+    articulacion_ejercicio,
+    calcular_angulos_articulaciones,
+    feedback_ejercicio,
+    landmarks_a_array,
+    obtener_rango_ejercicio,
+)
+from reglas import obtener_ejercicio
+
+mp_pose = mp.solutions.pose
+
+EXTENSIONES_VIDEO = (".mp4", ".avi", ".mov", ".mkv", ".webm")
+
+# Frames por bloque para el cálculo vectorizado de ángulos
+TAM_BLOQUE = 256
+
+
+def listar_videos(directorio, extensiones=EXTENSIONES_VIDEO):
+    """
+    Devuelve las rutas (ordenadas) de los videos dentro de 'directorio'.
+    """
+    return sorted(
+        os.path.join(directorio, nombre)
+        for nombre in os.listdir(directorio)
+        if nombre.lower().endswith(extensiones)
+    )
+
+
+def analizar_video(ruta, ejercicio, lado, target_reps, target_series, model_complexity=1,
+                   tam_bloque=TAM_BLOQUE, reglas=None):
+    """
+    Procesa un video completo y devuelve un diccionario con el resumen:
+    repeticiones/series, estadísticas de cada articulación, conteo de
+    mensajes de feedback y rendimiento (frames por segundo de proceso).
+
+    Los landmarks se acumulan en bloques de 'tam_bloque' frames y los ángulos
+    de todas las articulaciones se calculan por bloque con una sola llamada a
+    calcular_angulos_articulaciones.
+
+    Con 'reglas' (nombre de un ejercicio de reglas.EJERCICIOS) además se
+    evalúan todas sus reglas por bloque y se informa el cumplimiento de cada una.
+    """
+    # Un solo hilo de OpenCV por proceso: el paralelismo lo da el pool
+    cv2.setNumThreads(1)
+
+    cap = cv2.VideoCapture(ruta)
+    if not cap.isOpened():
+        return {"archivo": ruta, "error": "No se pudo abrir el video"}
+
+    fps_video = cap.get(cv2.CAP_PROP_FPS) or 30.0
+    ang_min, ang_max = obtener_rango_ejercicio(ejercicio, lado)
+    columna = NOMBRES_ARTICULACIONES.index(articulacion_ejercicio(ejercicio, lado))
+    contador = ContadorRepeticiones(target_reps, target_series)
+    contador.iniciar(0.0)
+
+    n_art = len(NOMBRES_ARTICULACIONES)
+    visibles = np.zeros(n_art, dtype=np.int64)
+    sumas = np.zeros(n_art)
+    minimos = np.full(n_art, np.inf)
+    maximos = np.full(n_art, -np.inf)
+    feedback = {}
+
+    conjunto = obtener_ejercicio(reglas) if reglas else None
+    if conjunto is not None:
+        evaluadas = np.zeros(len(conjunto.nombres), dtype=np.int64)
+        cumplidas = np.zeros(len(conjunto.nombres), dtype=np.int64)
+        correctos = np.zeros(1, dtype=np.int64)
+
+    # Frames sin pose quedan con visibilidad 0 -> ángulo NaN (no visible)
+    bloque = np.zeros((tam_bloque, 33, 4), dtype=np.float32)
+    frames = 0
+
+    def procesar_bloque(n, primer_frame):
+        angulos = calcular_angulos_articulaciones(bloque[:n])
+        validos = ~np.isnan(angulos)
+        visibles[:] += validos.sum(axis=0)
+        sumas[:] += np.where(validos, angulos, 0.0).sum(axis=0)
+        minimos[:] = np.minimum(minimos, np.where(validos, angulos, np.inf).min(axis=0))
+        maximos[:] = np.maximum(maximos, np.where(validos, angulos, -np.inf).max(axis=0))
+
+        if conjunto is not None:
+            resultado = conjunto.evaluar(bloque[:n])
+            evaluadas[:] += resultado.visibles.sum(axis=0)
+            cumplidas[:] += resultado.cumple.sum(axis=0)
+            correctos[:] += resultado.correcto.sum()
+
+        # El conteo es secuencial, pero ya no hay trabajo por articulación
+        for i, valor in enumerate(angulos[:, columna]):
+            angulo = None if np.isnan(valor) else valor
+            texto, _ = feedback_ejercicio(angulo, ang_min, ang_max)
+            feedback[texto] = feedback.get(texto, 0) + 1
+            # Tiempo dentro del video: mismo papel que time.time() en vivo
+            contador.actualizar(angulo, ang_min, ang_max, (primer_frame + i) / fps_video)
+
+    t0 = time.perf_counter()
+    with mp_pose.Pose(
+        model_complexity=model_complexity,
+        min_detection_confidence=0.5,
+        min_tracking_confidence=0.5
+    ) as pose:
+        n = 0
+        while True:
+            ret, frame = cap.read()
+            if not ret:
+                break
+
+            resultados = pose.process(cv2.cvtColor(frame, cv2.COLOR_BGR2RGB))
+            if resultados.pose_landmarks:
+                bloque[n] = landmarks_a_array(resultados.pose_landmarks.landmark)
+            else:
+                bloque[n] = 0.0
+            n += 1
+            frames += 1
+
+            if n == tam_bloque:
+                procesar_bloque(n, frames - n)
+                n = 0
+        if n:
+            procesar_bloque(n, frames - n)
+    cap.release()
+    t_proceso = time.perf_counter() - t0
+
+    articulaciones = {}
+    for j, nombre in enumerate(NOMBRES_ARTICULACIONES):
+        articulaciones[nombre] = {
+            "frames_visibles": int(visibles[j]),
+            "angulo_medio": float(sumas[j] / visibles[j]) if visibles[j] else None,
+            "angulo_min": float(minimos[j]) if visibles[j] else None,
+            "angulo_max": float(maximos[j]) if visibles[j] else None,
+        }
+
+    resumen = {
+        "archivo": ruta,
+        "ejercicio": ejercicio,
+        "lado": lado,
+        "articulacion": NOMBRES_ARTICULACIONES[columna],
+        "rango": [ang_min, ang_max],
+        "frames": frames,
+        "frames_visibles": int(visibles[columna]),
+        "duracion_video": frames / fps_video,
+        "tiempo_proceso": t_proceso,
+        "fps_proceso": frames / t_proceso if t_proceso > 0 else 0.0,
+        "articulaciones": articulaciones,
+        "feedback": feedback,
+    }
+    if conjunto is not None:
+        resumen["reglas"] = {
+            "ejercicio": reglas,
+            "frames_correctos": int(correctos[0]),
+            "por_regla": {
+                nombre: {
+                    "frames_evaluados": int(evaluadas[r]),
+                    "frames_cumple": int(cumplidas[r]),
+                    "cumplimiento": float(cumplidas[r] / evaluadas[r]) if evaluadas[r] else None,
+                }
+                for r, nombre in enumerate(conjunto.nombres)
+            },
+        }
+    resumen.update(contador.resumen())
+    return resumen
+
+
+def _nombre_resumen(ruta):
+    return os.path.splitext(os.path.basename(ruta))[0] + ".json"
+
+
+def analizar_directorio(directorio, salida, ejercicio=1, lado="izq", target_reps=10,
+                        target_series=3, procesos=None, model_complexity=1, reglas=None):
+    """
+    Analiza todos los videos de 'directorio' repartiéndolos en un pool de
+    procesos (un archivo por tarea). Escribe un JSON por archivo en 'salida'
+    más un 'resumen.json' global, y devuelve ese resumen global.
+    """
+    videos = listar_videos(directorio)
+    procesos = procesos or os.cpu_count() or 1
+    procesos = max(1, min(procesos, len(videos) or 1))
+    os.makedirs(salida, exist_ok=True)
+
+    resultados = []
+    t0 = time.perf_counter()
+    # 'spawn': cada worker arranca limpio y crea su propio grafo de MediaPipe
+    contexto = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=procesos, mp_context=contexto) as pool:
+        futuros = {
+            pool.submit(analizar_video, ruta, ejercicio, lado, target_reps, target_series, model_complexity,
+                        reglas=reglas): ruta
+            for ruta in videos
+        }
+        for futuro in as_completed(futuros):
+            ruta = futuros[futuro]
+            try:
+                resumen = futuro.result()
+            except Exception as e:
+                resumen = {"archivo": ruta, "error": str(e)}
+            with open(os.path.join(salida, _nombre_resumen(ruta)), "w", encoding="utf-8") as f:
+                json.dump(resumen, f, ensure_ascii=False, indent=2)
+            resultados.append(resumen)
+            print(f"[{len(resultados)}/{len(videos)}] {os.path.basename(ruta)}: "
+                  f"{resumen.get('reps_totales', '-')} reps, {resumen.get('fps_proceso', 0):.1f} fps")
+    t_total = time.perf_counter() - t0
+
+    frames_totales = sum(r.get("frames", 0) for r in resultados)
+    fps_total = frames_totales / t_total if t_total > 0 else 0.0
+    global_ = {
+        "directorio": directorio,
+        "archivos": len(videos),
+        "errores": sum(1 for r in resultados if "error" in r),
+        "procesos": procesos,
+        "frames_totales": frames_totales,
+        "tiempo_total": t_total,
+        "fps_total": fps_total,
+        "fps_por_nucleo": fps_total / procesos,
+        "resultados": sorted(resultados, key=lambda r: r["archivo"]),
+    }
+    with open(os.path.join(salida, "resumen.json"), "w", encoding="utf-8") as f:
+        json.dump(global_, f, ensure_ascii=False, indent=2)
+    return global_
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Análisis por lotes de videos de ejercicios.")
+    parser.add_argument("directorio", help="Directorio con los videos a analizar")
+    parser.add_argument("--salida", default="resultados", help="Directorio para los resúmenes JSON")
+    parser.add_argument("--ejercicio", type=int, choices=(1, 2), default=1,
+                        help="1 = parte superior (codo), 2 = parte inferior (rodilla)")
+    parser.add_argument("--lado", choices=("izq", "der"), default="izq")
+    parser.add_argument("--reps", type=int, default=10, help="Repeticiones por serie")
+    parser.add_argument("--series", type=int, default=3, help="Número de series")
+    parser.add_argument("--procesos", type=int, default=None, help="Procesos de trabajo (por defecto: núcleos)")
+    parser.add_argument("--complejidad", type=int, choices=(0, 1, 2), default=1,
+                        help="model_complexity de MediaPipe Pose")
+    parser.add_argument("--reglas", default=None,
+                        help="Ejercicio de reglas.py cuyas reglas se evalúan (p. ej. sentadilla)")
+    args = parser.parse_args(argv)
+    if args.reglas:
+        try:
+            obtener_ejercicio(args.reglas)
+        except ValueError as e:
+            parser.error(str(e))
+
+    resumen = analizar_directorio(
+        args.directorio,
+        args.salida,
+        ejercicio=args.ejercicio,
+        lado=args.lado,
+        target_reps=args.reps,
+        target_series=args.series,
+        procesos=args.procesos,
+        model_complexity=args.complejidad,
+        reglas=args.reglas,
+    )
+    print(
+        f"{resumen['archivos']} archivos, {resumen['frames_totales']} frames en "
+        f"{resumen['tiempo_total']:.1f} s -> {resumen['fps_total']:.1f} fps "
+        f"({resumen['fps_por_nucleo']:.1f} fps/núcleo, {resumen['procesos']} procesos)"
+    )
+
+
+if __name__ == "__main__":
+    main()
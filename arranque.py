@@ -0,0 +1,99 @@
+# arranque.py
+
+import builtins
+import json
+import sys
+import threading
+import time
+from contextlib import contextmanager
+
+# Referencia de tiempo: importar este módulo lo antes posible (primera línea de main.py)
+T0 = time.perf_counter()
+
+_lock = threading.Lock()
+_registros = []     # (nombre, segundos, hilo)
+_hitos = []         # (nombre, segundos desde T0)
+
+
+def registrar(nombre, segundos):
+    with _lock:
+        _registros.append((nombre, segundos, threading.current_thread().name))
+
+
+def marcar(nombre):
+    """
+    Registra un hito (p. ej. "ventana visible") en segundos desde T0.
+    """
+    with _lock:
+        _hitos.append((nombre, time.perf_counter() - T0))
+
+
+@contextmanager
+def medir(nombre):
+    t0 = time.perf_counter()
+    try:
+        yield
+    finally:
+        registrar(nombre, time.perf_counter() - t0)
+
+
+@contextmanager
+def medir_importaciones(max_profundidad=2):
+    """
+    Mide cada import de un módulo aún no cargado hecho dentro del bloque, en
+    el hilo actual, hasta 'max_profundidad' niveles de anidamiento (los
+    anidados aparecen sangrados en el reporte). El tiempo de cada import
+    incluye el de sus dependencias, como la columna "cumulative" de
+    'python -X importtime'.
+    """
+    original = builtins.__import__
+    hilo = threading.get_ident()
+    profundidad = [0]
+
+    def importar(nombre, globals=None, locals=None, fromlist=(), level=0):
+        if threading.get_ident() != hilo or level or nombre in sys.modules:
+            return original(nombre, globals, locals, fromlist, level)
+        nivel = profundidad[0]
+        profundidad[0] += 1
+        t0 = time.perf_counter()
+        try:
+            return original(nombre, globals, locals, fromlist, level)
+        finally:
+            profundidad[0] -= 1
+            if nivel < max_profundidad:
+                registrar(f"{'  ' * nivel}import {nombre}", time.perf_counter() - t0)
+
+    builtins.__import__ = importar
+    try:
+        yield
+    finally:
+        builtins.__import__ = original
+
+
+def reporte():
+    """
+    Diccionario con todas las mediciones y los hitos de arranque.
+    """
+    with _lock:
+        return {
+            "mediciones": [
+                {"nombre": nombre, "ms": segundos * 1000, "hilo": hilo}
+                for nombre, segundos, hilo in _registros
+            ],
+            "hitos": [{"nombre": nombre, "ms": segundos * 1000} for nombre, segundos in _hitos],
+        }
+
+
+def texto_reporte():
+    datos = reporte()
+    lineas = ["Reporte de arranque:"]
+    for m in datos["mediciones"]:
+        lineas.append(f"  {m['nombre']:<40} {m['ms']:8.1f} ms  [{m['hilo']}]")
+    for h in datos["hitos"]:
+        lineas.append(f"  -> {h['nombre']:<37} {h['ms']:8.1f} ms desde el inicio")
+    return "\n".join(lineas)
+
+
+def guardar_reporte(ruta):
+    with open(ruta, "w", encoding="utf-8") as f:
+        json.dump(reporte(), f, ensure_ascii=False, indent=2)
@@ -0,0 +1,316 @@
+# autoajuste.py
+
+import json
+import threading
+import time
+from collections import deque
+
+import cv2
+import numpy as np
+
+from modelo import ModeloPose
+from pipeline import reducir_frame
+
+
+class NivelCalidad:
+    """
+    Una configuración del pipeline: complejidad del modelo (0/1/2), lado
+    mayor de la imagen que recibe el modelo y tamaño pedido a la cámara.
+    """
+    __slots__ = ("model_complexity", "resolucion", "captura")
+
+    def __init__(self, model_complexity, resolucion, captura):
+        self.model_complexity = model_complexity
+        self.resolucion = resolucion
+        self.captura = captura
+
+    def a_dict(self):
+        return {
+            "model_complexity": self.model_complexity,
+            "resolucion": self.resolucion,
+            "captura": list(self.captura),
+        }
+
+    def descripcion(self):
+        return f"modelo {self.model_complexity}, {self.resolucion} px, cámara {self.captura[0]}x{self.captura[1]}"
+
+
+# Escalera de calidad, de la más barata a la más cara
+NIVELES = (
+    NivelCalidad(0, 256, (640, 480)),
+    NivelCalidad(0, 384, (640, 480)),
+    NivelCalidad(1, 384, (640, 480)),
+    NivelCalidad(1, 640, (640, 480)),
+    NivelCalidad(1, 960, (1280, 720)),
+    NivelCalidad(2, 960, (1280, 720)),
+)
+# Equivale a lo que hacía la app con una cámara de 640x480
+NIVEL_INICIAL = 3
+
+
+def _muestras_desde(buffer, desde):
+    """
+    Muestras de un BufferCircular agregadas desde que su total valía
+    'desde' (las que sigan en el buffer), en orden cronológico.
+    """
+    total = buffer.total
+    n = min(total - desde, buffer.capacidad)
+    if n <= 0:
+        return np.empty(0)
+    return buffer.datos[np.arange(total - n, total) % buffer.capacidad]
+
+
+class AutoAjuste:
+    """
+    Mantiene la latencia captura -> pantalla de un PipelinePose por debajo
+    de 'objetivo_ms' eligiendo un nivel de la escalera NIVELES.
+
+    - Al arrancar, calibrar_en_segundo_plano() mide el costo de inferencia
+      de cada nivel sobre un frame real y elige el más caro cuya latencia
+      estimada (costo + sobrecarga medida del pipeline) entra en
+      'margen_subida' del objetivo.
+    - Después, evaluar() (llamado desde el hilo de Tk) mira el p95 de la
+      latencia medida desde el último cambio: si supera el objetivo baja un
+      nivel; si durante 'estable_s' segundos la latencia estimada del nivel
+      siguiente entra en 'margen_subida' del objetivo, sube uno. Tras una
+      bajada, el nivel del que se bajó queda bloqueado 'bloqueo_s' segundos
+      para no oscilar.
+
+    Cada decisión se guarda en 'decisiones' y, con 'ruta_registro', como
+    una línea JSON en ese archivo.
+    """
+
+    def __init__(self, pipeline, objetivo_ms=100.0, niveles=NIVELES, nivel=NIVEL_INICIAL, modelos=None,
+                 fabrica_modelo=ModeloPose, opciones=None, muestras_min=30, ventana=120, enfriamiento=2.0,
+                 estable_s=10.0, margen_subida=0.7, bloqueo_s=60.0, ruta_registro=None, max_decisiones=200):
+        self.pipeline = pipeline
+        self.objetivo = objetivo_ms / 1000.0
+        self.niveles = niveles
+        # Un modelo por complejidad; se puede compartir entre capturas
+        self.modelos = modelos if modelos is not None else {}
+        self.fabrica_modelo = fabrica_modelo    # ModeloPose o ModeloPoseProceso
+        self.opciones = opciones or {"min_detection_confidence": 0.5, "min_tracking_confidence": 0.5}
+        self.muestras_min = muestras_min
+        self.ventana = ventana
+        self.enfriamiento = enfriamiento
+        self.estable_s = estable_s
+        self.margen_subida = margen_subida
+        self.bloqueo_s = bloqueo_s
+        self.ruta_registro = ruta_registro
+        self.decisiones = deque(maxlen=max_decisiones)
+        self.error = None
+
+        self.costos = {}                # Índice de nivel -> segundos de inferencia (calibración)
+        self.no_disponibles = set()     # Complejidades cuyo modelo no se pudo cargar
+        self.calibrando = False
+        self.calibracion_fallida = False    # Ningún nivel se pudo medir: no se reintenta
+        self._calibrado = None          # Nivel elegido por el hilo de calibración, para aplicar en evaluar()
+
+        self.nivel = None
+        self._marca = 0
+        self._t_cambio = 0.0
+        self._t_holgado = None
+        self._techo = None
+        self._techo_hasta = 0.0
+        self.aplicar(min(nivel, len(niveles) - 1), "inicial")
+
+    # — Niveles —
+
+    def _modelo(self, complejidad):
+        modelo = self.modelos.get(complejidad)
+        if modelo is None:
+            modelo = self.modelos[complejidad] = self.fabrica_modelo(model_complexity=complejidad, **self.opciones)
+            modelo.cargar_en_segundo_plano()
+        return modelo
+
+    def _disponible(self, indice):
+        return self.niveles[indice].model_complexity not in self.no_disponibles
+
+    def _vecino(self, paso):
+        indice = self.nivel + paso
+        while 0 <= indice < len(self.niveles):
+            if self._disponible(indice):
+                return indice
+            indice += paso
+        return None
+
+    def aplicar(self, indice, motivo, p95=None, **extra):
+        anterior = self.nivel
+        self.nivel = indice
+        nivel = self.niveles[indice]
+        self.pipeline.configurar(
+            modelo=self._modelo(nivel.model_complexity),
+            resolucion=nivel.resolucion,
+            captura=nivel.captura
+        )
+        self._reiniciar_medicion(time.monotonic())
+        self._registrar({
+            "t": time.time(),
+            "de": anterior,
+            "a": indice,
+            "nivel": nivel.a_dict(),
+            "motivo": motivo,
+            "p95_ms": None if p95 is None else p95 * 1000.0,
+            "objetivo_ms": self.objetivo * 1000.0,
+            **extra,
+        })
+
+    def _reiniciar_medicion(self, ahora):
+        # Solo cuentan las latencias medidas con la configuración nueva
+        self._marca = self.pipeline.metricas.buffers["latencia"].total
+        self._t_cambio = ahora
+        self._t_holgado = None
+
+    def _registrar(self, decision):
+        self.decisiones.append(decision)
+        if self.ruta_registro:
+            try:
+                with open(self.ruta_registro, "a", encoding="utf-8") as f:
+                    f.write(json.dumps(decision, ensure_ascii=False) + "\n")
+            except OSError as e:
+                self.error = e
+
+    # — Calibración —
+
+    @property
+    def necesita_calibracion(self):
+        return not (self.calibrando or self.costos or self.calibracion_fallida)
+
+    def calibrar_en_segundo_plano(self, frame_rgb, repeticiones=5):
+        """
+        Mide en un hilo aparte el costo de cada nivel sobre 'frame_rgb' (un
+        frame real de la cámara). Usa sus propias instancias de Pose, así no
+        toca la del pipeline; compite por la CPU con la captura en curso,
+        por lo que los costos salen algo pesimistas.
+        """
+        if not self.necesita_calibracion:
+            return
+        self.calibrando = True
+        threading.Thread(target=self._calibrar, args=(frame_rgb, repeticiones),
+                         name="calibracion-autoajuste", daemon=True).start()
+
+    def _calibrar(self, frame_rgb, repeticiones):
+        costos = {}
+        try:
+            self._medir_costos(frame_rgb, repeticiones, costos)
+        except Exception as e:
+            self.error = e
+        finally:
+            self.costos = costos
+            if costos:
+                sobrecarga = self._sobrecarga()
+                entran = [i for i, c in costos.items() if c + sobrecarga <= self.margen_subida * self.objetivo]
+                self._calibrado = max(entran) if entran else min(costos)
+            else:
+                # Sin ningún costo se volvería a calibrar con cada frame
+                self.calibracion_fallida = True
+            self.calibrando = False
+
+    def _medir_costos(self, frame_rgb, repeticiones, costos):
+        import mediapipe as mp
+
+        for complejidad in sorted({n.model_complexity for n in self.niveles}):
+            try:
+                pose = mp.solutions.pose.Pose(model_complexity=complejidad, **self.opciones)
+            except Exception:
+                # P. ej. el modelo de esa complejidad no se pudo descargar
+                self.no_disponibles.add(complejidad)
+                continue
+            try:
+                for i, nivel in enumerate(self.niveles):
+                    if nivel.model_complexity != complejidad:
+                        continue
+                    entrada = reducir_frame(cv2.resize(frame_rgb, nivel.captura), nivel.resolucion)
+                    pose.process(entrada)   # La primera corre el detector: no se mide
+                    tiempos = []
+                    for _ in range(repeticiones):
+                        t0 = time.perf_counter()
+                        pose.process(entrada)
+                        tiempos.append(time.perf_counter() - t0)
+                    costos[i] = float(np.median(tiempos))
+            finally:
+                pose.close()
+
+    def _sobrecarga(self):
+        """
+        Latencia que no es inferencia (espera en colas, conversión, dibujo,
+        render), medida en el pipeline.
+        """
+        metricas = self.pipeline.metricas
+        return max(0.0, metricas.media("latencia") - metricas.media("inferencia"))
+
+    # — Ajuste continuo —
+
+    def _estimar(self, p95, indice):
+        """
+        Latencia estimada en el nivel 'indice' a partir del p95 actual.
+        """
+        actual, otro = self.costos.get(self.nivel), self.costos.get(indice)
+        if actual is not None and otro is not None:
+            return p95 - actual + otro
+        return 2.0 * p95    # Sin calibración: solo se sube con mucha holgura
+
+    def evaluar(self, ahora=None):
+        """
+        Revisa la latencia y cambia de nivel si hace falta. Devuelve la
+        decisión tomada o None.
+        """
+        ahora = time.monotonic() if ahora is None else ahora
+
+        if self._calibrado is not None:
+            indice, self._calibrado = self._calibrado, None
+            costos_ms = {str(i): c * 1000.0 for i, c in sorted(self.costos.items())}
+            self.aplicar(indice, "calibración", costos_ms=costos_ms)
+            return self.decisiones[-1]
+
+        complejidad = self.niveles[self.nivel].model_complexity
+        modelo = self.modelos.get(complejidad)
+        if modelo is not None and modelo.listo and modelo.error is not None:
+            self.no_disponibles.add(complejidad)
+            indice = self._vecino(-1)
+            if indice is None:
+                indice = self._vecino(+1)
+            if indice is not None:
+                self.aplicar(indice, f"modelo {complejidad} no disponible")
+                return self.decisiones[-1]
+            return None
+
+        if self.pipeline.cambiando:
+            # Modelo cargándose o cámara cambiando de tamaño: todavía no se mide
+            self._reiniciar_medicion(ahora)
+            return None
+        if ahora - self._t_cambio < self.enfriamiento:
+            return None
+
+        buffer = self.pipeline.metricas.buffers["latencia"]
+        latencias = _muestras_desde(buffer, max(self._marca, buffer.total - self.ventana))
+        if len(latencias) < self.muestras_min:
+            return None
+        p95 = float(np.percentile(latencias, 95))
+
+        if p95 > self.objetivo:
+            indice = self._vecino(-1)
+            if indice is None:
+                return None
+            self._techo = self.nivel
+            self._techo_hasta = ahora + self.bloqueo_s
+            self.aplicar(indice, "latencia sobre el objetivo", p95)
+            return self.decisiones[-1]
+
+        indice = self._vecino(+1)
+        bloqueado = self._techo is not None and indice is not None and indice >= self._techo and ahora < self._techo_hasta
+        if indice is None or bloqueado or self._estimar(p95, indice) > self.margen_subida * self.objetivo:
+            self._t_holgado = None
+            return None
+        if self._t_holgado is None:
+            self._t_holgado = ahora
+        if ahora - self._t_holgado < self.estable_s:
+            return None
+        self.aplicar(indice, "latencia holgada", p95)
+        return self.decisiones[-1]
+
+    def descripcion(self):
+        texto = f"{self.nivel + 1}/{len(self.niveles)} ({self.niveles[self.nivel].descripcion()})"
+        if self.calibracion_fallida:
+            return texto + " sin calibrar"
+        return texto + (" calibrando..." if self.calibrando else "")
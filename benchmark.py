@@ -0,0 +1,479 @@
+# benchmark.py
+
+"""
+Benchmark por etapas del pipeline de frames.
+
+Recorre un video (uno propio o uno sintético generado al vuelo) con las
+mismas etapas que la GUI y mide cada una por separado:
+
+    captura     cap.read()
+    conversion  cvtColor BGR -> RGB
+    inferencia  pose.process()
+    dibujo      dibujar_landmarks()
+    angulos     detectar_angulo()
+    render      RenderizadorPanel.mostrar() (sin Tk: resize + copia a PIL)
+
+Cada combinación de resolución y model_complexity corre en un proceso nuevo,
+así el pico de memoria (RSS) es el de esa combinación. El resultado es un
+JSON con p50/p95/p99 por etapa, FPS sostenidos y RSS máximo, y dos JSON se
+pueden comparar para detectar regresiones.
+
+Con --backends local proceso cada combinación se mide también con la
+inferencia en un proceso aparte (PoseEnProceso) y se imprime una tabla lado
+a lado; --carga-python agrega un hilo de Python puro (como Tk o matplotlib)
+que compite por el GIL durante la medición.
+
+Uso:
+    python benchmark.py --resoluciones 640x480 1280x720 --complejidades 0 1 2 --salida base.json
+    python benchmark.py --resoluciones 1280x720 --complejidades 1 --backends local proceso --carga-python
+    python benchmark.py --video sesion.mp4 --salida nuevo.json --comparar base.json
+    python benchmark.py --comparar base.json nuevo.json
+"""
+
+import argparse
+import json
+import os
+import platform
+import sys
+import tempfile
+import threading
+import time
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+
+import cv2
+import numpy as np
+
+VERSION_FORMATO = 1
+ETAPAS = ("captura", "conversion", "inferencia", "dibujo", "angulos", "render", "total")
+BACKENDS = ("local", "proceso")
+PERCENTILES = (50, 95, 99)
+
+# Métricas que se comparan entre corridas: (etapa, clave, mayor_es_mejor)
+METRICAS_COMPARADAS = [(etapa, "p50_ms", False) for etapa in ETAPAS] + \
+                      [(etapa, "p95_ms", False) for etapa in ETAPAS] + \
+                      [(None, "fps", True)]
+
+
+def rss_maximo_mb(hijos=False):
+    """
+    Pico de memoria residente del proceso en MB (None si el sistema no lo
+    expone). Con 'hijos', el del mayor proceso hijo ya terminado y esperado
+    (join), p. ej. el de PoseEnProceso después de close().
+    """
+    try:
+        import resource
+    except ImportError:
+        return None
+    pico = resource.getrusage(resource.RUSAGE_CHILDREN if hijos else resource.RUSAGE_SELF).ru_maxrss
+    # Linux lo informa en KB y macOS en bytes
+    return pico / (1024 * 1024) if sys.platform == "darwin" else pico / 1024
+
+
+# ————— Video sintético —————
+
+def frames_sinteticos(ancho, alto, frames=300, fps=30.0):
+    """
+    Genera frames BGR con una figura de palitos haciendo flexiones de codo,
+    a partir de los landmarks de reproduccion.generar_sintetico.
+    """
+    from pose_utils import CONEXIONES_POSE
+    from reproduccion import generar_sintetico
+
+    _, datos, _, _ = generar_sintetico(1, "izq", reps=int(frames / (2.0 * fps)) + 1, fps=fps)
+    fondo = np.empty((alto, ancho, 3), dtype=np.uint8)
+    fondo[:] = np.linspace(40, 90, alto, dtype=np.uint8)[:, None, None]
+    grosor = max(2, ancho // 80)
+    for i in range(frames):
+        frame = fondo.copy()
+        puntos = (datos[i, :, :2] * (ancho, alto)).astype(int)
+        for a, b in CONEXIONES_POSE:
+            cv2.line(frame, tuple(puntos[a]), tuple(puntos[b]), (220, 200, 180), grosor)
+        cv2.circle(frame, tuple(puntos[0]), grosor * 4, (220, 200, 180), -1)
+        yield frame
+
+
+def generar_video_sintetico(ruta, ancho, alto, frames=300, fps=30.0):
+    """
+    Escribe en 'ruta' el video de frames_sinteticos.
+    """
+    escritor = cv2.VideoWriter(ruta, cv2.VideoWriter_fourcc(*"MJPG"), fps, (ancho, alto))
+    if not escritor.isOpened():
+        raise RuntimeError(f"No se pudo crear el video sintético {ruta}")
+    for frame in frames_sinteticos(ancho, alto, frames, fps):
+        escritor.write(frame)
+    escritor.release()
+    return ruta
+
+
+# ————— Medición —————
+
+class _RenderSinTk:
+    """
+    Mismo trabajo por frame que RenderizadorPanel.mostrar() menos el paste
+    sobre el PhotoImage, para poder medir sin pantalla.
+    """
+
+    def __init__(self, ancho, alto):
+        from render import _imagen_en_bloque
+        self.tam = (ancho, alto)
+        self._buffer = np.empty((alto, ancho, 3), dtype=np.uint8)
+        self._imagen = _imagen_en_bloque(self.tam)
+
+    def mostrar(self, frame_rgb):
+        cv2.resize(frame_rgb, self.tam, dst=self._buffer, interpolation=cv2.INTER_LINEAR)
+        self._imagen.frombytes(self._buffer)
+
+
+def _crear_render(ancho, alto):
+    """
+    Devuelve (render, con_tk): un RenderizadorPanel real si hay pantalla, o
+    la versión sin Tk si no.
+    """
+    try:
+        import tkinter as tk
+        from render import RenderizadorPanel
+        root = tk.Tk()
+        root.withdraw()
+        canvas = tk.Canvas(root, width=ancho, height=alto)
+        render = RenderizadorPanel(canvas)
+        render.redimensionar(ancho, alto)
+        render._root = root
+        return render, True
+    except Exception:
+        return _RenderSinTk(ancho, alto), False
+
+
+def resumir_tiempos(segundos):
+    """
+    p50/p95/p99, media y máximo (en ms) de un array de duraciones en segundos.
+    """
+    ms = np.asarray(segundos) * 1000.0
+    if not len(ms):
+        return None
+    resumen = {f"p{p}_ms": float(v) for p, v in zip(PERCENTILES, np.percentile(ms, PERCENTILES))}
+    resumen["media_ms"] = float(ms.mean())
+    resumen["max_ms"] = float(ms.max())
+    return resumen
+
+
+def _carga_python(detener):
+    # Trabajo de Python puro que retiene el GIL, como el hilo de Tk
+    while not detener.is_set():
+        sum(i * i for i in range(10000))
+
+
+def medir_configuracion(ruta_video, resolucion, model_complexity, max_frames=300, calentamiento=10,
+                        ancho_panel=800, alto_panel=600, backend="local", carga_python=False):
+    """
+    Corre el pipeline sobre 'ruta_video' escalado a 'resolucion' (ancho, alto)
+    y devuelve el diccionario de resultados de esa combinación. Pensado para
+    ejecutarse en un proceso propio. 'backend' es "local" (mp_pose.Pose en
+    este proceso) o "proceso" (PoseEnProceso).
+    """
+    import mediapipe as mp
+    from pipeline import dibujar_landmarks
+    from pose_utils import LandmarkFrame, detectar_angulo
+    from reproduccion import generar_sintetico
+
+    ancho, alto = resolucion
+    resultado = {
+        "resolucion": f"{ancho}x{alto}",
+        "model_complexity": model_complexity,
+        "backend": backend,
+        "carga_python": carga_python,
+    }
+
+    opciones = {
+        "model_complexity": model_complexity,
+        "min_detection_confidence": 0.5,
+        "min_tracking_confidence": 0.5,
+    }
+    try:
+        if backend == "proceso":
+            from inferencia_proceso import PoseEnProceso
+            pose = PoseEnProceso(opciones)
+        else:
+            pose = mp.solutions.pose.Pose(**opciones)
+    except Exception as e:
+        resultado["error"] = f"No se pudo crear el modelo: {e}"
+        return resultado
+
+    cap = cv2.VideoCapture(ruta_video)
+    if not cap.isOpened():
+        resultado["error"] = f"No se pudo abrir el video {ruta_video}"
+        return resultado
+
+    # Si el modelo no detecta pose (p. ej. en la figura del video sintético),
+    # dibujo y ángulos se miden con estos landmarks para no quedar en cero
+    _, respaldo, _, _ = generar_sintetico(1, "izq", reps=1)
+
+    render, con_tk = _crear_render(ancho_panel, alto_panel)
+    tiempos = {etapa: np.empty(max_frames) for etapa in ETAPAS}
+    frames_con_pose = 0
+    n = 0
+    reloj = time.perf_counter
+
+    detener_carga = threading.Event()
+    if carga_python:
+        threading.Thread(target=_carga_python, args=(detener_carga,), daemon=True).start()
+
+    t_inicio = None
+    for i in range(max_frames + calentamiento):
+        t0 = reloj()
+        ret, frame = cap.read()
+        if not ret:
+            # Videos cortos se repiten hasta juntar los frames pedidos
+            cap.set(cv2.CAP_PROP_POS_FRAMES, 0)
+            t0 = reloj()
+            ret, frame = cap.read()
+            if not ret:
+                break
+        t1 = reloj()
+        t_escalado = t1
+        if frame.shape[1] != ancho or frame.shape[0] != alto:
+            # El escalado simula una cámara de esa resolución: no se mide
+            frame = cv2.resize(frame, (ancho, alto), interpolation=cv2.INTER_AREA)
+            t_escalado = reloj()
+        frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB, dst=frame)
+        t2 = reloj()
+        resultados = pose.process(frame)
+        t3 = reloj()
+        detectado = resultados.pose_landmarks is not None
+        if detectado:
+            landmarks = LandmarkFrame.desde_mediapipe(resultados.pose_landmarks.landmark, t0)
+        else:
+            landmarks = LandmarkFrame(respaldo[i % len(respaldo)], t0)
+        dibujar_landmarks(frame, landmarks)
+        t4 = reloj()
+        detectar_angulo(landmarks, 1, "izq")
+        t5 = reloj()
+        render.mostrar(frame)
+        t6 = reloj()
+
+        if i < calentamiento:
+            continue
+        if t_inicio is None:
+            t_inicio = t0
+        tiempos["captura"][n] = t1 - t0
+        tiempos["conversion"][n] = t2 - t_escalado
+        tiempos["inferencia"][n] = t3 - t2
+        tiempos["dibujo"][n] = t4 - t3
+        tiempos["angulos"][n] = t5 - t4
+        tiempos["render"][n] = t6 - t5
+        tiempos["total"][n] = t6 - t0 - (t_escalado - t1)
+        frames_con_pose += detectado
+        n += 1
+    t_fin = reloj()
+    detener_carga.set()
+
+    cap.release()
+    pose.close()
+    if con_tk:
+        render._root.destroy()
+
+    resultado["frames"] = n
+    resultado["frames_con_pose"] = frames_con_pose
+    resultado["fps"] = n / (t_fin - t_inicio) if n and t_fin > t_inicio else 0.0
+    resultado["render_tk"] = con_tk
+    resultado["rss_max_mb"] = rss_maximo_mb()
+    if backend == "proceso":
+        # El modelo y el grafo de MediaPipe viven en el proceso de inferencia
+        # (pose.close() ya lo esperó): se suma para comparar con "local"
+        rss_inferencia = rss_maximo_mb(hijos=True)
+        resultado["rss_inferencia_mb"] = rss_inferencia
+        if resultado["rss_max_mb"] is not None and rss_inferencia is not None:
+            resultado["rss_max_mb"] += rss_inferencia
+    resultado["etapas"] = {etapa: resumir_tiempos(tiempos[etapa][:n]) for etapa in ETAPAS}
+    return resultado
+
+
+def info_plataforma():
+    info = {
+        "python": platform.python_version(),
+        "sistema": platform.platform(),
+        "procesador": platform.processor() or platform.machine(),
+        "nucleos": os.cpu_count(),
+        "numpy": np.__version__,
+        "opencv": cv2.__version__,
+    }
+    try:
+        from importlib.metadata import version
+        info["mediapipe"] = version("mediapipe")
+    except Exception:
+        info["mediapipe"] = None
+    return info
+
+
+def ejecutar(resoluciones, complejidades, video=None, max_frames=300, calentamiento=10,
+             backends=("local",), carga_python=False):
+    """
+    Corre todas las combinaciones (cada una en un proceso nuevo) y devuelve
+    el documento de resultados.
+    """
+    contexto = multiprocessing.get_context("spawn")
+    resultados = []
+    with tempfile.TemporaryDirectory() as carpeta:
+        for ancho, alto in resoluciones:
+            ruta = video
+            if ruta is None:
+                ruta = generar_video_sintetico(
+                    os.path.join(carpeta, f"sintetico_{ancho}x{alto}.avi"), ancho, alto,
+                    frames=min(max_frames + calentamiento, 300)
+                )
+            for complejidad in complejidades:
+                for backend in backends:
+                    with ProcessPoolExecutor(max_workers=1, mp_context=contexto) as pool:
+                        resultado = pool.submit(
+                            medir_configuracion, ruta, (ancho, alto), complejidad, max_frames, calentamiento,
+                            backend=backend, carga_python=carga_python
+                        ).result()
+                    resultados.append(resultado)
+                    _imprimir_resultado(resultado)
+
+    if len(backends) > 1:
+        _imprimir_lado_a_lado(resultados)
+
+    return {
+        "version": VERSION_FORMATO,
+        "fecha": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "video": video or "sintetico",
+        "plataforma": info_plataforma(),
+        "resultados": resultados,
+    }
+
+
+def _imprimir_resultado(resultado):
+    nombre = f"{resultado['resolucion']} complejidad {resultado['model_complexity']} ({resultado['backend']})"
+    if "error" in resultado:
+        print(f"{nombre}: {resultado['error']}")
+        return
+    print(f"{nombre}: {resultado['fps']:.1f} FPS, RSS máx {resultado['rss_max_mb'] or 0:.0f} MB")
+    for etapa in ETAPAS:
+        stats = resultado["etapas"][etapa]
+        if stats is not None:
+            print(f"  {etapa:<11} p50 {stats['p50_ms']:8.2f} ms   p95 {stats['p95_ms']:8.2f} ms   "
+                  f"p99 {stats['p99_ms']:8.2f} ms")
+
+
+def _imprimir_lado_a_lado(resultados):
+    filas = {}
+    for r in resultados:
+        if "error" not in r:
+            filas.setdefault((r["resolucion"], r["model_complexity"]), {})[r["backend"]] = r
+    print()
+    print(f"{'combinación':<20} {'backend':<8} {'FPS':>7} {'inferencia p50':>15} {'total p95':>10} {'RSS máx':>9}")
+    for (resolucion, complejidad), por_backend in filas.items():
+        for backend, r in por_backend.items():
+            inferencia, total = r["etapas"]["inferencia"], r["etapas"]["total"]
+            print(f"{resolucion + ' c' + str(complejidad):<20} {backend:<8} {r['fps']:7.1f} "
+                  f"{inferencia['p50_ms']:12.2f} ms {total['p95_ms']:7.2f} ms {r['rss_max_mb'] or 0:6.0f} MB")
+
+
+# ————— Comparación —————
+
+def comparar(base, nuevo, tolerancia=0.10):
+    """
+    Compara dos documentos de resultados combinación por combinación.
+    Devuelve una lista de diferencias (dicts) con 'regresion' = True cuando
+    la métrica empeoró más que 'tolerancia' (fracción).
+    """
+    def clave(r):
+        # Los documentos anteriores a los backends son todos locales y sin carga
+        return r["resolucion"], r["model_complexity"], r.get("backend", "local"), r.get("carga_python", False)
+
+    previos = {clave(r): r for r in base["resultados"] if "error" not in r}
+    diferencias = []
+    for r in nuevo["resultados"]:
+        anterior = previos.get(clave(r))
+        if anterior is None or "error" in r:
+            continue
+        for etapa, metrica, mayor_es_mejor in METRICAS_COMPARADAS:
+            if etapa is None:
+                v0, v1 = anterior.get(metrica), r.get(metrica)
+            else:
+                e0, e1 = anterior["etapas"].get(etapa), r["etapas"].get(etapa)
+                if e0 is None or e1 is None:
+                    continue
+                v0, v1 = e0[metrica], e1[metrica]
+            if not v0 or v1 is None:
+                continue
+            cambio = (v1 - v0) / v0
+            empeoro = -cambio if mayor_es_mejor else cambio
+            diferencias.append({
+                "resolucion": r["resolucion"],
+                "model_complexity": r["model_complexity"],
+                "backend": r.get("backend", "local"),
+                "etapa": etapa,
+                "metrica": metrica,
+                "base": v0,
+                "nuevo": v1,
+                "cambio": cambio,
+                "regresion": empeoro > tolerancia,
+            })
+    return diferencias
+
+
+def _imprimir_comparacion(diferencias):
+    for d in diferencias:
+        nombre = (
+            f"{d['resolucion']} c{d['model_complexity']} {d['backend']} {d['etapa'] or ''} {d['metrica']}"
+        ).replace("  ", " ")
+        marca = "  REGRESIÓN" if d["regresion"] else ""
+        print(f"{nombre:<40} {d['base']:10.2f} -> {d['nuevo']:10.2f} ({d['cambio']:+.1%}){marca}")
+
+
+def _leer(ruta):
+    with open(ruta, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def _resolucion(texto):
+    try:
+        ancho, alto = texto.lower().split("x")
+        return int(ancho), int(alto)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"resolución inválida '{texto}' (use ANCHOxALTO)")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark por etapas del pipeline de frames.")
+    parser.add_argument("--video", default=None, help="Video de entrada (por defecto uno sintético)")
+    parser.add_argument("--resoluciones", type=_resolucion, nargs="+", default=[(640, 480), (1280, 720)],
+                        help="Resoluciones ANCHOxALTO")
+    parser.add_argument("--complejidades", type=int, nargs="+", choices=(0, 1, 2), default=[0, 1, 2],
+                        help="Valores de model_complexity")
+    parser.add_argument("--backends", nargs="+", choices=BACKENDS, default=["local"],
+                        help="Dónde corre la inferencia: en este proceso o en uno aparte")
+    parser.add_argument("--carga-python", action="store_true",
+                        help="Agrega un hilo de Python puro que compite por el GIL")
+    parser.add_argument("--frames", type=int, default=300, help="Frames medidos por combinación")
+    parser.add_argument("--calentamiento", type=int, default=10, help="Frames iniciales que no se miden")
+    parser.add_argument("--salida", default=None, help="Archivo JSON de resultados")
+    parser.add_argument("--comparar", nargs="+", metavar="JSON",
+                        help="BASE para comparar con esta corrida, o BASE NUEVO para comparar dos archivos")
+    parser.add_argument("--tolerancia", type=float, default=0.10, help="Empeoramiento tolerado (fracción)")
+    args = parser.parse_args(argv)
+
+    if args.comparar and len(args.comparar) > 2:
+        parser.error("--comparar acepta BASE o BASE NUEVO")
+
+    if args.comparar and len(args.comparar) == 2:
+        documento = _leer(args.comparar[1])
+    else:
+        documento = ejecutar(args.resoluciones, args.complejidades, args.video, args.frames, args.calentamiento,
+                             args.backends, args.carga_python)
+        if args.salida:
+            with open(args.salida, "w", encoding="utf-8") as f:
+                json.dump(documento, f, indent=2, ensure_ascii=False)
+
+    if args.comparar:
+        diferencias = comparar(_leer(args.comparar[0]), documento, args.tolerancia)
+        _imprimir_comparacion(diferencias)
+        # Código de salida distinto de cero para poder cortar una integración continua
+        return 1 if any(d["regresion"] for d in diferencias) else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
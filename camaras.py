@@ -0,0 +1,220 @@
+# camaras.py
+
+import glob
+import json
+import os
+import queue
+import threading
+import time
+
+import cv2
+
+RUTA_CACHE = os.path.join(os.path.expanduser("~"), ".feedbackbi_camaras.json")
+
+
+class InfoCamara:
+    """
+    Capacidades de una cámara detectada: índice, resolución, FPS y FOURCC.
+    """
+    __slots__ = ("indice", "ancho", "alto", "fps", "fourcc")
+
+    def __init__(self, indice, ancho, alto, fps, fourcc):
+        self.indice = indice
+        self.ancho = ancho
+        self.alto = alto
+        self.fps = fps
+        self.fourcc = fourcc
+
+    def a_dict(self):
+        return {nombre: getattr(self, nombre) for nombre in self.__slots__}
+
+    def descripcion(self):
+        return f"{self.ancho}x{self.alto} @ {self.fps:.0f} fps ({self.fourcc or '?'})"
+
+
+def _fourcc_texto(valor):
+    valor = int(valor)
+    texto = "".join(chr((valor >> (8 * i)) & 0xFF) for i in range(4))
+    return texto if texto.isprintable() else ""
+
+
+def sondear_camara(indice):
+    """
+    Abre la cámara 'indice', lee sus capacidades y la libera.
+    Devuelve un InfoCamara o None si no se pudo abrir.
+    """
+    cap = cv2.VideoCapture(indice)
+    try:
+        if not cap.isOpened():
+            return None
+        return InfoCamara(
+            indice,
+            int(cap.get(cv2.CAP_PROP_FRAME_WIDTH)),
+            int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT)),
+            float(cap.get(cv2.CAP_PROP_FPS) or 0.0),
+            _fourcc_texto(cap.get(cv2.CAP_PROP_FOURCC)),
+        )
+    finally:
+        cap.release()
+
+
+def firma_dispositivos():
+    """
+    Firma del conjunto de dispositivos de video conectados. En Linux cambia
+    al conectar/desconectar cámaras (/dev/video*); en otros sistemas no hay
+    una forma barata de saberlo y se devuelve None (la caché expira por TTL).
+    """
+    nodos = sorted(glob.glob("/dev/video*"))
+    if not nodos:
+        return None
+    firma = []
+    for nodo in nodos:
+        try:
+            st = os.stat(nodo)
+        except OSError:
+            continue
+        firma.append([nodo, st.st_rdev, st.st_ctime])
+    return firma
+
+
+class DescubridorCamaras:
+    """
+    Descubre cámaras en segundo plano: sondea todos los índices en paralelo
+    (un hilo por índice, con un tiempo máximo común) y entrega cada cámara en
+    cuanto responde. Los resultados se guardan en caché (también en disco)
+    junto con la firma de los dispositivos, y se reutilizan mientras esa
+    firma no cambie y no hayan pasado 'ttl' segundos. Un sondeo cortado por
+    el tiempo máximo no se guarda: una cámara lenta en abrir no puede quedar
+    como ausente durante todo el 'ttl'.
+    """
+
+    def __init__(self, max_camaras=5, timeout=3.0, ttl=300.0, ruta_cache=RUTA_CACHE):
+        self.max_camaras = max_camaras
+        self.timeout = timeout
+        self.ttl = ttl
+        self.ruta_cache = ruta_cache
+        self._lock = threading.Lock()
+        self._cache = None          # (firma, instante, [InfoCamara])
+        self._cargar_cache()
+
+    # ————— Caché —————
+
+    def _cargar_cache(self):
+        if not self.ruta_cache:
+            return
+        try:
+            with open(self.ruta_cache, encoding="utf-8") as f:
+                datos = json.load(f)
+            camaras = [InfoCamara(**c) for c in datos["camaras"]]
+            self._cache = (datos["firma"], datos["instante"], camaras)
+        except (OSError, ValueError, KeyError, TypeError):
+            self._cache = None
+
+    def _guardar_cache(self, firma, camaras):
+        instante = time.time()
+        with self._lock:
+            self._cache = (firma, instante, camaras)
+        if not self.ruta_cache:
+            return
+        try:
+            with open(self.ruta_cache, "w", encoding="utf-8") as f:
+                json.dump({
+                    "firma": firma,
+                    "instante": instante,
+                    "camaras": [c.a_dict() for c in camaras],
+                }, f)
+        except OSError:
+            pass
+
+    def invalidar(self):
+        with self._lock:
+            self._cache = None
+
+    def camaras_en_cache(self):
+        """
+        Lista de InfoCamara en caché si sigue siendo válida, o None.
+        """
+        with self._lock:
+            cache = self._cache
+        if cache is None:
+            return None
+        firma, instante, camaras = cache
+        if firma != firma_dispositivos() or time.time() - instante > self.ttl:
+            return None
+        return list(camaras)
+
+    # ————— Descubrimiento —————
+
+    def descubrir(self, al_encontrar, al_terminar, forzar=False):
+        """
+        Lanza el descubrimiento en segundo plano y vuelve de inmediato.
+        'al_encontrar(info)' se llama por cada cámara encontrada y
+        'al_terminar(lista)' al final, ambas desde hilos secundarios (en Tk
+        deben reenviarse al hilo principal, p. ej. con una queue).
+        """
+        if not forzar:
+            camaras = self.camaras_en_cache()
+            if camaras is not None:
+                for info in camaras:
+                    al_encontrar(info)
+                al_terminar(camaras)
+                return
+        threading.Thread(
+            target=self._descubrir,
+            args=(al_encontrar, al_terminar),
+            name="descubrir-camaras",
+            daemon=True
+        ).start()
+
+    def _descubrir(self, al_encontrar, al_terminar):
+        firma = firma_dispositivos()
+        respuestas = queue.Queue()
+
+        def sondear(indice):
+            try:
+                respuestas.put(sondear_camara(indice))
+            except Exception:
+                respuestas.put(None)
+
+        # Un hilo por índice: un sondeo colgado no retrasa a los demás y, si
+        # supera el tiempo máximo, simplemente se ignora su resultado
+        for indice in range(self.max_camaras):
+            threading.Thread(target=sondear, args=(indice,), name=f"sondeo-{indice}", daemon=True).start()
+
+        encontradas = []
+        respondidos = 0
+        limite = time.monotonic() + self.timeout
+        for _ in range(self.max_camaras):
+            restante = limite - time.monotonic()
+            if restante <= 0:
+                break
+            try:
+                info = respuestas.get(timeout=restante)
+            except queue.Empty:
+                break
+            respondidos += 1
+            if info is not None:
+                encontradas.append(info)
+                al_encontrar(info)
+
+        encontradas.sort(key=lambda c: c.indice)
+        if respondidos == self.max_camaras:
+            self._guardar_cache(firma, encontradas)
+        al_terminar(encontradas)
+
+
+def listar_camaras(max_camaras=5):
+    """
+    Detecta índices de cámaras disponibles (0, 1, 2, ...) hasta max_camaras.
+    Versión bloqueante (usa la caché si es válida).
+    """
+    terminado = threading.Event()
+    resultado = []
+
+    def al_terminar(camaras):
+        resultado.extend(c.indice for c in camaras)
+        terminado.set()
+
+    DescubridorCamaras(max_camaras).descubrir(lambda info: None, al_terminar)
+    terminado.wait()
+    return resultado
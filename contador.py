@@ -0,0 +1,232 @@
+# contador.py
+
+import math
+from collections import deque
+
+# Eventos que devuelve ContadorRepeticiones.actualizar()
+EVENTO_REP = "rep"        # se completó una repetición
+EVENTO_SERIE = "serie"    # se completó una serie (quedan más)
+EVENTO_FIN = "fin"        # se completaron todas las series
+
+
+class FiltroUnEuro:
+    """
+    Filtro One-Euro (Casiez et al., 2012): un paso bajo de primer orden cuya
+    frecuencia de corte sube con la velocidad de la señal. Quieta, suaviza
+    mucho (quita el temblor de los landmarks); en movimiento, casi no
+    retrasa. Usa el tiempo real entre muestras, así se comporta igual a 8
+    que a 30 FPS. 'valor' puede ser un escalar o un array de NumPy (se
+    filtra cada elemento por separado).
+    """
+
+    def __init__(self, min_cutoff=1.0, beta=0.02, d_cutoff=1.0):
+        self.min_cutoff = min_cutoff
+        self.beta = beta
+        self.d_cutoff = d_cutoff
+        self.reiniciar()
+
+    def reiniciar(self):
+        self.valor = None
+        self.derivada = None
+        self.t = None
+
+    @staticmethod
+    def _alfa(dt, cutoff):
+        tau = 1.0 / (2 * math.pi * cutoff)
+        return 1.0 / (1.0 + tau / dt)
+
+    def filtrar(self, valor, t):
+        if self.valor is None:
+            self.valor = valor
+            self.derivada = valor * 0.0
+            self.t = t
+            return valor
+
+        dt = t - self.t
+        if dt <= 0:
+            return self.valor
+        derivada = (valor - self.valor) / dt
+        self.derivada = self.derivada + self._alfa(dt, self.d_cutoff) * (derivada - self.derivada)
+        cutoff = self.min_cutoff + self.beta * abs(self.derivada)
+        self.valor = self.valor + self._alfa(dt, cutoff) * (valor - self.valor)
+        self.t = t
+        return self.valor
+
+
+class DetectorRepeticiones:
+    """
+    Detector de repeticiones en streaming, O(1) por muestra.
+
+    Una repetición es entrar en el rango [ang_min, ang_max] y volver a salir.
+    Sobre la regla original (una sola muestra cruda contra el rango) agrega:
+      - filtro One-Euro del ángulo (quita el ruido de los landmarks),
+      - histéresis: para salir hay que alejarse 'histeresis' grados del
+        rango, así el ruido en el borde no cuenta dos veces,
+      - cruce entre muestras: si entre dos muestras el ángulo atravesó el
+        rango completo (a pocos FPS pasa), cuenta como haber entrado,
+      - duración mínima: una salida a menos de 'duracion_minima' segundos de
+        la repetición anterior se descarta,
+      - huecos: si la articulación deja de verse más de 'max_hueco' segundos
+        el filtro se reinicia (no se mezcla la pose vieja con la nueva).
+    Todo se mide con los instantes de las muestras, no contando frames.
+    'duracion_rep' es lo que duró la última repetición, desde que entró en
+    el rango hasta que salió (None si todavía no hubo ninguna).
+    """
+
+    def __init__(self, histeresis=5.0, duracion_minima=0.4, max_hueco=1.0,
+                 min_cutoff=1.0, beta=0.1, suavizar=True):
+        self.histeresis = histeresis
+        self.duracion_minima = duracion_minima
+        self.max_hueco = max_hueco
+        self.filtro = FiltroUnEuro(min_cutoff, beta) if suavizar else None
+        self.reiniciar()
+
+    def reiniciar(self):
+        self.stage = "out"
+        self.angulo = None              # Último ángulo filtrado
+        self.t = None                   # Instante de la última muestra visible
+        self.t_ultima_rep = None
+        self.t_entrada = None           # Instante en que entró en el rango
+        self.duracion_rep = None
+        if self.filtro is not None:
+            self.filtro.reiniciar()
+
+    def actualizar(self, angulo, ang_min, ang_max, t):
+        """
+        Procesa una muestra (angulo None = no visible). Devuelve True si con
+        ella se completó una repetición.
+        """
+        if angulo is None:
+            return False
+
+        if self.t is not None and t - self.t > self.max_hueco:
+            # Hueco largo: el ángulo previo ya no sirve como referencia
+            self.angulo = None
+            if self.filtro is not None:
+                self.filtro.reiniciar()
+
+        previo = self.angulo
+        if self.filtro is not None:
+            angulo = self.filtro.filtrar(angulo, t)
+        self.angulo = angulo
+        self.t = t
+
+        if ang_min <= angulo <= ang_max:
+            if self.stage != "in":
+                self.stage = "in"
+                self.t_entrada = t
+            return False
+
+        if self.stage != "in":
+            cruzo = previo is not None and (
+                (previo < ang_min and angulo > ang_max) or (previo > ang_max and angulo < ang_min)
+            )
+            if not cruzo:
+                return False
+            self.stage = "in"
+            self.t_entrada = t
+
+        if ang_min - self.histeresis <= angulo <= ang_max + self.histeresis:
+            return False
+
+        self.stage = "out"
+        if self.t_ultima_rep is not None and t - self.t_ultima_rep < self.duracion_minima:
+            return False
+        self.t_ultima_rep = t
+        self.duracion_rep = t - self.t_entrada
+        return True
+
+
+class ContadorRepeticiones:
+    """
+    Máquina de estados de repeticiones y series, independiente de Tk.
+    Recibe un ángulo por frame junto con el instante en que se tomó, así puede
+    usarse igual desde la GUI en vivo (instante de captura del frame) o desde
+    el análisis por lotes (timestamp del video).
+
+    Cuándo se completa una repetición lo decide 'detector' (por defecto un
+    DetectorRepeticiones con filtro e histéresis). De los instantes de cada
+    repetición se guardan solo los últimos 'max_historial', así una sesión
+    larga no crece sin límite.
+    """
+
+    def __init__(self, target_reps, target_series, detector=None, max_historial=1000):
+        self.target_reps = target_reps
+        self.target_series = target_series
+        self.max_historial = max_historial
+        self.detector = detector if detector is not None else DetectorRepeticiones()
+        self.reiniciar()
+
+    @property
+    def stage(self):
+        return self.detector.stage
+
+    def reiniciar(self):
+        self.reps = 0
+        self.detector.reiniciar()
+        self.series_left = self.target_series
+
+        # ————— Datos de estadísticas —————
+        self.start_time = None
+        self.end_time = None
+        self.series_start_time = None
+        self.rep_timestamps = deque(maxlen=self.max_historial)  # Timestamps de las últimas repeticiones
+        self.series_times = []           # Duración de cada serie
+        self.reps_per_series = []        # Repeticiones completadas en cada serie
+
+    def iniciar(self, ahora):
+        self.start_time = ahora
+        self.series_start_time = ahora
+
+    @property
+    def terminado(self):
+        return self.end_time is not None
+
+    def actualizar(self, angulo, ang_min, ang_max, ahora):
+        """
+        Procesa un ángulo (o None si la articulación no es visible).
+        Devuelve EVENTO_REP, EVENTO_SERIE, EVENTO_FIN o None.
+        """
+        if self.terminado or not self.detector.actualizar(angulo, ang_min, ang_max, ahora):
+            return None
+
+        # Usuario completó una repetición
+        self.reps += 1
+        self.rep_timestamps.append(ahora)
+
+        if self.reps < self.target_reps:
+            return EVENTO_REP
+
+        # Se completa la serie
+        self.series_left -= 1
+        if self.series_start_time is not None:
+            dur = ahora - self.series_start_time
+        else:
+            dur = 0
+        self.series_times.append(dur)
+        self.reps_per_series.append(self.target_reps)
+
+        if self.series_left <= 0:
+            # Fin del ejercicio completo
+            self.end_time = ahora
+            return EVENTO_FIN
+
+        # Iniciar siguiente serie
+        self.series_start_time = ahora
+        self.reps = 0
+        return EVENTO_SERIE
+
+    def resumen(self):
+        """
+        Estadísticas de la sesión en un diccionario serializable.
+        """
+        total_time = self.end_time - self.start_time if self.start_time is not None and self.end_time is not None else 0
+        return {
+            "terminado": self.terminado,
+            "tiempo_total": total_time,
+            "series_completadas": len(self.reps_per_series),
+            "reps_totales": sum(self.reps_per_series) + (0 if self.terminado else self.reps),
+            "series_times": list(self.series_times),
+            "reps_per_series": list(self.reps_per_series),
+            "rep_timestamps": list(self.rep_timestamps),
+        }
@@ -0,0 +1,326 @@
+# dashboard.py
+
+import math
+import time
+import tkinter as tk
+
+import numpy as np
+
+
+class HistorialSesion:
+    """
+    Historial de la sesión en memoria constante, para el panel en vivo.
+
+    - Ángulos recientes: promedios de 1 / 'frecuencia' segundos en un buffer
+      circular de 'capacidad' muestras (por defecto ~2 minutos a 5 Hz).
+    - Repeticiones recientes: instantes de las últimas 'max_reps'.
+    - Agregados de largo plazo: un cubo por 'tam_cubo' segundos (por
+      defecto un minuto) con repeticiones y ángulo medio, en un buffer
+      circular de 'max_cubos' (por defecto 24 h).
+
+    Una sesión de todo el día ocupa lo mismo que una de cinco minutos.
+    Todas las operaciones de escritura son O(1).
+    """
+
+    def __init__(self, capacidad=600, frecuencia=5.0, max_reps=256, tam_cubo=60.0, max_cubos=1440):
+        self.periodo = 1.0 / frecuencia
+        self.tam_cubo = tam_cubo
+
+        self._t = np.empty(capacidad)
+        self._angulos = np.empty(capacidad)
+        self._reps = np.empty(max_reps)
+        self._cubo_id = np.empty(max_cubos, dtype=np.int64)
+        self._cubo_reps = np.empty(max_cubos, dtype=np.int64)
+        self._cubo_suma = np.empty(max_cubos)
+        self._cubo_n = np.empty(max_cubos, dtype=np.int64)
+
+        self.version = 0    # Cambia con cada dato nuevo (el panel no redibuja si no cambió)
+        self.reiniciar()
+
+    def reiniciar(self):
+        """
+        Vacía el historial para una sesión nueva, sin reservar memoria. El
+        panel en vivo que lo muestre sigue usándolo: 'version' avanza, así
+        que se redibuja vacío.
+        """
+        self._t.fill(np.nan)
+        self._angulos.fill(np.nan)
+        self._n = 0
+        self._suma = 0.0
+        self._cuenta = 0
+        self._t_muestra = None
+
+        self._reps.fill(np.nan)
+        self._n_reps = 0
+        self.reps_totales = 0
+
+        self._cubo_id.fill(-1)
+        self._cubo_reps.fill(0)
+        self._cubo_suma.fill(0.0)
+        self._cubo_n.fill(0)
+
+        self.version += 1
+
+    def _cubo(self, t):
+        cubo = int(t // self.tam_cubo)
+        i = cubo % len(self._cubo_id)
+        if self._cubo_id[i] != cubo:
+            self._cubo_id[i] = cubo
+            self._cubo_reps[i] = 0
+            self._cubo_suma[i] = 0.0
+            self._cubo_n[i] = 0
+        return i
+
+    def agregar_angulo(self, t, angulo):
+        """
+        Acumula un ángulo (None si no es visible). Se guarda un promedio por
+        período, así la memoria no depende de los FPS.
+        """
+        if angulo is not None:
+            self._suma += angulo
+            self._cuenta += 1
+            i = self._cubo(t)
+            self._cubo_suma[i] += angulo
+            self._cubo_n[i] += 1
+
+        if self._t_muestra is None:
+            self._t_muestra = t
+        if t - self._t_muestra < self.periodo:
+            return
+
+        i = self._n % len(self._t)
+        self._t[i] = t
+        self._angulos[i] = self._suma / self._cuenta if self._cuenta else np.nan
+        self._n += 1
+        self._suma = 0.0
+        self._cuenta = 0
+        self._t_muestra = t
+        self.version += 1
+
+    def agregar_rep(self, t):
+        self._reps[self._n_reps % len(self._reps)] = t
+        self._n_reps += 1
+        self.reps_totales += 1
+        self._cubo_reps[self._cubo(t)] += 1
+        self.version += 1
+
+    def angulos(self, desde):
+        """
+        (tiempos, angulos) de las muestras con t >= desde, en orden cronológico.
+        """
+        capacidad = len(self._t)
+        orden = np.arange(self._n - capacidad, self._n) % capacidad if self._n > capacidad else slice(0, self._n)
+        tiempos, angulos = self._t[orden], self._angulos[orden]
+        validos = tiempos >= desde
+        return tiempos[validos], angulos[validos]
+
+    def reps(self, desde):
+        return self._reps[self._reps >= desde]
+
+    def por_cubo(self, ahora, cubos):
+        """
+        Reps y ángulo medio de los últimos 'cubos' cubos (el último es el
+        actual): dos arrays de largo 'cubos', en orden cronológico.
+        """
+        actual = int(ahora // self.tam_cubo)
+        ids = np.arange(actual - cubos + 1, actual + 1)
+        slots = ids % len(self._cubo_id)
+        presentes = self._cubo_id[slots] == ids
+        reps = np.where(presentes, self._cubo_reps[slots], 0)
+        n = np.where(presentes, self._cubo_n[slots], 0)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            medias = np.where(n > 0, self._cubo_suma[slots] / n, np.nan)
+        return reps, medias
+
+
+class PanelEnVivo:
+    """
+    Ventana de estadísticas que se actualiza mientras se hace el ejercicio.
+
+    El fondo (ejes, grillas, rango objetivo) se dibuja una sola vez; cada
+    actualización solo cambia los datos de las líneas (set_data) y las
+    repinta con blitting sobre el fondo guardado. Los ejes de tiempo son
+    relativos a "ahora", así no hay que redibujar el fondo para que avancen.
+
+    Las actualizaciones se hacen cada 'intervalo_ms' como mínimo; si una
+    tarda más que 'fraccion_max' del intervalo, el intervalo se alarga para
+    no quitarle tiempo al bucle de captura.
+    """
+
+    def __init__(self, root, historial, obtener_estado, ventana_s=60.0, cubos=30,
+                 intervalo_ms=500, fraccion_max=0.05):
+        # matplotlib se importa solo si se abre el panel
+        from matplotlib.figure import Figure
+        from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
+
+        self.historial = historial
+        self.obtener_estado = obtener_estado    # Callable -> (texto, ang_min, ang_max)
+        self.ventana_s = ventana_s
+        self.cubos = cubos
+        self.intervalo_ms = intervalo_ms
+        self.intervalo_min = intervalo_ms
+        self.fraccion_max = fraccion_max
+        self._version = None
+        self._rango = None
+        self._fondo = None
+        self._after_id = None
+
+        self.ventana = tk.Toplevel(root)
+        self.ventana.title("Panel en vivo")
+        self.ventana.geometry("800x600")
+        self.ventana.protocol("WM_DELETE_WINDOW", self.cerrar)
+
+        self.figura = Figure(figsize=(8, 6), tight_layout=True)
+        self.ax_angulo = self.figura.add_subplot(2, 1, 1)
+        self.ax_cubos = self.figura.add_subplot(2, 1, 2)
+
+        self.ax_angulo.set_xlim(-ventana_s, 0)
+        self.ax_angulo.set_ylim(0, 180)
+        self.ax_angulo.set_xlabel("Segundos")
+        self.ax_angulo.set_ylabel("Ángulo (°)")
+        self.ax_angulo.grid(True, alpha=0.3)
+        self.banda = None
+        self.linea_angulo, = self.ax_angulo.plot([], [], color="#8da0cb", animated=True)
+        self.marcas_reps, = self.ax_angulo.plot([], [], "v", color="#e78ac3", animated=True)
+        self.texto = self.ax_angulo.text(0.01, 0.95, "", transform=self.ax_angulo.transAxes,
+                                         va="top", animated=True)
+
+        minutos = historial.tam_cubo / 60.0
+        self.ax_cubos.set_xlim(-(cubos - 0.5) * minutos, 0.5 * minutos)
+        self.ax_cubos.set_ylim(0, 10)
+        self.ax_cubos.set_xlabel("Minutos")
+        self.ax_cubos.set_ylabel("Reps por cubo")
+        self.ax_cubos.grid(True, alpha=0.3)
+        self._x_cubos = (np.arange(cubos) - (cubos - 1)) * minutos
+        self.linea_cubos, = self.ax_cubos.step(self._x_cubos, np.zeros(cubos), where="mid",
+                                               color="#66c2a5", animated=True)
+
+        self.canvas = FigureCanvasTkAgg(self.figura, master=self.ventana)
+        self.canvas.get_tk_widget().pack(fill="both", expand=True)
+        # Cada redibujado completo (inicio, cambio de tamaño o de escala) renueva el fondo
+        self.canvas.mpl_connect("draw_event", self._guardar_fondo)
+        self.canvas.draw()
+        self._programar()
+
+    def _guardar_fondo(self, evento=None):
+        self._fondo = self.canvas.copy_from_bbox(self.figura.bbox)
+        self._pintar()
+
+    def _programar(self):
+        self._after_id = self.ventana.after(int(self.intervalo_ms), self.actualizar)
+
+    def actualizar(self):
+        t0 = time.perf_counter()
+        texto, ang_min, ang_max = self.obtener_estado()
+        redibujar = False
+
+        if (ang_min, ang_max) != self._rango:
+            self._rango = (ang_min, ang_max)
+            if self.banda is not None:
+                self.banda.remove()
+            self.banda = self.ax_angulo.axhspan(ang_min, ang_max, color="#b3e2cd", alpha=0.5)
+            redibujar = True
+
+        if self.historial.version != self._version or texto != self.texto.get_text():
+            self._version = self.historial.version
+            ahora = time.time()
+            tiempos, angulos = self.historial.angulos(ahora - self.ventana_s)
+            self.linea_angulo.set_data(tiempos - ahora, angulos)
+            reps = self.historial.reps(ahora - self.ventana_s)
+            self.marcas_reps.set_data(reps - ahora, np.full(len(reps), 175.0))
+            self.texto.set_text(texto)
+
+            por_cubo, _ = self.historial.por_cubo(ahora, self.cubos)
+            self.linea_cubos.set_ydata(por_cubo)
+            tope = max(10, int(por_cubo.max()) + 2)
+            if tope > self.ax_cubos.get_ylim()[1]:
+                # Cambio de escala: único caso (además del tamaño) que redibuja todo
+                self.ax_cubos.set_ylim(0, math.ceil(tope * 1.5))
+                redibujar = True
+            if not redibujar:
+                self._pintar()
+
+        if redibujar:
+            self.canvas.draw()     # draw_event -> _guardar_fondo -> _pintar
+
+        costo_ms = (time.perf_counter() - t0) * 1000
+        if costo_ms > self.fraccion_max * self.intervalo_ms:
+            self.intervalo_ms = min(5000, costo_ms / self.fraccion_max)
+        elif self.intervalo_ms > self.intervalo_min:
+            self.intervalo_ms = max(self.intervalo_min, self.intervalo_ms * 0.9)
+        self._programar()
+
+    def _pintar(self):
+        if self._fondo is None:
+            return
+        self.canvas.restore_region(self._fondo)
+        for artista in (self.linea_angulo, self.marcas_reps, self.texto, self.linea_cubos):
+            artista.axes.draw_artist(artista)
+        self.canvas.blit(self.figura.bbox)
+
+    def cerrar(self):
+        if self._after_id is not None:
+            self.ventana.after_cancel(self._after_id)
+            self._after_id = None
+        self.ventana.destroy()
+
+    @property
+    def abierto(self):
+        return self._after_id is not None
+
+
+class PanelProgreso:
+    """
+    Tendencias de un paciente a lo largo de meses: tempo medio por
+    repetición, rango de movimiento por articulación y lado, y asimetría
+    izquierda/derecha del rango. Los datos vienen de los resúmenes de
+    progreso.py (ya agregados), así abrir el panel no relee repeticiones.
+    """
+
+    ARTICULACIONES = {1: "Codo", 2: "Rodilla"}
+    COLORES = {"izq": "#8da0cb", "der": "#e78ac3"}
+
+    def __init__(self, root, paciente, datos, escala="semana"):
+        from matplotlib.figure import Figure
+        from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
+        from progreso import asimetria
+
+        self.ventana = tk.Toplevel(root)
+        self.ventana.title(f"Progreso de {paciente}")
+        self.ventana.geometry("900x700")
+
+        figura = Figure(figsize=(9, 7), tight_layout=True)
+        ax_tempo, ax_rango, ax_asimetria = (figura.add_subplot(3, 1, i) for i in (1, 2, 3))
+        estilos = {1: "-", 2: "--"}
+
+        for (ejercicio, lado), serie in sorted(datos.items()):
+            fechas = (serie["inicio"] * 1000).astype("datetime64[ms]")
+            etiqueta = f"{self.ARTICULACIONES.get(ejercicio, ejercicio)} {lado}"
+            estilo = dict(color=self.COLORES[lado], linestyle=estilos.get(ejercicio, "-"), marker=".")
+            ax_tempo.plot(fechas, serie["tempo"], label=etiqueta, **estilo)
+            ax_rango.plot(fechas, serie["rango"], label=etiqueta, **estilo)
+
+        for ejercicio in sorted({e for e, _ in datos}):
+            inicios, porcentajes = asimetria(datos, ejercicio)
+            if len(inicios):
+                ax_asimetria.plot((inicios * 1000).astype("datetime64[ms]"), porcentajes, marker=".",
+                                  linestyle=estilos.get(ejercicio, "-"), color="#66c2a5",
+                                  label=self.ARTICULACIONES.get(ejercicio, ejercicio))
+        ax_asimetria.axhline(0, color="gray", linewidth=0.8)
+
+        por = "día" if escala == "dia" else "semana"
+        for ax, titulo, unidad in ((ax_tempo, f"Tempo medio por {por}", "Segundos por rep"),
+                                   (ax_rango, f"Rango de movimiento medio por {por}", "Grados"),
+                                   (ax_asimetria, "Asimetría del rango (izq - der)", "%")):
+            ax.set_title(titulo)
+            ax.set_ylabel(unidad)
+            ax.grid(True, alpha=0.3)
+            if ax.get_legend_handles_labels()[0]:
+                ax.legend(fontsize=8)
+        if not datos:
+            ax_tempo.text(0.5, 0.5, "Sin repeticiones registradas", transform=ax_tempo.transAxes, ha="center")
+
+        canvas = FigureCanvasTkAgg(figura, master=self.ventana)
+        canvas.draw()
+        canvas.get_tk_widget().pack(fill="both", expand=True, padx=10, pady=10)
+        tk.Button(self.ventana, text="Cerrar", command=self.ventana.destroy).pack(pady=(0, 10))
@@ -6,8 +6,12 @@ from tkinter import messagebox
 from PIL import Image, ImageTk
 import threading
 
+from pose_utils import LandmarkFrame
+from modelo import ModeloPose
+
 mp_pose = mp.solutions.pose
-pose = mp_pose.Pose(min_detection_confidence=0.5, min_tracking_confidence=0.5)
+# El modelo se construye en segundo plano al abrir la ventana
+modelo = ModeloPose(min_detection_confidence=0.5, min_tracking_confidence=0.5)
 mp_drawing = mp.solutions.drawing_utils
 
 def calcular_angulo(p1, p2, p3):
@@ -23,16 +27,26 @@ def feedback_ejercicio(angulo):
         return "Corrige el ángulo. Debe estar recto.", (0, 0, 255)
 
 def articulacion_visible(landmarks, articulacion):
-    return landmarks[articulacion].visibility > 0.5
+    return float(landmarks.datos[articulacion, 3]) > 0.5
 
-def detectar_parte_superior(landmarks, frame):
-    hombro_izq = [landmarks[mp_pose.PoseLandmark.LEFT_SHOULDER].x, landmarks[mp_pose.PoseLandmark.LEFT_SHOULDER].y]
-    codo_izq = [landmarks[mp_pose.PoseLandmark.LEFT_ELBOW].x, landmarks[mp_pose.PoseLandmark.LEFT_ELBOW].y]
-    muñeca_izq = [landmarks[mp_pose.PoseLandmark.LEFT_WRIST].x, landmarks[mp_pose.PoseLandmark.LEFT_WRIST].y]
+def puntos_xy(landmarks, *articulaciones):
+    # Una sola lectura del array por grupo de articulaciones
+    return landmarks.datos[list(articulaciones), :2].astype(np.float64)
 
-    hombro_der = [landmarks[mp_pose.PoseLandmark.RIGHT_SHOULDER].x, landmarks[mp_pose.PoseLandmark.RIGHT_SHOULDER].y]
-    codo_der = [landmarks[mp_pose.PoseLandmark.RIGHT_ELBOW].x, landmarks[mp_pose.PoseLandmark.RIGHT_ELBOW].y]
-    muñeca_der = [landmarks[mp_pose.PoseLandmark.RIGHT_WRIST].x, landmarks[mp_pose.PoseLandmark.RIGHT_WRIST].y]
+def detectar_parte_superior(landmarks, frame):
+    hombro_izq, codo_izq, muñeca_izq = puntos_xy(
+        landmarks,
+        mp_pose.PoseLandmark.LEFT_SHOULDER,
+        mp_pose.PoseLandmark.LEFT_ELBOW,
+        mp_pose.PoseLandmark.LEFT_WRIST
+    )
+
+    hombro_der, codo_der, muñeca_der = puntos_xy(
+        landmarks,
+        mp_pose.PoseLandmark.RIGHT_SHOULDER,
+        mp_pose.PoseLandmark.RIGHT_ELBOW,
+        mp_pose.PoseLandmark.RIGHT_WRIST
+    )
 
     brazo_izq_visible = articulacion_visible(landmarks, mp_pose.PoseLandmark.LEFT_SHOULDER) and \
                         articulacion_visible(landmarks, mp_pose.PoseLandmark.LEFT_ELBOW) and \
@@ -53,13 +67,19 @@ def detectar_parte_superior(landmarks, frame):
         cv2.putText(frame, f'B. DER. = {mensaje_der}', (50, 100), cv2.FONT_HERSHEY_SIMPLEX, 1, color_der, 2, cv2.LINE_AA)
 
 def detectar_parte_inferior(landmarks, frame):
-    cadera_izq = [landmarks[mp_pose.PoseLandmark.LEFT_HIP].x, landmarks[mp_pose.PoseLandmark.LEFT_HIP].y]
-    rodilla_izq = [landmarks[mp_pose.PoseLandmark.LEFT_KNEE].x, landmarks[mp_pose.PoseLandmark.LEFT_KNEE].y]
-    tobillo_izq = [landmarks[mp_pose.PoseLandmark.LEFT_ANKLE].x, landmarks[mp_pose.PoseLandmark.LEFT_ANKLE].y]
-
-    cadera_der = [landmarks[mp_pose.PoseLandmark.RIGHT_HIP].x, landmarks[mp_pose.PoseLandmark.RIGHT_HIP].y]
-    rodilla_der = [landmarks[mp_pose.PoseLandmark.RIGHT_KNEE].x, landmarks[mp_pose.PoseLandmark.RIGHT_KNEE].y]
-    tobillo_der = [landmarks[mp_pose.PoseLandmark.RIGHT_ANKLE].x, landmarks[mp_pose.PoseLandmark.RIGHT_ANKLE].y]
+    cadera_izq, rodilla_izq, tobillo_izq = puntos_xy(
+        landmarks,
+        mp_pose.PoseLandmark.LEFT_HIP,
+        mp_pose.PoseLandmark.LEFT_KNEE,
+        mp_pose.PoseLandmark.LEFT_ANKLE
+    )
+
+    cadera_der, rodilla_der, tobillo_der = puntos_xy(
+        landmarks,
+        mp_pose.PoseLandmark.RIGHT_HIP,
+        mp_pose.PoseLandmark.RIGHT_KNEE,
+        mp_pose.PoseLandmark.RIGHT_ANKLE
+    )
 
     pierna_izq_visible = articulacion_visible(landmarks, mp_pose.PoseLandmark.LEFT_HIP) and \
                           articulacion_visible(landmarks, mp_pose.PoseLandmark.LEFT_KNEE) and \
@@ -86,6 +106,7 @@ class App:
         self.ejercicio_var = tk.IntVar(value=1)
         self.cap = cv2.VideoCapture(0)
         self.running = True
+        self.error_modelo_mostrado = False
 
         # Panel de selección
         frame_left = tk.Frame(root)
@@ -99,6 +120,7 @@ class App:
         self.panel = tk.Label(root)
         self.panel.pack(side=tk.LEFT, padx=10, pady=10)
 
+        modelo.cargar_en_segundo_plano()
         self.update_frame()
 
     def update_frame(self):
@@ -107,12 +129,21 @@ class App:
         ret, frame = self.cap.read()
         if ret:
             frame_rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-            resultados = pose.process(frame_rgb)
-            if resultados.pose_landmarks:
+            # Hasta que el modelo termine de cargarse (o si no se pudo cargar)
+            # solo se muestra la cámara
+            resultados = None
+            if modelo.listo:
+                if modelo.error is None:
+                    resultados = modelo.obtener().process(frame_rgb)
+                elif not self.error_modelo_mostrado:
+                    self.error_modelo_mostrado = True
+                    messagebox.showerror("Error", f"Error al cargar el modelo: {modelo.error}")
+            if resultados is not None and resultados.pose_landmarks:
+                landmarks = LandmarkFrame.desde_mediapipe(resultados.pose_landmarks.landmark)
                 if self.ejercicio_var.get() == 1:
-                    detectar_parte_superior(resultados.pose_landmarks.landmark, frame)
+                    detectar_parte_superior(landmarks, frame)
                 elif self.ejercicio_var.get() == 2:
-                    detectar_parte_inferior(resultados.pose_landmarks.landmark, frame)
+                    detectar_parte_inferior(landmarks, frame)
                 mp_drawing.draw_landmarks(frame, resultados.pose_landmarks, mp_pose.POSE_CONNECTIONS)
             img = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
             img = Image.fromarray(img)
@@ -0,0 +1,418 @@
+# exportacion.py
+
+"""
+Video anotado de una sesión (esqueleto, feedback y contadores).
+
+- En vivo: ExportadorVideo codifica los frames que ya muestra la GUI en un
+  hilo aparte, detrás de una cola acotada.
+- Después: renderizar_grabacion() vuelve a dibujar una grabación .fbip
+  (sobre el video original de la sesión, si se tiene, o sobre fondo negro)
+  repartiendo tramos de tiempo entre procesos, más rápido que tiempo real.
+
+Uso:
+    python exportacion.py grabaciones/sesion_20250101_120000.fbip --reps 10 --series 3 --salida sesion.mp4
+    python exportacion.py grabaciones/sesion.fbip --video sesion_original.mp4 --procesos 4
+"""
+
+import argparse
+import multiprocessing
+import os
+import queue
+import shutil
+import subprocess
+import tempfile
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import cv2
+import numpy as np
+
+from pipeline import COLOR_LINEAS, COLOR_PUNTOS, dibujar_landmarks
+from pose_utils import LandmarkFrame
+
+CODEC = "mp4v"
+EXTENSION = ".mp4"
+
+# dibujar_landmarks usa colores RGB; los frames de esta etapa son BGR
+_LINEAS_BGR = COLOR_LINEAS[::-1]
+_PUNTOS_BGR = COLOR_PUNTOS[::-1]
+
+
+def ruta_nueva_exportacion(carpeta="exportaciones"):
+    return os.path.join(carpeta, time.strftime("sesion_%Y%m%d_%H%M%S") + EXTENSION)
+
+
+def dibujar_anotaciones(frame_bgr, texto, color, reps, series_restantes):
+    """
+    Feedback (con el color BGR de feedback_ejercicio) y contadores sobre
+    'frame_bgr', in place.
+    """
+    cv2.putText(frame_bgr, texto, (20, 40), cv2.FONT_HERSHEY_SIMPLEX, 1, color, 2, cv2.LINE_AA)
+    cv2.putText(frame_bgr, f"Reps: {reps} | Series restantes: {series_restantes}", (20, 80),
+                cv2.FONT_HERSHEY_SIMPLEX, 0.8, (255, 255, 255), 2, cv2.LINE_AA)
+
+
+def _abrir_escritor(ruta, fps, tam):
+    carpeta = os.path.dirname(ruta)
+    if carpeta:
+        os.makedirs(carpeta, exist_ok=True)
+    escritor = cv2.VideoWriter(ruta, cv2.VideoWriter_fourcc(*CODEC), fps, tam)
+    if not escritor.isOpened():
+        raise OSError(f"No se pudo abrir {ruta} para escribir video")
+    return escritor
+
+
+# ————— Exportación en vivo —————
+
+class ExportadorVideo:
+    """
+    Escribe el video anotado de la sesión en curso sin frenar la GUI.
+
+    registrar() no copia el frame: retiene el BufferFrame del pool de
+    captura (retener()) y lo encola; si la cola está llena el frame se
+    descarta y se cuenta en 'descartados' (nunca bloquea). El hilo escritor
+    convierte a BGR en un array propio (el buffer compartido no se toca),
+    agrega feedback y contadores, codifica y libera el buffer.
+
+    El video sale a 'fps' fijos y con la duración real de la sesión: cada
+    frame se repite hasta el instante del siguiente, así los frames
+    descartados o una cámara más lenta no aceleran el video. El tamaño es
+    el del primer frame; si la captura cambia de tamaño se reescala.
+
+    Los buffers retenidos salen del PoolFrames del pipeline: al exportar,
+    el pool necesita 'tam_cola' buffers más (PipelinePose(capacidad_pool=...)).
+    """
+
+    def __init__(self, ruta, fps=30.0, tam_cola=8):
+        self.ruta = ruta
+        self.fps = fps
+        self.tam_cola = tam_cola
+
+        # ————— Estadísticas —————
+        self.recibidos = 0
+        self.descartados = 0
+        self.escritos = 0           # Frames del video (incluye repetidos)
+        self.repetidos = 0
+        self.cola_max = 0
+        self.tiempo_escritura = 0.0
+        self.error = None
+
+        self._escritor = None
+        self._tam = None
+        self._bgr = None
+        self._t0 = None
+        self._cola = queue.Queue(maxsize=tam_cola)
+        self._hilo = threading.Thread(target=self._bucle_escritura, name="exportador-video", daemon=True)
+        self._hilo.start()
+
+    def registrar(self, resultado, texto, color, reps, series_restantes):
+        """
+        Encola un ResultadoFrame ya mostrado con el feedback del momento.
+        Quien llama sigue siendo dueño de su propia referencia al buffer.
+        """
+        if self._hilo is None or self.error is not None:
+            return
+        buffer = resultado.buffer.retener() if resultado.buffer is not None else None
+        try:
+            self._cola.put_nowait((resultado.frame, buffer, resultado.t_captura, texto, color, reps, series_restantes))
+        except queue.Full:
+            self.descartados += 1
+            if buffer is not None:
+                buffer.liberar()
+            return
+        self.recibidos += 1
+        self.cola_max = max(self.cola_max, self._cola.qsize())
+
+    def cerrar(self):
+        """
+        Escribe lo pendiente y cierra el archivo.
+        """
+        if self._hilo is None:
+            return
+        self._cola.put(None)
+        self._hilo.join()
+        self._hilo = None
+        if self._escritor is not None:
+            self._escritor.release()
+
+    def _bucle_escritura(self):
+        while True:
+            item = self._cola.get()
+            if item is None:
+                break
+            frame, buffer, t, texto, color, reps, series = item
+            try:
+                if self.error is None:
+                    t0 = time.perf_counter()
+                    self._escribir(frame, t, texto, color, reps, series)
+                    self.tiempo_escritura += time.perf_counter() - t0
+            except (OSError, cv2.error) as e:
+                self.error = e
+            finally:
+                if buffer is not None:
+                    buffer.liberar()
+
+    def _escribir(self, frame_rgb, t, texto, color, reps, series):
+        alto, ancho = frame_rgb.shape[:2]
+        if self._escritor is None:
+            self._tam = (ancho, alto)
+            self._escritor = _abrir_escritor(self.ruta, self.fps, self._tam)
+            self._bgr = np.empty((alto, ancho, 3), dtype=np.uint8)
+            self._t0 = t
+        if (ancho, alto) != self._tam:
+            frame_rgb = cv2.resize(frame_rgb, self._tam)
+        cv2.cvtColor(frame_rgb, cv2.COLOR_RGB2BGR, dst=self._bgr)
+        dibujar_anotaciones(self._bgr, texto, color, reps, series)
+
+        # Frames que corresponden hasta 't' a 'fps' fijos (al menos uno)
+        objetivo = int((t - self._t0) * self.fps) + 1
+        veces = max(1, objetivo - self.escritos)
+        for _ in range(veces):
+            self._escritor.write(self._bgr)
+        self.escritos += veces
+        self.repetidos += veces - 1
+
+    def estadisticas(self):
+        return {
+            "frames_video": self.escritos,
+            "descartados_video": self.descartados,
+            "repetidos_video": self.repetidos,
+            "cola_video": self._cola.qsize(),
+            "cola_video_max": self.cola_max,
+            "escritura_video_ms": self.tiempo_escritura / self.recibidos * 1000.0 if self.recibidos else 0.0,
+        }
+
+
+# ————— Renderizado posterior —————
+
+def anotaciones_grabacion(lector, target_reps, target_series):
+    """
+    Vuelve a pasar la grabación por el conteo (como reproduccion.py) y
+    devuelve, por registro, el índice del texto de feedback, reps y series
+    restantes, más la lista de (texto, color). El conteo es secuencial
+    pero barato; así cada tramo del video se puede dibujar por separado.
+    """
+    from reproduccion import Reproductor, LADOS, TAM_BLOQUE, evaluar_ejercicios
+
+    n = len(lector)
+    feedback = np.zeros(n, dtype=np.int16)
+    reps = np.zeros(n, dtype=np.int32)
+    series = np.zeros(n, dtype=np.int32)
+    textos, indices = [], {}
+    reproductor = Reproductor(target_reps, target_series)
+    for i in range(0, n, TAM_BLOQUE):
+        bloque = lector.registros[i:i + TAM_BLOQUE]
+        angulos, mensajes = evaluar_ejercicios(bloque["landmarks"], bloque["ejercicio"], bloque["lado"])
+        for k, (t, angulo, ejercicio, lado) in enumerate(zip(
+                bloque["t"].tolist(), angulos.tolist(), bloque["ejercicio"].tolist(), bloque["lado"].tolist())):
+            angulo = None if np.isnan(angulo) else angulo
+            reproductor.paso(t, angulo, ejercicio, LADOS[lado], mensajes.get(k, ()))
+            texto, color = reproductor.feedback
+            if texto not in indices:
+                indices[texto] = len(textos)
+                textos.append((texto, color))
+            feedback[i + k] = indices[texto]
+            reps[i + k] = reproductor.contador.reps
+            series[i + k] = reproductor.contador.series_left
+    return {"feedback": feedback, "reps": reps, "series": series, "textos": textos}
+
+
+def _renderizar_tramo(ruta_grabacion, ruta_video, inicio, fin, fps, tam, anotaciones, ruta_salida):
+    """
+    Proceso de trabajo: dibuja los frames [inicio, fin) del video de salida
+    (frame k = instante k / fps de la grabación) en 'ruta_salida'.
+    """
+    from grabacion import LectorGrabacion
+
+    cv2.setNumThreads(1)
+    lector = LectorGrabacion(ruta_grabacion)
+    tiempos = np.asarray(lector.tiempos)
+    # Registro vigente en cada frame de salida: el último con t <= k / fps
+    indices = np.searchsorted(tiempos, np.arange(inicio, fin) / fps, side="right") - 1
+
+    cap = None
+    if ruta_video is not None:
+        cap = cv2.VideoCapture(ruta_video)
+        cap.set(cv2.CAP_PROP_POS_FRAMES, inicio)
+    fondo = np.zeros((tam[1], tam[0], 3), dtype=np.uint8)
+    frame = np.empty_like(fondo)
+    escritor = _abrir_escritor(ruta_salida, fps, tam)
+    textos, desde = anotaciones["textos"], anotaciones["desde"]
+    escritos = 0
+    try:
+        for i in indices.tolist():
+            if cap is not None:
+                ok, leido = cap.read()
+                if not ok:
+                    break
+                if leido.shape[1::-1] != tam:
+                    leido = cv2.resize(leido, tam)
+                frame[:] = leido
+            else:
+                frame[:] = fondo
+            if i >= 0:
+                registro = lector.registros[i]
+                if registro["valido"]:
+                    landmarks = LandmarkFrame(registro["landmarks"], float(registro["t"]))
+                    dibujar_landmarks(frame, landmarks, _LINEAS_BGR, _PUNTOS_BGR)
+                texto, color = textos[anotaciones["feedback"][i - desde]]
+                dibujar_anotaciones(frame, texto, color, anotaciones["reps"][i - desde],
+                                    anotaciones["series"][i - desde])
+            escritor.write(frame)
+            escritos += 1
+    finally:
+        escritor.release()
+        if cap is not None:
+            cap.release()
+    return ruta_salida, escritos
+
+
+def _concatenar(tramos, salida, fps, tam):
+    """
+    Une los tramos en 'salida': con ffmpeg (sin recodificar) si está
+    instalado; si no, releyéndolos con OpenCV.
+    """
+    if len(tramos) == 1:
+        os.replace(tramos[0], salida)
+        return "directo"
+    ffmpeg = shutil.which("ffmpeg")
+    if ffmpeg is not None:
+        lista = salida + ".txt"
+        with open(lista, "w", encoding="utf-8") as f:
+            for tramo in tramos:
+                f.write(f"file '{os.path.abspath(tramo)}'\n")
+        try:
+            subprocess.run([ffmpeg, "-y", "-loglevel", "error", "-f", "concat", "-safe", "0", "-i", lista,
+                            "-c", "copy", salida], check=True)
+            return "ffmpeg"
+        except (OSError, subprocess.CalledProcessError):
+            pass
+        finally:
+            os.remove(lista)
+
+    escritor = _abrir_escritor(salida, fps, tam)
+    try:
+        for tramo in tramos:
+            cap = cv2.VideoCapture(tramo)
+            while True:
+                ok, frame = cap.read()
+                if not ok:
+                    break
+                escritor.write(frame)
+            cap.release()
+    finally:
+        escritor.release()
+    return "opencv"
+
+
+def renderizar_grabacion(ruta_grabacion, salida, target_reps=10, target_series=3, ruta_video=None,
+                         fps=30.0, tam=(1280, 720), procesos=None, duracion_tramo=None):
+    """
+    Renderiza el video anotado de una grabación .fbip. Con 'ruta_video' (el
+    video original de la sesión, que empieza junto con la grabación) se
+    dibuja encima y se usan sus fps y tamaño; si no, fondo negro de 'tam'.
+
+    El video se parte en tramos de tiempo (por defecto uno por proceso) que
+    se dibujan en paralelo en archivos temporales y al final se unen.
+    Devuelve un resumen con tiempos y velocidad respecto de tiempo real.
+    """
+    from grabacion import LectorGrabacion
+
+    if not fps > 0:
+        raise ValueError(f"fps debe ser positivo: {fps}")
+    t0 = time.perf_counter()
+    lector = LectorGrabacion(ruta_grabacion)
+    if ruta_video is not None:
+        cap = cv2.VideoCapture(ruta_video)
+        if not cap.isOpened():
+            raise OSError(f"No se pudo abrir el video {ruta_video}")
+        fps = cap.get(cv2.CAP_PROP_FPS) or fps
+        tam = (int(cap.get(cv2.CAP_PROP_FRAME_WIDTH)), int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT)))
+        cap.release()
+    anotaciones = anotaciones_grabacion(lector, target_reps, target_series)
+    t_conteo = time.perf_counter() - t0
+
+    total = int(lector.duracion * fps) + 1 if len(lector) else 0
+    procesos = procesos or os.cpu_count() or 1
+    if duracion_tramo is None:
+        # Tramos de al menos un segundo: por debajo no compensa el proceso
+        n_tramos = max(1, min(procesos, int(lector.duracion)))
+    else:
+        n_tramos = max(1, int(np.ceil(total / (duracion_tramo * fps))))
+    cortes = np.linspace(0, total, n_tramos + 1).astype(int)
+    tiempos = np.asarray(lector.tiempos)
+    lector.cerrar()
+
+    carpeta = os.path.dirname(salida)
+    if carpeta:
+        os.makedirs(carpeta, exist_ok=True)
+    with tempfile.TemporaryDirectory(dir=carpeta or None) as temporal:
+        trabajos = []
+        for n, (inicio, fin) in enumerate(zip(cortes[:-1], cortes[1:])):
+            # A cada proceso solo le viajan las anotaciones de su tramo
+            desde = max(0, int(np.searchsorted(tiempos, inicio / fps, side="right")) - 1)
+            hasta = int(np.searchsorted(tiempos, fin / fps, side="right"))
+            parte = {clave: anotaciones[clave][desde:hasta] for clave in ("feedback", "reps", "series")}
+            parte["textos"] = anotaciones["textos"]
+            parte["desde"] = desde
+            trabajos.append((ruta_grabacion, ruta_video, int(inicio), int(fin), fps, tam, parte,
+                             os.path.join(temporal, f"tramo_{n:04d}{EXTENSION}")))
+
+        contexto = multiprocessing.get_context("spawn")
+        with ProcessPoolExecutor(max_workers=min(procesos, len(trabajos)), mp_context=contexto) as pool:
+            resultados = list(pool.map(_renderizar_tramo, *zip(*trabajos)))
+        t_render = time.perf_counter() - t0 - t_conteo
+        metodo = _concatenar([ruta for ruta, _ in resultados], salida, fps, tam)
+
+    t_total = time.perf_counter() - t0
+    frames = sum(n for _, n in resultados)
+    return {
+        "grabacion": ruta_grabacion,
+        "salida": salida,
+        "frames": frames,
+        "tramos": len(trabajos),
+        "procesos": min(procesos, len(trabajos)),
+        "union": metodo,
+        "tiempo_conteo": t_conteo,
+        "tiempo_render": t_render,
+        "tiempo_total": t_total,
+        "velocidad": (frames / fps) / t_total if t_total > 0 else 0.0,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Video anotado de una grabación de sesión (.fbip).")
+    parser.add_argument("grabacion", help="Archivo .fbip de GrabadorSesion")
+    parser.add_argument("--salida", default=None, help="Video de salida (por defecto exportaciones/...)")
+    parser.add_argument("--video", default=None, help="Video original de la sesión para dibujar encima")
+    parser.add_argument("--reps", type=int, default=10, help="Repeticiones por serie")
+    parser.add_argument("--series", type=int, default=3, help="Series")
+    parser.add_argument("--fps", type=float, default=30.0, help="FPS del video (sin --video)")
+    parser.add_argument("--tam", default="1280x720", help="ANCHOxALTO del video (sin --video)")
+    parser.add_argument("--procesos", type=int, default=None, help="Procesos de trabajo (por defecto: núcleos)")
+    args = parser.parse_args(argv)
+
+    try:
+        tam = tuple(int(v) for v in args.tam.lower().split("x"))
+    except ValueError:
+        parser.error(f"tamaño inválido: {args.tam}")
+    resumen = renderizar_grabacion(
+        args.grabacion,
+        args.salida or ruta_nueva_exportacion(),
+        args.reps,
+        args.series,
+        ruta_video=args.video,
+        fps=args.fps,
+        tam=tam,
+        procesos=args.procesos,
+    )
+    print(
+        f"{resumen['frames']} frames en {resumen['tiempo_total']:.1f} s "
+        f"({resumen['velocidad']:.1f}x tiempo real, {resumen['procesos']} procesos, "
+        f"unión con {resumen['union']}) -> {resumen['salida']}"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,238 @@
+# grabacion.py
+
+import json
+import os
+import queue
+import struct
+import threading
+import time
+
+import numpy as np
+
+from pose_utils import LandmarkFrame, NUM_LANDMARKS
+
+# ————— Formato del archivo —————
+#
+# Cabecera de 64 bytes seguida de registros de tamaño fijo, uno por frame.
+# Al ser de tamaño fijo el archivo se abre con np.memmap: el registro i está
+# en CABECERA + i * REGISTRO.itemsize y nada obliga a cargarlo entero.
+
+MAGICO = b"FBIPOSE\x00"
+VERSION = 1
+_CABECERA = struct.Struct("<8sHHId")     # mágico, versión, landmarks, tamaño de registro, inicio (epoch)
+TAM_CABECERA = 64
+
+REGISTRO = np.dtype([
+    ("t", "<f8"),                                   # Segundos desde el inicio de la grabación
+    ("confianza", "<f4"),                           # 1.0 si vino de la inferencia, < 1 si fue predicho
+    ("ejercicio", "u1"),                            # 1=brazo, 2=pierna, o reglas.CODIGOS_EJERCICIO
+    ("lado", "u1"),                                 # 0=izq, 1=der
+    ("valido", "u1"),                               # 0 si no se detectó pose en el frame
+    ("relleno", "u1"),
+    ("landmarks", "<f4", (NUM_LANDMARKS, 4)),       # x, y, z, visibilidad
+])
+
+LADOS = ("izq", "der")
+EXTENSION = ".fbip"
+
+
+class GrabadorSesion:
+    """
+    Graba los landmarks de cada frame en un archivo binario de solo anexado.
+    registrar() solo encola (nunca toca el disco ni bloquea): un hilo escritor
+    vacía la cola por lotes. Si el disco no da abasto y la cola se llena, el
+    frame se descarta y se cuenta en 'descartados'.
+
+    't_inicio' (en el reloj de 'reloj') e 'inicio_epoch' fijan el origen de
+    los tiempos; la GUI pasa los de su sesión, así el contador en vivo y la
+    reproducción de la grabación reciben exactamente los mismos instantes.
+    """
+
+    def __init__(self, ruta, tam_cola=1024, tam_lote=64, reloj=time.perf_counter, t_inicio=None,
+                 inicio_epoch=None):
+        self.ruta = ruta
+        self.tam_lote = tam_lote
+        self.reloj = reloj
+        self.t_inicio = reloj() if t_inicio is None else t_inicio
+        self.inicio_epoch = time.time() if inicio_epoch is None else inicio_epoch
+
+        self.escritos = 0
+        self.descartados = 0
+        self.error = None
+
+        carpeta = os.path.dirname(ruta)
+        if carpeta:
+            os.makedirs(carpeta, exist_ok=True)
+        self._archivo = open(ruta, "wb")
+        cabecera = _CABECERA.pack(MAGICO, VERSION, NUM_LANDMARKS, REGISTRO.itemsize, self.inicio_epoch)
+        self._archivo.write(cabecera.ljust(TAM_CABECERA, b"\x00"))
+
+        self._cola = queue.Queue(maxsize=tam_cola)
+        self._hilo = threading.Thread(target=self._bucle_escritura, name="grabador", daemon=True)
+        self._hilo.start()
+
+    def registrar(self, t, ejercicio, lado, landmarks):
+        """
+        Encola un frame. 't' usa el mismo reloj que 'reloj' (por defecto
+        time.perf_counter, como t_captura del pipeline); 'landmarks' es un
+        LandmarkFrame o None si no hubo pose. Los datos no se copian: los
+        LandmarkFrame no se modifican una vez creados.
+        """
+        try:
+            self._cola.put_nowait((t, ejercicio, lado, landmarks))
+        except queue.Full:
+            self.descartados += 1
+
+    def cerrar(self, resumen=None):
+        """
+        Escribe lo pendiente y cierra el archivo. Con 'resumen' (un dict
+        serializable, p. ej. el conteo en vivo) lo guarda junto a la
+        grabación en ruta_resumen(), para verificar después la reproducción.
+        """
+        if self._hilo is None:
+            return
+        self._cola.put(None)
+        self._hilo.join()
+        self._hilo = None
+        self._archivo.close()
+        if resumen is not None:
+            try:
+                with open(ruta_resumen(self.ruta), "w", encoding="utf-8") as f:
+                    json.dump(resumen, f, ensure_ascii=False)
+            except OSError as e:
+                self.error = e
+
+    def _bucle_escritura(self):
+        lote = np.zeros(self.tam_lote, dtype=REGISTRO)
+        fin = False
+        while not fin:
+            item = self._cola.get()
+            n = 0
+            # Se vacía lo que haya en la cola (hasta un lote) en una sola escritura
+            while item is not None:
+                self._llenar(lote[n], *item)
+                n += 1
+                if n == self.tam_lote:
+                    break
+                try:
+                    item = self._cola.get_nowait()
+                except queue.Empty:
+                    break
+            fin = item is None
+            if n and self.error is None:
+                try:
+                    self._archivo.write(lote[:n].tobytes())
+                    self._archivo.flush()
+                    self.escritos += n
+                except OSError as e:
+                    self.error = e
+
+    def _llenar(self, registro, t, ejercicio, lado, landmarks):
+        registro["t"] = t - self.t_inicio
+        registro["ejercicio"] = ejercicio
+        registro["lado"] = LADOS.index(lado)
+        if landmarks is None:
+            registro["valido"] = 0
+            registro["confianza"] = 0.0
+            registro["landmarks"] = np.nan
+        else:
+            registro["valido"] = 1
+            registro["confianza"] = landmarks.confianza
+            registro["landmarks"] = landmarks.datos
+
+    def estadisticas(self):
+        return {
+            "frames_grabados": self.escritos,
+            "frames_descartados_grabacion": self.descartados,
+            "pendientes_grabacion": self._cola.qsize(),
+        }
+
+
+class LectorGrabacion:
+    """
+    Lee una grabación de GrabadorSesion mapeándola en memoria: el sistema
+    operativo carga solo las páginas que se tocan, así que recortar unos
+    segundos de una grabación de una hora cuesta lo mismo que de una corta.
+    Un registro final incompleto (grabación interrumpida) se ignora.
+    """
+
+    def __init__(self, ruta):
+        self.ruta = ruta
+        with open(ruta, "rb") as f:
+            cabecera = f.read(TAM_CABECERA)
+        if len(cabecera) < TAM_CABECERA:
+            raise ValueError(f"{ruta}: archivo demasiado corto")
+        magico, version, num_landmarks, tam_registro, inicio = _CABECERA.unpack_from(cabecera)
+        if magico != MAGICO:
+            raise ValueError(f"{ruta}: no es una grabación de landmarks")
+        if version != VERSION or num_landmarks != NUM_LANDMARKS or tam_registro != REGISTRO.itemsize:
+            raise ValueError(f"{ruta}: versión de grabación no soportada ({version})")
+        self.inicio_epoch = inicio
+
+        n = (os.path.getsize(ruta) - TAM_CABECERA) // REGISTRO.itemsize
+        if n:
+            self.registros = np.memmap(ruta, dtype=REGISTRO, mode="r", offset=TAM_CABECERA, shape=(n,))
+        else:
+            self.registros = np.zeros(0, dtype=REGISTRO)
+
+    def __len__(self):
+        return len(self.registros)
+
+    def __getitem__(self, i):
+        return self.registros[i]
+
+    @property
+    def tiempos(self):
+        return self.registros["t"]
+
+    @property
+    def duracion(self):
+        return float(self.tiempos[-1]) if len(self) else 0.0
+
+    def indices(self, t_inicio=None, t_fin=None):
+        """
+        Rango [i, j) de registros con t_inicio <= t < t_fin (segundos desde el
+        inicio). Búsqueda binaria: toca O(log n) páginas del archivo.
+        """
+        tiempos = self.tiempos
+        i = 0 if t_inicio is None else int(np.searchsorted(tiempos, t_inicio, side="left"))
+        j = len(self) if t_fin is None else int(np.searchsorted(tiempos, t_fin, side="left"))
+        return i, j
+
+    def recortar(self, t_inicio=None, t_fin=None):
+        """
+        Vista (sin copia) de los registros entre t_inicio y t_fin.
+        """
+        i, j = self.indices(t_inicio, t_fin)
+        return self.registros[i:j]
+
+    def landmarks(self, t_inicio=None, t_fin=None):
+        """
+        Array (N, 33, 4) de landmarks entre t_inicio y t_fin; listo para
+        calcular_angulos_articulaciones(). Los frames sin pose son NaN.
+        """
+        return self.recortar(t_inicio, t_fin)["landmarks"]
+
+    def frames(self, t_inicio=None, t_fin=None):
+        """
+        Itera (t, LandmarkFrame o None, ejercicio, lado) en orden temporal.
+        """
+        for registro in self.recortar(t_inicio, t_fin):
+            t = float(registro["t"])
+            lado = LADOS[registro["lado"]]
+            landmarks = None
+            if registro["valido"]:
+                landmarks = LandmarkFrame(np.array(registro["landmarks"]), t, float(registro["confianza"]))
+            yield t, landmarks, int(registro["ejercicio"]), lado
+
+    def cerrar(self):
+        # El mapa se libera cuando no quedan vistas que lo referencien
+        self.registros = np.zeros(0, dtype=REGISTRO)
+
+
+def ruta_resumen(ruta_grabacion):
+    return os.path.splitext(ruta_grabacion)[0] + ".resumen.json"
+
+
+def ruta_nueva_grabacion(carpeta="grabaciones"):
+    return os.path.join(carpeta, time.strftime("sesion_%Y%m%d_%H%M%S") + EXTENSION)
@@ -2,96 +2,72 @@
 
 import tkinter as tk
 from tkinter import ttk, messagebox
-from PIL import Image, ImageTk
 import cv2
-import mediapipe as mp
 import time
-import numpy as np
-import matplotlib.pyplot as plt
-from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
-
-from pose_utils import detectar_codo, detectar_rodilla
-
-def listar_camaras(max_camaras=5):
-    """
-    Detecta índices de cámaras disponibles (0, 1, 2, ...) hasta max_camaras.
-    """
-    disponibles = []
-    for i in range(max_camaras):
-        cap = cv2.VideoCapture(i)
-        if cap.isOpened():
-            disponibles.append(i)
-            cap.release()
-    return disponibles
-
-def feedback_ejercicio(angulo, angulo_min, angulo_max):
-    """
-    Dado un ángulo detectado y un rango [angulo_min, angulo_max],
-    devuelve un texto y un color (BGR) según si el ángulo está dentro del rango.
-    """
-    if angulo is None:
-        return "Articulación no visible", (200, 200, 0)  # amarillo suave
-
-    if angulo_min <= angulo <= angulo_max:
-        return "Ejercicio correcto", (0, 255, 0)
-    else:
-        return f"Ángulo fuera de rango [{angulo_min}-{angulo_max}]", (0, 0, 255)
-
-def obtener_rango_ejercicio(ejercicio, lado):
-    """
-    Devuelve (angulo_min, angulo_max) según:
-      - ejercicio == 1: parte superior (codo)
-      - ejercicio == 2: parte inferior (rodilla)
-    Ajusta estos valores al rango real que necesites.
-    """
-    if ejercicio == 1:
-        if lado == "izq":
-            return 150, 170
-        elif lado == "der":
-            return 160, 180
-        else:
-            return 0, 180
-    elif ejercicio == 2:
-        if lado == "izq":
-            return 160, 180
-        elif lado == "der":
-            return 170, 180
-        else:
-            return 0, 180
-    else:
-        return 0, 360
-
-mp_pose = mp.solutions.pose
-pose = mp_pose.Pose(min_detection_confidence=0.5, min_tracking_confidence=0.5)
-mp_drawing = mp.solutions.drawing_utils
+import queue
+import sqlite3
+
+from reglas import CODIGOS_EJERCICIO, ejercicio_sesion, feedback_reglas
+from contador import ContadorRepeticiones, EVENTO_SERIE, EVENTO_FIN
+from pipeline import PipelinePose, CONTADORES
+from roi import RecorteROI
+from render import RenderizadorPanel
+from camaras import DescubridorCamaras
+from modelo import ModeloPose
+from inferencia_proceso import ModeloPoseProceso
+from grabacion import GrabadorSesion, ruta_nueva_grabacion
+from exportacion import ExportadorVideo, ruta_nueva_exportacion
+from metricas import Metricas, HUDRendimiento, ExportadorMetricas
+from dashboard import HistorialSesion
+from historial import HistorialPersistente, RUTA_HISTORIAL
+from progreso import progreso
+from autoajuste import AutoAjuste
+from seguimiento import FiltroLandmarks
+
+# MediaPipe y el modelo se cargan en segundo plano cuando se abre la ventana
+modelo = ModeloPose(min_detection_confidence=0.5, min_tracking_confidence=0.5)
 
 class PoseAppGUI:
     def __init__(self, root, on_exit, ejercicio_var):
         self.root = root
         self.on_exit = on_exit
-        self.ejercicio_var = ejercicio_var  # 1=brazo, 2=pierna
+        self.ejercicio_var = ejercicio_var  # 1=brazo, 2=pierna, o reglas.CODIGOS_EJERCICIO
         self.cap = None
+        self.pipeline = None
+        self.grabador = None
+        self.video_anotado = None
+        self.exportador = None
+        self.panel_vivo = None
+        self.autoajuste = None
+        self.ruta_registro_autoajuste = None
+        # Historial persistente (SQLite): se abre con la primera sesión
+        self.historial_db = None
+        self.sesion_db = None
+        self.ruta_historial = RUTA_HISTORIAL
+        self._rango_rep = None              # (mín, máx) del ángulo desde la última repetición
+        # Un ModeloPose por complejidad, compartido entre capturas (AutoAjuste agrega los que use)
+        self.modelos = {1: modelo}
+        self.modelos_proceso = {}           # Igual, con la inferencia en otro proceso
         self.running = False
         self.last_frame = None
+        self._resultado_mostrado = None     # Dueño del buffer de last_frame
+        # Reloj de la sesión: t_captura (perf_counter) -> epoch con un único
+        # desfase, compartido con la grabación
+        self._t0_sesion = time.perf_counter()
+        self._epoch_sesion = time.time()
         self.current_cam_index = None
 
         # Variables para modelo de series y repeticiones
         self.target_reps_var = tk.IntVar(value=10)
         self.target_series_var = tk.IntVar(value=3)
 
-        # Contador de repeticiones y estado
-        self.reps = 0
-        self.stage = "out"
-        self.current_target_reps = self.target_reps_var.get()
-        self.series_left = self.target_series_var.get()
-
-        # ————— Datos de estadísticas —————
-        self.start_time = None
-        self.end_time = None
-        self.series_start_time = None
-        self.rep_timestamps = []         # Lista de timestamps de cada repetición
-        self.series_times = []           # Duración de cada serie
-        self.reps_per_series = []        # Número de repeticiones completadas en cada serie (siempre target_reps)
+        # Contador de repeticiones, series y estadísticas (sin dependencias de Tk)
+        self.contador = ContadorRepeticiones(
+            self.target_reps_var.get(),
+            self.target_series_var.get()
+        )
+        # Historial acotado para el panel en vivo (memoria constante)
+        self.historial = HistorialSesion()
 
         # ————— Construcción de la interfaz —————
         root.title("App de ejercicios con cámara")
@@ -121,6 +97,14 @@ class PoseAppGUI:
             value=2,
             command=self.reset_counters
         ).pack(anchor="w", pady=2)
+        for codigo, nombre in CODIGOS_EJERCICIO.items():
+            ttk.Radiobutton(
+                frame_left,
+                text=nombre.replace("_", " ").capitalize(),
+                variable=self.ejercicio_var,
+                value=codigo,
+                command=self.reset_counters
+            ).pack(anchor="w", pady=2)
 
         ttk.Label(frame_left, text="Seleccione el lado").pack(pady=(20, 2))
         self.side_var = tk.StringVar(value="izq")
@@ -139,14 +123,95 @@ class PoseAppGUI:
             command=self.reset_counters
         ).pack(anchor="w", pady=2)
 
-        ttk.Label(frame_left, text="Reps por serie:").pack(pady=(20, 2))
+        ttk.Label(frame_left, text="Paciente:").pack(pady=(20, 2))
+        self.paciente_var = tk.StringVar(value="")
+        ttk.Entry(frame_left, textvariable=self.paciente_var, width=16).pack(pady=2)
+
+        ttk.Label(frame_left, text="Reps por serie:").pack(pady=(10, 2))
         ttk.Entry(frame_left, textvariable=self.target_reps_var, width=10).pack(pady=2)
         ttk.Label(frame_left, text="Series:").pack(pady=(10, 2))
         ttk.Entry(frame_left, textvariable=self.target_series_var, width=10).pack(pady=2)
 
+        # Inferencia adaptativa: el modelo corre 1 de cada k frames y el resto se predice
+        self.adaptativo_var = tk.BooleanVar(value=False)
+        ttk.Checkbutton(
+            frame_left,
+            text="Inferencia adaptativa",
+            variable=self.adaptativo_var
+        ).pack(anchor="w", pady=(20, 2))
+
+        # Recorte alrededor de la persona: el modelo no paga la resolución completa
+        self.roi_var = tk.BooleanVar(value=False)
+        ttk.Checkbutton(
+            frame_left,
+            text="Recorte ROI",
+            variable=self.roi_var
+        ).pack(anchor="w", pady=2)
+
+        # Suavizado de landmarks y predicción de articulaciones perdidas por poco tiempo
+        self.filtro_var = tk.BooleanVar(value=False)
+        ttk.Checkbutton(
+            frame_left,
+            text="Filtro temporal de landmarks",
+            variable=self.filtro_var
+        ).pack(anchor="w", pady=2)
+
+        # MediaPipe en un proceso aparte: la inferencia no compite por el GIL con Tk
+        self.proceso_var = tk.BooleanVar(value=False)
+        ttk.Checkbutton(
+            frame_left,
+            text="Inferencia en proceso aparte",
+            variable=self.proceso_var
+        ).pack(anchor="w", pady=2)
+
+        # Complejidad del modelo, resolución de inferencia y de cámara según la latencia medida
+        self.autoajuste_var = tk.BooleanVar(value=False)
+        ttk.Checkbutton(
+            frame_left,
+            text="Autoajuste de calidad",
+            variable=self.autoajuste_var
+        ).pack(anchor="w", pady=2)
+        ttk.Label(frame_left, text="Latencia objetivo (ms):").pack(anchor="w", pady=(2, 0))
+        self.latencia_objetivo_var = tk.IntVar(value=100)
+        ttk.Entry(frame_left, textvariable=self.latencia_objetivo_var, width=10).pack(anchor="w", pady=2)
+
+        # Landmarks de cada frame a disco (grabaciones/*.fbip) para analizarlos después
+        self.grabar_var = tk.BooleanVar(value=False)
+        ttk.Checkbutton(
+            frame_left,
+            text="Grabar sesión",
+            variable=self.grabar_var
+        ).pack(anchor="w", pady=2)
+
+        # Video con esqueleto, feedback y contadores (exportaciones/*.mp4)
+        self.video_var = tk.BooleanVar(value=False)
+        ttk.Checkbutton(
+            frame_left,
+            text="Exportar video anotado",
+            variable=self.video_var
+        ).pack(anchor="w", pady=2)
+
+        # Métricas del camino caliente: compartidas entre capturas, alimentan
+        # el HUD (F3) y la exportación periódica
+        self.metricas = Metricas()
+        self._contadores = dict.fromkeys(CONTADORES, 0)
+        self.hud = HUDRendimiento(self.instantanea_metricas)
+        self.hud_var = tk.BooleanVar(value=False)
+        ttk.Checkbutton(
+            frame_left,
+            text="HUD de rendimiento (F3)",
+            variable=self.hud_var,
+            command=self.alternar_hud
+        ).pack(anchor="w", pady=2)
+        root.bind("<F3>", lambda e: (self.hud_var.set(not self.hud_var.get()), self.alternar_hud()))
+
         ttk.Button(frame_left, text="Actualizar cámaras", command=self.actualizar_camaras).pack(pady=(30, 5))
         ttk.Button(frame_left, text="Iniciar", command=self.iniciar_captura).pack(pady=5)
         ttk.Button(frame_left, text="Ver Estadísticas", command=self.mostrar_dashboard).pack(pady=5)
+        ttk.Button(frame_left, text="Panel en vivo", command=self.abrir_panel_vivo).pack(pady=5)
+        ttk.Button(frame_left, text="Historial", command=self.mostrar_historial).pack(pady=5)
+        ttk.Button(frame_left, text="Progreso", command=self.mostrar_progreso).pack(pady=5)
+        ttk.Button(frame_left, text="Multicámara", command=self.abrir_multicamara).pack(pady=5)
         ttk.Button(frame_left, text="Salir", command=self.cerrar).pack(pady=(30, 0))
 
         self.panel = tk.Canvas(root, bg="black", highlightthickness=0)
@@ -161,27 +226,42 @@ class PoseAppGUI:
         self.counter_label.grid(row=2, column=1, pady=(0, 5))
         self.series_label = ttk.Label(
             root,
-            text=f"Series restantes: {self.series_left}",
+            text=f"Series restantes: {self.contador.series_left}",
             font=("Arial", 14)
         )
         self.series_label.grid(row=3, column=1, pady=(0, 10))
 
-        self.camaras = listar_camaras()
-        cam_text = str(self.camaras[0]) if self.camaras else "0"
-        self.camara_var = tk.StringVar(value=cam_text)
+        self.rendimiento_label = ttk.Label(root, text="", font=("Arial", 9))
+        self.rendimiento_label.grid(row=4, column=1, pady=(0, 5))
+
+        # Las cámaras se descubren en segundo plano: la ventana queda usable
+        # mientras tanto y el combobox se llena a medida que responden.
+        self.camaras = []
+        self.info_camaras = {}
+        self.buscando_camaras = False
+        self.descubridor = DescubridorCamaras()
+        self.camara_var = tk.StringVar(value="")
         ttk.Label(frame_left, text="Fuente de video:").pack(pady=(10, 2))
         self.combo_camaras = ttk.Combobox(
             frame_left,
-            values=[str(c) for c in self.camaras],
+            values=[],
             textvariable=self.camara_var,
             state="readonly",
             width=8
         )
         self.combo_camaras.pack(pady=2)
+        self.combo_camaras.bind("<<ComboboxSelected>>", lambda e: self.mostrar_info_camara())
+        self.info_camara_label = ttk.Label(frame_left, text="", font=("Arial", 8))
+        self.info_camara_label.pack(pady=2)
 
-        if not self.camaras:
-            messagebox.showwarning("Advertencia", "No se detectaron cámaras disponibles.")
+        self.actualizar_camaras(forzar=False)
+
+        # Construir y calentar el modelo mientras el usuario elige ejercicio y cámara
+        modelo.cargar_en_segundo_plano()
+        self.rendimiento_label.config(text="Cargando modelo de pose...")
+        self._consultar_modelo()
 
+        self.renderizador = RenderizadorPanel(self.panel)
         self.panel.bind("<Configure>", self.on_resize)
 
     def mostrar_acerca(self):
@@ -192,164 +272,441 @@ class PoseAppGUI:
 
     def reset_counters(self):
         # Al cambiar ejercicio/lado o ajustar reps/series, reinicio contadores y estadísticas en curso
-        self.reps = 0
-        self.stage = "out"
-        self.current_target_reps = self.target_reps_var.get()
-        self.series_left = self.target_series_var.get()
+        # (la sesión del historial persistente se cierra incompleta y, si se
+        # está capturando, empieza otra con los valores nuevos)
+        self.cerrar_sesion_historial()
+        self.contador = ContadorRepeticiones(
+            self.target_reps_var.get(),
+            self.target_series_var.get()
+        )
+        # El mismo objeto que usa el panel en vivo, si está abierto: "Total
+        # sesión" cuenta desde aquí y no desde que se abrió la app
+        self.historial.reiniciar()
         self.counter_label.config(text="Reps: 0")
-        self.series_label.config(text=f"Series restantes: {self.series_left}")
+        self.series_label.config(text=f"Series restantes: {self.contador.series_left}")
+        if self.running:
+            self.abrir_sesion_historial(time.time())
+
+    # ————— Historial persistente —————
+
+    def abrir_historial(self):
+        if self.historial_db is None:
+            try:
+                self.historial_db = HistorialPersistente(self.ruta_historial)
+            except (OSError, sqlite3.Error) as e:
+                messagebox.showerror("Error", f"No se pudo abrir el historial: {e}")
+        return self.historial_db
+
+    def abrir_sesion_historial(self, inicio):
+        if self.abrir_historial() is None:
+            return
+        self._rango_rep = None
+        self.sesion_db = self.historial_db.iniciar_sesion(
+            self.paciente_var.get().strip() or "anónimo",
+            self.ejercicio_var.get(),
+            self.side_var.get(),
+            inicio,
+            target_reps=self.contador.target_reps,
+            target_series=self.contador.target_series
+        )
 
-        # Reiniciar estadísticas
-        self.start_time = None
-        self.end_time = None
-        self.series_start_time = None
-        self.rep_timestamps.clear()
-        self.series_times.clear()
-        self.reps_per_series.clear()
+    def registrar_evento_historial(self, evento, ahora):
+        # Solo encola: la escritura ocurre en el hilo del historial
+        series = self.contador.series_times
+        rango = self._rango_rep or (None, None)
+        self._rango_rep = None
+        duracion = self.contador.detector.duracion_rep
+        if evento in (EVENTO_SERIE, EVENTO_FIN):
+            self.sesion_db.registrar_rep(ahora, len(series), duracion, *rango)
+            self.sesion_db.registrar_serie(
+                len(series), ahora - series[-1], series[-1], self.contador.reps_per_series[-1]
+            )
+        else:
+            self.sesion_db.registrar_rep(ahora, len(series) + 1, duracion, *rango)
+        if evento == EVENTO_FIN:
+            self.sesion_db.finalizar(self.contador.end_time, terminada=True)
+
+    def mostrar_progreso(self):
+        """
+        Tendencias semanales del paciente indicado (de los resúmenes del historial).
+        """
+        paciente = self.paciente_var.get().strip() or "anónimo"
+        if self.abrir_historial() is None:
+            return
+        try:
+            datos = progreso(self.historial_db, paciente, escala="semana")
+        except sqlite3.Error as e:
+            messagebox.showerror("Error", f"No se pudo leer el historial: {e}")
+            return
+        from dashboard import PanelProgreso
+        PanelProgreso(self.root, paciente, datos)
+
+    def cerrar_sesion_historial(self):
+        if self.sesion_db is not None:
+            # No hace nada si la sesión ya se cerró completa
+            self.sesion_db.finalizar(time.time(), terminada=False)
+            self.sesion_db = None
+
+    def mostrar_historial(self):
+        """
+        Sesiones de los últimos 90 días del paciente indicado.
+        """
+        paciente = self.paciente_var.get().strip() or "anónimo"
+        if self.abrir_historial() is None:
+            return
+        try:
+            sesiones = self.historial_db.sesiones_recientes(paciente, dias=90)
+        except sqlite3.Error as e:
+            messagebox.showerror("Error", f"No se pudo leer el historial: {e}")
+            return
+
+        ventana = tk.Toplevel(self.root)
+        ventana.title(f"Historial de {paciente} (últimos 90 días)")
+        ventana.geometry("600x400")
+        columnas = ("fecha", "ejercicio", "lado", "reps", "estado")
+        tabla = ttk.Treeview(ventana, columns=columnas, show="headings")
+        for columna, titulo in zip(columnas, ("Fecha", "Ejercicio", "Lado", "Reps", "Estado")):
+            tabla.heading(columna, text=titulo)
+            tabla.column(columna, width=110, anchor="center")
+        for s in sesiones:
+            tabla.insert("", "end", values=(
+                time.strftime("%Y-%m-%d %H:%M", time.localtime(s["inicio"])),
+                {1: "Brazo", 2: "Pierna"}.get(s["ejercicio"]) or CODIGOS_EJERCICIO.get(s["ejercicio"], "?"),
+                "Izquierdo" if s["lado"] == "izq" else "Derecho",
+                s["reps_totales"],
+                "Completa" if s["terminada"] else "Incompleta",
+            ))
+        tabla.pack(fill="both", expand=True, padx=10, pady=10)
+        ttk.Button(ventana, text="Cerrar", command=ventana.destroy).pack(pady=(0, 10))
 
     def on_resize(self, event):
-        self.panel_width = max(100, event.width)
-        self.panel_height = max(100, event.height)
+        self.renderizador.redimensionar(max(100, event.width), max(100, event.height))
         self.mostrar_frame_actual()
 
     def mostrar_frame_actual(self):
         if self.last_frame is None:
             return
+        # last_frame ya está en RGB (el mismo buffer que usó la inferencia)
+        t0 = time.perf_counter()
+        self.renderizador.mostrar(self.last_frame, self.hud)
+        self.metricas.registrar("render", time.perf_counter() - t0)
 
-        frame = self.last_frame.copy()
-        img = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-        img = Image.fromarray(img)
-
-        panel_w = self.panel.winfo_width()
-        panel_h = self.panel.winfo_height()
-        orig_w, orig_h = img.size
-        ratio = min(panel_w / orig_w, panel_h / orig_h)
-        new_w = int(orig_w * ratio)
-        new_h = int(orig_h * ratio)
-        img = img.resize((new_w, new_h), Image.BILINEAR)
-
-        imgtk = ImageTk.PhotoImage(image=img)
-        self.panel.imgtk = imgtk
+    def alternar_hud(self):
+        self.hud.activo = self.hud_var.get()
+        self.mostrar_frame_actual()
 
-        if not hasattr(self, 'canvas_image_id'):
-            self.canvas_image_id = self.panel.create_image(panel_w // 2, panel_h // 2, image=imgtk)
-        else:
-            self.panel.itemconfig(self.canvas_image_id, image=imgtk)
-            self.panel.coords(self.canvas_image_id, panel_w // 2, panel_h // 2)
+    def instantanea_metricas(self):
+        """
+        Métricas por etapa más los contadores del pipeline (los últimos
+        conocidos si no hay captura en curso). Se puede llamar desde otro hilo.
+        """
+        datos = self.metricas.instantanea()
+        pipeline = self.pipeline
+        if pipeline is not None:
+            self._contadores = pipeline.contadores()
+        datos.update(self._contadores)
+        return datos
+
+    def exportar_metricas(self, ruta, intervalo=10.0):
+        """
+        Escribe una instantánea de métricas cada 'intervalo' segundos en
+        'ruta' (.csv o líneas JSON) hasta cerrar la aplicación.
+        """
+        self.exportador = ExportadorMetricas(self.instantanea_metricas, ruta, intervalo)
+        self.exportador.iniciar()
 
     def update_frame(self):
-        if self.cap is None:
+        if self.pipeline is None:
             return
 
-        ret, frame = self.cap.read()
-        if not ret:
-            self._after_id = self.root.after(100, self.update_frame)
+        # La captura, pose.process() y el dibujo del esqueleto ocurren en los
+        # hilos del pipeline; aquí solo se consume el último resultado listo.
+        resultado = self.pipeline.obtener_resultado()
+        if resultado is None:
+            if self.pipeline.error is not None:
+                messagebox.showerror("Error", f"Error del modelo de pose: {self.pipeline.error}")
+                self.running = False
+                self.detener_pipeline()
+                return
+            self._after_id = self.root.after(5, self.update_frame)
             return
 
-        frame_rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-        resultados = pose.process(frame_rgb)
-
+        frame = resultado.frame
+        t0 = time.perf_counter()
         angulo_detectado = None
+        mensajes = ()
 
-        if resultados.pose_landmarks:
-            mp_drawing.draw_landmarks(frame, resultados.pose_landmarks, mp_pose.POSE_CONNECTIONS)
-            lado = self.side_var.get()
-            ejercicio = self.ejercicio_var.get()
+        # Todas las reglas del ejercicio en una pasada; la de conteo da el
+        # ángulo del contador y las demás el feedback de postura
+        sesion = ejercicio_sesion(self.ejercicio_var.get(), self.side_var.get())
+        if resultado.landmarks is not None:
+            evaluacion = sesion.evaluar(resultado.landmarks.datos)
+            angulo_detectado = sesion.angulo(evaluacion)
+            mensajes = sesion.mensajes(evaluacion)
 
-            if ejercicio == 1:
-                angulo_detectado = detectar_codo(resultados.pose_landmarks.landmark, lado)
-            else:
-                angulo_detectado = detectar_rodilla(resultados.pose_landmarks.landmark, lado)
-
-        ang_min, ang_max = obtener_rango_ejercicio(
-            self.ejercicio_var.get(),
-            self.side_var.get()
-        )
+        ang_min, ang_max = sesion.rango
 
         # ————— Lógica para contar repeticiones y series —————
         if self.running:
-            if angulo_detectado is not None:
-                if ang_min <= angulo_detectado <= ang_max:
-                    if self.stage == "out":
-                        self.stage = "in"
+            if self.grabador is not None:
+                # Solo encola: la escritura ocurre en el hilo del grabador
+                self.grabador.registrar(
+                    resultado.t_captura,
+                    self.ejercicio_var.get(),
+                    self.side_var.get(),
+                    resultado.landmarks
+                )
+
+            # Instante de captura, no de consumo: la espera en las colas o
+            # un callback de Tk lento no cambian lo que ve el contador
+            ahora = self.instante_sesion(resultado.t_captura)
+            if self.contador.start_time is None:
+                self.contador.iniciar(ahora)
+            evento = self.contador.actualizar(angulo_detectado, ang_min, ang_max, ahora)
+            if angulo_detectado is not None and self.sesion_db is not None:
+                # Rango recorrido en la repetición en curso, para el historial
+                if self._rango_rep is None:
+                    self._rango_rep = (angulo_detectado, angulo_detectado)
                 else:
-                    if self.stage == "in":
-                        # Usuario completó una repetición
-                        self.reps += 1
-                        self.rep_timestamps.append(time.time())
-                        self.stage = "out"
-
-                        # Actualizar contador de repeticiones
-                        if self.reps >= self.current_target_reps:
-                            # Se completa la serie
-                            self.series_left -= 1
-                            # Registrar duración de la serie
-                            if self.series_start_time is not None:
-                                dur = time.time() - self.series_start_time
-                            else:
-                                dur = 0
-                            self.series_times.append(dur)
-                            self.reps_per_series.append(self.current_target_reps)
-
-                            # Mostrar en etiqueta cuántas series quedan
-                            self.series_label.config(text=f"Series restantes: {self.series_left}")
-
-                            if self.series_left <= 0:
-                                # Fin del ejercicio completo
-                                self.running = False
-                                self.end_time = time.time()
-                                self.feedback_label.config(text="¡Ejercicio completado!", foreground="#008000")
-                                self.counter_label.config(text=f"Reps: {self.current_target_reps}")
-                                messagebox.showinfo("Completado", "¡Has completado todas las series del ejercicio!")
-                            else:
-                                # Iniciar siguiente serie
-                                self.series_start_time = time.time()
-                                self.reps = 0
-                                self.counter_label.config(text=f"Reps: {self.reps}")
-                        else:
-                            self.counter_label.config(text=f"Reps: {self.reps}")
+                    self._rango_rep = (min(self._rango_rep[0], angulo_detectado),
+                                       max(self._rango_rep[1], angulo_detectado))
+            self.historial.agregar_angulo(ahora, angulo_detectado)
+            if evento is not None:
+                self.historial.agregar_rep(ahora)
+                if self.sesion_db is not None:
+                    self.registrar_evento_historial(evento, ahora)
+                self.counter_label.config(text=f"Reps: {self.contador.reps}")
+                self.series_label.config(text=f"Series restantes: {self.contador.series_left}")
+            # Antes del messagebox de fin, que bloquea hasta que el usuario lo cierra
+            self.metricas.registrar("conteo", time.perf_counter() - t0)
+
+            if evento == EVENTO_FIN:
+                # Fin del ejercicio completo
+                self.running = False
+                self.detener_grabacion()
+                self.detener_video_anotado()
+                self.feedback_label.config(text="¡Ejercicio completado!", foreground="#008000")
+                messagebox.showinfo("Completado", "¡Has completado todas las series del ejercicio!")
+
+        feedback_text, feedback_color = feedback_reglas(angulo_detectado, ang_min, ang_max, mensajes)
+        if self.running and self.video_anotado is not None:
+            # Retiene el buffer y encola: la codificación ocurre en su hilo
+            self.video_anotado.registrar(
+                resultado,
+                feedback_text,
+                feedback_color,
+                self.contador.reps,
+                self.contador.series_left
+            )
 
         # — Mostrar y guardar último frame —
-        self.last_frame = frame.copy()
+        # El frame ya es propiedad exclusiva del hilo de Tk: no hace falta
+        # copiarlo. El buffer del anterior vuelve al pool de captura.
+        anterior, self._resultado_mostrado = self._resultado_mostrado, resultado
+        if anterior is not None:
+            anterior.liberar()
+        self.last_frame = frame
         self.mostrar_frame_actual()
+        self.pipeline.marcar_mostrado(resultado)
+        if self.autoajuste is not None and self.autoajuste.necesita_calibracion:
+            # La calibración usa un frame real de la cámara
+            self.autoajuste.calibrar_en_segundo_plano(frame.copy())
 
-        feedback_text, feedback_color = feedback_ejercicio(angulo_detectado, ang_min, ang_max)
         self.feedback_label.config(text=feedback_text, foreground=self.rgb_to_hex(feedback_color))
+        self.actualizar_rendimiento()
+
+        # Programar siguiente consulta
+        self._after_id = self.root.after(1, self.update_frame)
+
+    def actualizar_rendimiento(self):
+        stats = self.pipeline.estadisticas()
+        stats.update(self.renderizador.estadisticas())
+        proceso = ""
+        if self.pipeline.filtro is not None:
+            proceso = f" | Predichos: {stats['frames_predichos_filtro']}"
+        if isinstance(self.pipeline.modelo, ModeloPoseProceso) and self.pipeline.pose is not None:
+            stats.update(self.pipeline.pose.estadisticas())
+            proceso += f" | Reinicios inferencia: {stats['reinicios_proceso']}"
+        grabacion = ""
+        if self.grabador is not None:
+            stats.update(self.grabador.estadisticas())
+            grabacion = (
+                f" | Grabados: {stats['frames_grabados']}"
+                f" (descartados: {stats['frames_descartados_grabacion']})"
+            )
+        if self.video_anotado is not None:
+            stats.update(self.video_anotado.estadisticas())
+            grabacion += (
+                f" | Video: {stats['frames_video']}"
+                f" (descartados: {stats['descartados_video']},"
+                f" cola: {stats['cola_video']}/{self.video_anotado.tam_cola})"
+            )
+            if self.video_anotado.error is not None:
+                grabacion += f" error: {self.video_anotado.error}"
+        calidad = ""
+        if self.autoajuste is not None:
+            self.autoajuste.evaluar()
+            calidad = f"\nCalidad: {self.autoajuste.descripcion()}"
+        self.rendimiento_label.config(
+            text=(
+                f"Latencia: {stats['latencia_ms']:.0f} ms | "
+                f"Inferencia: {stats['inferencia_ms']:.0f} ms | "
+                f"FPS: {stats['fps']:.1f} | "
+                f"Descartados: {stats['descartados_captura'] + stats['descartados_pantalla']} | "
+                f"k: {stats['k']} | "
+                f"Confianza: {stats['confianza']:.2f} | "
+                f"Ahorro ROI: {stats['ahorro_pixeles']:.0%} | "
+                f"Asignaciones render: {stats['asignaciones_render']} | "
+                f"Pool: {stats['pool_en_uso']}/{stats['pool_capacidad']} (esperas: {stats['pool_esperas']})"
+                + grabacion
+                + proceso
+                + calidad
+            )
+        )
 
-        # Programar siguiente frame
-        self._after_id = self.root.after(10, self.update_frame)
+    def _consultar_modelo(self):
+        if not modelo.listo:
+            self.root.after(100, self._consultar_modelo)
+            return
+        if modelo.error is not None:
+            self.rendimiento_label.config(text=f"Error al cargar el modelo: {modelo.error}")
+        elif self.pipeline is None:
+            self.rendimiento_label.config(text="Modelo listo")
+
+    def detener_pipeline(self):
+        if self.pipeline is not None:
+            self.pipeline.detener()
+            self.pipeline = None
+
+    def instante_sesion(self, t_captura):
+        return self._epoch_sesion + (t_captura - self._t0_sesion)
+
+    def detener_grabacion(self):
+        if self.grabador is not None:
+            # El conteo en vivo queda junto a la grabación (reproduccion.py --verificar)
+            self.grabador.cerrar({
+                "target_reps": self.contador.target_reps,
+                "target_series": self.contador.target_series,
+                "contador": self.contador.resumen(),
+            })
+            self.grabador = None
+
+    def detener_video_anotado(self):
+        if self.video_anotado is not None:
+            self.video_anotado.cerrar()
+            self.video_anotado = None
 
     def rgb_to_hex(self, rgb):
         return "#{:02x}{:02x}{:02x}".format(rgb[2], rgb[1], rgb[0])
 
-    def cerrar(self):
+    def detener_captura(self):
         self.running = False
+        if hasattr(self, '_after_id') and self._after_id is not None:
+            try:
+                self.root.after_cancel(self._after_id)
+            except Exception:
+                pass
+
+        self.detener_pipeline()
+        self.detener_grabacion()
+        self.detener_video_anotado()
+        self.cerrar_sesion_historial()
+        self.autoajuste = None
+        if self._resultado_mostrado is not None:
+            # Con el pipeline detenido nadie reescribe el buffer: last_frame sigue válido
+            self._resultado_mostrado.liberar()
+            self._resultado_mostrado = None
         if self.cap is not None and self.cap.isOpened():
             self.cap.release()
+            self.cap = None
+
+    def abrir_multicamara(self):
+        """
+        Abre una sesión con todas las cámaras detectadas en cuadrícula.
+        La captura de la vista principal se detiene para liberar su cámara.
+        """
+        if not self.camaras:
+            messagebox.showerror("Error", "No hay cámaras disponibles.")
+            return
+        self.detener_captura()
+
+        from multicamara import SesionMulticamara
+        SesionMulticamara(
+            self.root,
+            self.camaras,
+            ejercicio=self.ejercicio_var.get(),
+            lado=self.side_var.get(),
+            target_reps=self.target_reps_var.get(),
+            target_series=self.target_series_var.get()
+        )
+
+    def cerrar(self):
+        self.detener_captura()
+        if self.exportador is not None:
+            self.exportador.detener()
+        for modelo_proceso in self.modelos_proceso.values():
+            modelo_proceso.cerrar()
+        if self.historial_db is not None:
+            self.historial_db.cerrar()
         self.root.destroy()
 
-    def actualizar_camaras(self):
-        self.camaras = listar_camaras()
-        self.combo_camaras['values'] = [str(c) for c in self.camaras]
-        if self.camaras:
-            self.camara_var.set(str(self.camaras[0]))
+    def actualizar_camaras(self, forzar=True):
+        # Cola nueva por búsqueda: los resultados tardíos de una búsqueda
+        # anterior quedan en la cola vieja y se ignoran.
+        self._cola_camaras = queue.Queue()
+        cola = self._cola_camaras
+        self.camaras = []
+        self.info_camaras = {}
+        self.combo_camaras['values'] = []
+        self.camara_var.set("")
+        self.info_camara_label.config(text="Buscando cámaras...")
+        self.buscando_camaras = True
+        self.descubridor.descubrir(
+            lambda info: cola.put(("camara", info)),
+            lambda camaras: cola.put(("fin", camaras)),
+            forzar=forzar
+        )
+        self._consultar_camaras()
+
+    def _consultar_camaras(self):
+        try:
+            while True:
+                tipo, dato = self._cola_camaras.get_nowait()
+                if tipo == "camara":
+                    self.info_camaras[dato.indice] = dato
+                    self.camaras = sorted(self.info_camaras)
+                    self.combo_camaras['values'] = [str(c) for c in self.camaras]
+                    if not self.camara_var.get():
+                        self.camara_var.set(str(dato.indice))
+                    self.mostrar_info_camara()
+                else:
+                    self.buscando_camaras = False
+        except queue.Empty:
+            pass
+
+        if self.buscando_camaras:
+            self.root.after(50, self._consultar_camaras)
+        elif not self.camaras:
+            self.info_camara_label.config(text="")
+            messagebox.showwarning("Advertencia", "No se detectaron cámaras disponibles.")
+
+    def mostrar_info_camara(self):
+        try:
+            info = self.info_camaras.get(int(self.camara_var.get()))
+        except ValueError:
+            info = None
+        self.info_camara_label.config(text=info.descripcion() if info is not None else "")
 
     def iniciar_captura(self):
         if not self.camaras:
-            messagebox.showerror("Error", "No hay cámaras disponibles.")
+            if self.buscando_camaras:
+                messagebox.showinfo("Info", "Buscando cámaras, espere un momento.")
+            else:
+                messagebox.showerror("Error", "No hay cámaras disponibles.")
             return
 
         # Reiniciar cualquier captura previa
-        self.running = False
-        if hasattr(self, '_after_id') and self._after_id is not None:
-            try:
-                self.root.after_cancel(self._after_id)
-            except Exception:
-                pass
-
-        if self.cap is not None and self.cap.isOpened():
-            self.cap.release()
-            self.cap = None
+        self.detener_captura()
 
         try:
             cam_index = int(self.camara_var.get())
@@ -363,26 +720,97 @@ class PoseAppGUI:
             messagebox.showerror("Error", f"No se pudo abrir la cámara {cam_index}.")
             self.cap = None
             return
+        # Buffer mínimo en el driver: el pipeline ya descarta frames viejos
+        self.cap.set(cv2.CAP_PROP_BUFFERSIZE, 1)
 
         # — Reiniciar contadores y estadísticas —
+        self._t0_sesion = time.perf_counter()
+        self._epoch_sesion = time.time()
         self.reset_counters()
-        self.start_time = time.time()
-        self.series_start_time = self.start_time
+        self.abrir_sesion_historial(self._epoch_sesion)
 
         self.feedback_label.config(text="")
         self.counter_label.config(text="Reps: 0")
 
+        if self.grabar_var.get():
+            try:
+                self.grabador = GrabadorSesion(
+                    ruta_nueva_grabacion(),
+                    t_inicio=self._t0_sesion,
+                    inicio_epoch=self._epoch_sesion
+                )
+            except OSError as e:
+                messagebox.showerror("Error", f"No se pudo crear la grabación: {e}")
+
+        capacidad_pool = 6
+        if self.video_var.get():
+            try:
+                self.video_anotado = ExportadorVideo(ruta_nueva_exportacion())
+                # Los frames en la cola del exportador retienen buffers del pool
+                capacidad_pool += self.video_anotado.tam_cola
+            except OSError as e:
+                messagebox.showerror("Error", f"No se pudo crear el video: {e}")
+
+        if self.proceso_var.get():
+            modelos, fabrica = self.modelos_proceso, ModeloPoseProceso
+            if 1 not in modelos:
+                modelos[1] = ModeloPoseProceso(min_detection_confidence=0.5, min_tracking_confidence=0.5)
+                modelos[1].cargar_en_segundo_plano()
+        else:
+            modelos, fabrica = self.modelos, ModeloPose
+
         # Empezar conteo y captura
         self.running = True
+        self.pipeline = PipelinePose(
+            self.cap,
+            modelos[1],
+            adaptativo=self.adaptativo_var.get(),
+            roi=RecorteROI() if self.roi_var.get() else None,
+            metricas=self.metricas,
+            capacidad_pool=capacidad_pool,
+            filtro=FiltroLandmarks() if self.filtro_var.get() else None
+        )
+        if self.autoajuste_var.get():
+            try:
+                objetivo = max(10, self.latencia_objetivo_var.get())
+            except tk.TclError:
+                objetivo = 100
+            self.autoajuste = AutoAjuste(
+                self.pipeline,
+                objetivo,
+                modelos=modelos,
+                fabrica_modelo=fabrica,
+                ruta_registro=self.ruta_registro_autoajuste
+            )
+        self.pipeline.iniciar()
         self.update_frame()
 
+    def abrir_panel_vivo(self):
+        """
+        Abre (o trae al frente) el panel de estadísticas que se actualiza
+        durante el ejercicio.
+        """
+        if self.panel_vivo is not None and self.panel_vivo.abierto:
+            self.panel_vivo.ventana.lift()
+            return
+        from dashboard import PanelEnVivo
+        self.panel_vivo = PanelEnVivo(self.root, self.historial, self.estado_panel_vivo)
+
+    def estado_panel_vivo(self):
+        ang_min, ang_max = ejercicio_sesion(self.ejercicio_var.get(), self.side_var.get()).rango
+        texto = (
+            f"Reps: {self.contador.reps} | Series restantes: {self.contador.series_left} | "
+            f"Total sesión: {self.historial.reps_totales}"
+        )
+        return texto, ang_min, ang_max
+
     def mostrar_dashboard(self):
         """
         Este método es llamado cuando se presiona el botón "Ver Estadísticas".
         Si el ejercicio no ha terminado aún, muestra un aviso. Si ya terminó,
         abre la ventana con el dashboard.
         """
-        if self.end_time is None:
+        if not self.contador.terminado:
             messagebox.showinfo("Info", "Ejercicio no completado aún.")
             return
 
@@ -392,9 +820,10 @@ class PoseAppGUI:
         """
         Crea un Toplevel con las estadísticas de repeticiones por serie y duraciones.
         """
-        total_time = self.end_time - self.start_time if self.start_time and self.end_time else 0
-        total_series = len(self.reps_per_series)
-        total_reps = sum(self.reps_per_series)
+        stats = self.contador.resumen()
+        total_time = stats["tiempo_total"]
+        total_series = stats["series_completadas"]
+        total_reps = stats["reps_totales"]
 
         dash = tk.Toplevel(self.root)
         dash.title("Dashboard de Estadísticas")
@@ -409,11 +838,17 @@ class PoseAppGUI:
         lbl_stats.pack(pady=(10, 20), anchor="w", padx=10)
 
         # Crear gráfico de barras: reps por serie y duración por serie
-        fig, ax = plt.subplots(figsize=(8, 4), tight_layout=True)
+        # matplotlib solo se carga al abrir el dashboard
+        import numpy as np
+        from matplotlib.figure import Figure
+        from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
+
+        fig = Figure(figsize=(8, 4), tight_layout=True)
+        ax = fig.add_subplot()
 
         series_idx = list(range(1, total_series + 1))
-        series_dur = [round(d, 1) for d in self.series_times]
-        reps_x_serie = self.reps_per_series
+        series_dur = [round(d, 1) for d in stats["series_times"]]
+        reps_x_serie = stats["reps_per_series"]
 
         bar_width = 0.4
         ax.bar(
@@ -0,0 +1,411 @@
+# historial.py
+
+import argparse
+import os
+import queue
+import sqlite3
+import threading
+import time
+
+import numpy as np
+
+from progreso import ESQUEMA_RESUMENES, actualizar_resumenes
+
+RUTA_HISTORIAL = os.path.join("historial", "sesiones.db")
+
+# ————— Esquema —————
+#
+# Una fila por sesión y por serie; una por repetición (la tabla que crece a
+# millones). Los tiempos son epoch en segundos (time.time()), como los del
+# ContadorRepeticiones de la GUI. 'reps_totales' se guarda al cerrar la
+# sesión para que listar sesiones no tenga que contar repeticiones. Cada
+# repetición guarda su duración (la del detector, desde que entró en el
+# rango; NULL si no se conoce) y los ángulos mínimo y máximo que alcanzó,
+# para las tendencias de progreso.py.
+
+ESQUEMA = """
+CREATE TABLE IF NOT EXISTS pacientes (
+    id INTEGER PRIMARY KEY,
+    nombre TEXT NOT NULL UNIQUE
+);
+CREATE TABLE IF NOT EXISTS sesiones (
+    id INTEGER PRIMARY KEY,
+    paciente_id INTEGER NOT NULL REFERENCES pacientes(id),
+    ejercicio INTEGER NOT NULL,
+    lado TEXT NOT NULL,
+    inicio REAL NOT NULL,
+    fin REAL,
+    target_reps INTEGER,
+    target_series INTEGER,
+    terminada INTEGER NOT NULL DEFAULT 0,
+    reps_totales INTEGER NOT NULL DEFAULT 0
+);
+CREATE TABLE IF NOT EXISTS series (
+    sesion_id INTEGER NOT NULL REFERENCES sesiones(id),
+    numero INTEGER NOT NULL,
+    inicio REAL NOT NULL,
+    duracion REAL NOT NULL,
+    reps INTEGER NOT NULL,
+    PRIMARY KEY (sesion_id, numero)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS repeticiones (
+    sesion_id INTEGER NOT NULL REFERENCES sesiones(id),
+    serie INTEGER NOT NULL,
+    t REAL NOT NULL,
+    duracion REAL,
+    angulo_min REAL,
+    angulo_max REAL
+);
+CREATE INDEX IF NOT EXISTS sesiones_paciente ON sesiones (paciente_id, ejercicio, lado, inicio);
+CREATE INDEX IF NOT EXISTS sesiones_inicio ON sesiones (inicio);
+CREATE INDEX IF NOT EXISTS repeticiones_sesion ON repeticiones (sesion_id, t);
+"""
+
+# Columnas agregadas después de la primera versión del esquema
+COLUMNAS_NUEVAS = {
+    "repeticiones": (("duracion", "REAL"), ("angulo_min", "REAL"), ("angulo_max", "REAL")),
+}
+
+DIA = 86400.0
+
+
+def _migrar(conexion):
+    for tabla, columnas in COLUMNAS_NUEVAS.items():
+        existentes = {fila[1] for fila in conexion.execute(f"PRAGMA table_info({tabla})")}
+        for nombre, tipo in columnas:
+            if nombre not in existentes:
+                conexion.execute(f"ALTER TABLE {tabla} ADD COLUMN {nombre} {tipo}")
+
+
+def _conectar(ruta):
+    conexion = sqlite3.connect(ruta, timeout=10.0, check_same_thread=False)
+    # WAL: las consultas leen mientras el escritor escribe, sin bloquearse
+    conexion.execute("PRAGMA journal_mode=WAL")
+    conexion.execute("PRAGMA synchronous=NORMAL")
+    return conexion
+
+
+class SesionRegistrada:
+    """
+    Sesión abierta en un HistorialPersistente. Sus métodos solo encolan; el
+    id de la fila lo asigna el hilo escritor al insertarla ('id' vale None
+    hasta entonces), y como la cola es FIFO los eventos siguientes ya lo
+    encuentran.
+    """
+    __slots__ = ("historial", "id", "abierta", "reps")
+
+    def __init__(self, historial):
+        self.historial = historial
+        self.id = None
+        self.abierta = True
+        self.reps = 0
+
+    def registrar_rep(self, t, serie, duracion=None, angulo_min=None, angulo_max=None):
+        """
+        Encola una repetición de la serie 'serie' (desde 1). 'duracion' es la
+        de la repetición misma (DetectorRepeticiones.duracion_rep), no el
+        tiempo desde la anterior, que en la primera de la sesión o de cada
+        serie incluiría la preparación o el descanso; None (NULL) si no se
+        conoce, y así queda fuera del tempo de progreso.py. También el rango
+        de ángulos recorrido, si se conoce.
+        """
+        self.reps += 1
+        self.historial._encolar(("rep", self, serie, t, duracion, angulo_min, angulo_max), descartable=True)
+
+    def registrar_serie(self, numero, inicio, duracion, reps):
+        self.historial._encolar(("serie", self, numero, inicio, duracion, reps))
+
+    def finalizar(self, fin, terminada):
+        if not self.abierta:
+            return
+        self.abierta = False
+        self.historial._encolar(("fin", self, fin, terminada, self.reps))
+
+
+class HistorialPersistente:
+    """
+    Historial de sesiones, series y repeticiones en SQLite (modo WAL).
+
+    Como GrabadorSesion, las escrituras nunca tocan el disco desde el hilo
+    que las pide: se encolan y un hilo escritor las vuelca por lotes de hasta
+    'tam_lote' eventos en una sola transacción (un commit cada 'intervalo'
+    segundos como mucho). Si la cola se llena se descartan repeticiones
+    (contadas en 'descartados'); los eventos de sesión y serie esperan lugar.
+
+    Las consultas usan otra conexión y, gracias al WAL, no esperan al
+    escritor. Los índices cubren paciente, ejercicio, lado y fecha, así que
+    "las sesiones de rodilla de los últimos 90 días de este paciente" no
+    depende del tamaño de la tabla de repeticiones. Tras cada lote el
+    escritor actualiza además los resúmenes diarios y semanales de
+    progreso.py con las repeticiones nuevas.
+    """
+
+    def __init__(self, ruta=RUTA_HISTORIAL, tam_cola=4096, tam_lote=512, intervalo=0.5):
+        self.ruta = ruta
+        self.tam_lote = tam_lote
+        self.intervalo = intervalo
+
+        self.escritos = 0
+        self.descartados = 0
+        self.lotes = 0
+        self.error = None
+
+        carpeta = os.path.dirname(ruta)
+        if carpeta:
+            os.makedirs(carpeta, exist_ok=True)
+        self._escritura = _conectar(ruta)
+        self._escritura.executescript(ESQUEMA + ESQUEMA_RESUMENES)
+        _migrar(self._escritura)
+        self._escritura.commit()
+        self._lectura = _conectar(ruta)
+        self._lock_lectura = threading.Lock()
+        self._pacientes = {}
+
+        self._cola = queue.Queue(maxsize=tam_cola)
+        self._hilo = threading.Thread(target=self._bucle_escritura, name="historial", daemon=True)
+        self._hilo.start()
+
+    # — Escritura —
+
+    def iniciar_sesion(self, paciente, ejercicio, lado, inicio, target_reps=None, target_series=None):
+        sesion = SesionRegistrada(self)
+        self._encolar(("sesion", sesion, paciente, ejercicio, lado, inicio, target_reps, target_series))
+        return sesion
+
+    def _encolar(self, evento, descartable=False):
+        if self._hilo is None:
+            return
+        if descartable:
+            try:
+                self._cola.put_nowait(evento)
+            except queue.Full:
+                self.descartados += 1
+        else:
+            self._cola.put(evento)
+
+    def cerrar(self):
+        """
+        Escribe lo pendiente y cierra las conexiones.
+        """
+        if self._hilo is None:
+            return
+        self._cola.put(None)
+        self._hilo.join()
+        self._hilo = None
+        self._escritura.close()
+        with self._lock_lectura:
+            self._lectura.close()
+
+    def _bucle_escritura(self):
+        # Repeticiones de una base anterior a los resúmenes (o de otro proceso)
+        try:
+            with self._escritura:
+                actualizar_resumenes(self._escritura)
+        except sqlite3.Error as e:
+            self.error = e
+
+        fin = False
+        while not fin:
+            lote = [self._cola.get()]
+            limite = time.monotonic() + self.intervalo
+            # Se junta lo que llegue (hasta un lote o 'intervalo') en una transacción
+            while lote[-1] is not None and len(lote) < self.tam_lote:
+                restante = limite - time.monotonic()
+                if restante <= 0:
+                    break
+                try:
+                    lote.append(self._cola.get(timeout=restante))
+                except queue.Empty:
+                    break
+            fin = lote[-1] is None
+            if fin:
+                lote.pop()
+            if lote and self.error is None:
+                try:
+                    with self._escritura:
+                        self._escribir(lote)
+                        actualizar_resumenes(self._escritura)
+                    self.escritos += len(lote)
+                    self.lotes += 1
+                except sqlite3.Error as e:
+                    self.error = e
+
+    def _escribir(self, lote):
+        reps = []
+        for evento in lote:
+            tipo, sesion = evento[0], evento[1]
+            if tipo == "rep":
+                reps.append((sesion.id,) + evento[2:])
+                continue
+            # Las repeticiones acumuladas van antes, para respetar el orden
+            if reps:
+                self._insertar_reps(reps)
+                reps = []
+            if tipo == "sesion":
+                _, _, paciente, ejercicio, lado, inicio, target_reps, target_series = evento
+                cursor = self._escritura.execute(
+                    "INSERT INTO sesiones (paciente_id, ejercicio, lado, inicio, target_reps, target_series)"
+                    " VALUES (?, ?, ?, ?, ?, ?)",
+                    (self._id_paciente(paciente), ejercicio, lado, inicio, target_reps, target_series)
+                )
+                sesion.id = cursor.lastrowid
+            elif tipo == "serie":
+                self._escritura.execute("INSERT OR REPLACE INTO series VALUES (?, ?, ?, ?, ?)",
+                                        (sesion.id,) + evento[2:])
+            elif tipo == "fin":
+                _, _, fin, terminada, reps_totales = evento
+                self._escritura.execute(
+                    "UPDATE sesiones SET fin = ?, terminada = ?, reps_totales = ? WHERE id = ?",
+                    (fin, int(terminada), reps_totales, sesion.id)
+                )
+        if reps:
+            self._insertar_reps(reps)
+
+    def _insertar_reps(self, reps):
+        self._escritura.executemany(
+            "INSERT INTO repeticiones (sesion_id, serie, t, duracion, angulo_min, angulo_max)"
+            " VALUES (?, ?, ?, ?, ?, ?)",
+            reps
+        )
+
+    def _id_paciente(self, nombre):
+        id_ = self._pacientes.get(nombre)
+        if id_ is None:
+            self._escritura.execute("INSERT OR IGNORE INTO pacientes (nombre) VALUES (?)", (nombre,))
+            id_ = self._escritura.execute("SELECT id FROM pacientes WHERE nombre = ?", (nombre,)).fetchone()[0]
+            self._pacientes[nombre] = id_
+        return id_
+
+    def estadisticas(self):
+        return {
+            "eventos_historial": self.escritos,
+            "descartados_historial": self.descartados,
+            "pendientes_historial": self._cola.qsize(),
+            "lotes_historial": self.lotes,
+        }
+
+    # — Consultas —
+
+    def consultar(self, sql, parametros=()):
+        """
+        Ejecuta una consulta de lectura en la conexión de lectura (no espera
+        al escritor) y devuelve todas las filas.
+        """
+        with self._lock_lectura:
+            return self._lectura.execute(sql, parametros).fetchall()
+
+    def pacientes(self):
+        return [fila[0] for fila in self.consultar("SELECT nombre FROM pacientes ORDER BY nombre")]
+
+    def sesiones(self, paciente, ejercicio=None, lado=None, desde=None, hasta=None):
+        """
+        Sesiones de 'paciente' (más recientes primero), filtradas por
+        ejercicio (1=brazo, 2=pierna), lado y rango de fechas [desde, hasta)
+        en epoch. Cada una es un diccionario.
+        """
+        condiciones = ["p.nombre = ?"]
+        parametros = [paciente]
+        for columna, operador, valor in (("ejercicio", "=", ejercicio), ("lado", "=", lado),
+                                         ("inicio", ">=", desde), ("inicio", "<", hasta)):
+            if valor is not None:
+                condiciones.append(f"s.{columna} {operador} ?")
+                parametros.append(valor)
+        filas = self.consultar(
+            "SELECT s.id, s.ejercicio, s.lado, s.inicio, s.fin, s.target_reps, s.target_series,"
+            " s.terminada, s.reps_totales"
+            " FROM sesiones s JOIN pacientes p ON p.id = s.paciente_id"
+            f" WHERE {' AND '.join(condiciones)} ORDER BY s.inicio DESC",
+            parametros
+        )
+        columnas = ("id", "ejercicio", "lado", "inicio", "fin", "target_reps", "target_series",
+                    "terminada", "reps_totales")
+        sesiones = [dict(zip(columnas, fila)) for fila in filas]
+        for sesion in sesiones:
+            sesion["terminada"] = bool(sesion["terminada"])
+        return sesiones
+
+    def sesiones_recientes(self, paciente, dias=90, ejercicio=None, lado=None, ahora=None):
+        ahora = time.time() if ahora is None else ahora
+        return self.sesiones(paciente, ejercicio, lado, desde=ahora - dias * DIA)
+
+    def series(self, sesion_id):
+        filas = self.consultar(
+            "SELECT numero, inicio, duracion, reps FROM series WHERE sesion_id = ? ORDER BY numero",
+            (sesion_id,)
+        )
+        return [dict(zip(("numero", "inicio", "duracion", "reps"), fila)) for fila in filas]
+
+    def repeticiones(self, sesion_id):
+        """
+        Instantes (epoch) de las repeticiones de una sesión, como array.
+        """
+        filas = self.consultar("SELECT t FROM repeticiones WHERE sesion_id = ? ORDER BY t", (sesion_id,))
+        return np.array([fila[0] for fila in filas], dtype=np.float64)
+
+
+# ————— Línea de comandos —————
+
+def poblar_sintetico(historial, pacientes=100, sesiones=20000, reps_por_sesion=100, dias=365, semilla=0):
+    """
+    Llena 'historial' con datos de prueba para medir consultas. Usa la misma
+    cola que la GUI, así también mide el escritor.
+    """
+    rng = np.random.default_rng(semilla)
+    ahora = time.time()
+    for i in range(sesiones):
+        inicio = ahora - rng.uniform(0, dias) * DIA
+        sesion = historial.iniciar_sesion(
+            f"paciente_{rng.integers(pacientes)}", int(rng.integers(1, 3)), ("izq", "der")[rng.integers(2)],
+            inicio, target_reps=10, target_series=reps_por_sesion // 10
+        )
+        duraciones = rng.normal(2.0, 0.3, reps_por_sesion).clip(0.5)
+        minimos = rng.normal(100.0, 8.0, reps_por_sesion)
+        maximos = minimos + rng.normal(70.0, 6.0, reps_por_sesion)
+        t = inicio
+        for r in range(reps_por_sesion):
+            t += float(duraciones[r])
+            # Esperar en lugar de descartar: aquí no hay nada que atender en tiempo real
+            historial._cola.put(("rep", sesion, r // 10 + 1, t, float(duraciones[r]),
+                                 float(minimos[r]), float(maximos[r])))
+            sesion.reps += 1
+        sesion.finalizar(t, True)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Consulta el historial persistente de sesiones.")
+    parser.add_argument("ruta", nargs="?", default=RUTA_HISTORIAL, help="Archivo SQLite del historial")
+    parser.add_argument("--paciente", default=None, help="Paciente a consultar (sin él, lista los pacientes)")
+    parser.add_argument("--dias", type=float, default=90, help="Ventana hacia atrás en días")
+    parser.add_argument("--ejercicio", type=int, choices=(1, 2), default=None,
+                        help="1 = parte superior (codo), 2 = parte inferior (rodilla)")
+    parser.add_argument("--lado", choices=("izq", "der"), default=None)
+    parser.add_argument("--sintetico", type=int, default=0, metavar="SESIONES",
+                        help="Antes de consultar, agrega este número de sesiones de prueba (100 reps cada una)")
+    args = parser.parse_args(argv)
+
+    historial = HistorialPersistente(args.ruta)
+    try:
+        if args.sintetico:
+            t0 = time.perf_counter()
+            poblar_sintetico(historial, sesiones=args.sintetico)
+            historial.cerrar()
+            print(f"{args.sintetico} sesiones escritas en {time.perf_counter() - t0:.1f} s")
+            historial = HistorialPersistente(args.ruta)
+
+        if args.paciente is None:
+            print("\n".join(historial.pacientes()))
+            return
+        t0 = time.perf_counter()
+        sesiones = historial.sesiones_recientes(args.paciente, args.dias, args.ejercicio, args.lado)
+        t_consulta = time.perf_counter() - t0
+        for s in sesiones:
+            print(f"{time.strftime('%Y-%m-%d %H:%M', time.localtime(s['inicio']))}  "
+                  f"ejercicio {s['ejercicio']} {s['lado']}  {s['reps_totales']} reps"
+                  + ("" if s["terminada"] else " (incompleta)"))
+        print(f"{len(sesiones)} sesiones en {t_consulta * 1000:.2f} ms")
+    finally:
+        historial.cerrar()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,345 @@
+# inferencia_proceso.py
+
+import multiprocessing
+import os
+import queue
+import threading
+import time
+import weakref
+from collections import deque
+from multiprocessing import shared_memory
+
+import cv2
+import numpy as np
+
+from pose_utils import NUM_LANDMARKS
+
+# Frame más grande que entra en una ranura sin reducirse (alto, ancho, canales)
+FORMA_MAXIMA = (1080, 1920, 3)
+
+
+def _trabajador_pose(nombre_frames, nombre_landmarks, ranuras, tam_ranura, entrada, salida, opciones):
+    """
+    Proceso de inferencia. Lee cada frame directamente de su ranura de
+    memoria compartida (una vista NumPy, sin copiar), corre pose.process()
+    y escribe los landmarks (33, 4) en la ranura de resultados; por la cola
+    solo viajan índices y tiempos.
+    """
+    import mediapipe as mp
+    from pose_utils import landmarks_a_array
+
+    cv2.setNumThreads(1)
+    memoria = shared_memory.SharedMemory(name=nombre_frames)
+    memoria_landmarks = shared_memory.SharedMemory(name=nombre_landmarks)
+    landmarks = np.ndarray((ranuras, NUM_LANDMARKS, 4), dtype=np.float32, buffer=memoria_landmarks.buf)
+    try:
+        pose = mp.solutions.pose.Pose(**opciones)
+    except Exception as e:
+        salida.put(("error", repr(e)))
+        return
+    salida.put(("listo", os.getpid()))
+
+    while True:
+        mensaje = entrada.get()
+        if mensaje is None:
+            break
+        secuencia, ranura, forma = mensaje
+        frame = np.ndarray(forma, dtype=np.uint8, buffer=memoria.buf, offset=ranura * tam_ranura)
+        t0 = time.perf_counter()
+        resultados = pose.process(frame)
+        t_inferencia = time.perf_counter() - t0
+        detectado = resultados.pose_landmarks is not None
+        if detectado:
+            landmarks[ranura] = landmarks_a_array(resultados.pose_landmarks.landmark)
+        salida.put((secuencia, ranura, detectado, t_inferencia))
+        del frame
+
+    pose.close()
+    # Las vistas tienen que soltarse antes de cerrar la memoria
+    del landmarks
+    memoria.close()
+    memoria_landmarks.close()
+
+
+class _Landmarks:
+    __slots__ = ("landmark",)
+
+    def __init__(self, datos):
+        self.landmark = datos
+
+
+class ResultadoPose:
+    """
+    Igual que el resultado de pose.process() para quien solo usa
+    'pose_landmarks.landmark', pero con el array (33, 4) en lugar de la
+    lista de protobufs (landmarks_a_array lo acepta tal cual).
+    """
+    __slots__ = ("pose_landmarks",)
+
+    def __init__(self, datos=None):
+        self.pose_landmarks = _Landmarks(datos) if datos is not None else None
+
+
+def _liberar_memoria(*memorias):
+    for memoria in memorias:
+        try:
+            memoria.close()
+            memoria.unlink()
+        except (FileNotFoundError, BufferError):
+            pass
+
+
+class PoseEnProceso:
+    """
+    Pose de MediaPipe en un proceso dedicado, para que la inferencia no
+    compita por el GIL con Tk, el conteo o matplotlib.
+
+    Los frames se pasan por un anillo de 'ranuras' bloques de memoria
+    compartida: enviar() copia el frame a una ranura libre (una sola copia,
+    memcpy) y el proceso lo lee como vista NumPy; los landmarks vuelven en
+    otro bloque compartido como arrays (33, 4). Con más de una ranura se
+    puede enviar el frame siguiente mientras el anterior se procesa.
+
+    Supervisión: si el proceso muere o no responde en 'timeout' segundos se
+    reinicia (los frames en vuelo vuelven sin pose) hasta 'max_reinicios'
+    veces por 'ventana_reinicios' segundos; pasado eso, process() lanza
+    RuntimeError.
+
+    process() tiene la misma interfaz que mp_pose.Pose.process(), así se
+    puede usar donde hoy se usa la instancia de ModeloPose.
+    """
+
+    def __init__(self, opciones=None, ranuras=2, forma_maxima=FORMA_MAXIMA, timeout=5.0,
+                 timeout_carga=60.0, max_reinicios=5, ventana_reinicios=60.0):
+        self.opciones = opciones or {"min_detection_confidence": 0.5, "min_tracking_confidence": 0.5}
+        self.ranuras = ranuras
+        self.forma_maxima = forma_maxima
+        self.tam_ranura = int(np.prod(forma_maxima))
+        self.timeout = timeout
+        self.timeout_carga = timeout_carga
+        self.max_reinicios = max_reinicios
+        self.ventana_reinicios = ventana_reinicios
+
+        self._memoria = shared_memory.SharedMemory(create=True, size=ranuras * self.tam_ranura)
+        self._memoria_landmarks = shared_memory.SharedMemory(
+            create=True, size=ranuras * NUM_LANDMARKS * 4 * np.dtype(np.float32).itemsize
+        )
+        self._landmarks = np.ndarray((ranuras, NUM_LANDMARKS, 4), dtype=np.float32,
+                                     buffer=self._memoria_landmarks.buf)
+        self._finalizador = weakref.finalize(self, _liberar_memoria, self._memoria, self._memoria_landmarks)
+
+        self._contexto = multiprocessing.get_context("spawn")
+        self._proceso = None
+        self._entrada = None
+        self._salida = None
+        self._libres = deque(range(ranuras))
+        self._en_vuelo = deque()        # (secuencia, ranura) en orden de envío
+        self._secuencia = 0
+        self._lock = threading.Lock()
+        self._t_reinicios = deque()
+
+        # ————— Estadísticas —————
+        self.frames = 0
+        self.reinicios = 0
+        self.fallos = 0                 # Frames perdidos por caídas o cuelgues
+        self.reducidos = 0              # Frames reducidos por no entrar en la ranura
+
+        self._arrancar()
+
+    # — Proceso —
+
+    def _arrancar(self):
+        self._entrada = self._contexto.Queue()
+        self._salida = self._contexto.Queue()
+        self._proceso = self._contexto.Process(
+            target=_trabajador_pose,
+            args=(self._memoria.name, self._memoria_landmarks.name, self.ranuras, self.tam_ranura,
+                  self._entrada, self._salida, self.opciones),
+            name="pose-en-proceso",
+            daemon=True
+        )
+        self._proceso.start()
+        try:
+            tipo, detalle = self._salida.get(timeout=self.timeout_carga)
+        except queue.Empty:
+            self._terminar()
+            raise RuntimeError("El proceso de inferencia no terminó de cargar el modelo")
+        if tipo == "error":
+            self._terminar()
+            raise RuntimeError(f"El proceso de inferencia no pudo crear el modelo: {detalle}")
+
+    def _terminar(self):
+        if self._proceso is None:
+            return
+        if self._proceso.is_alive():
+            try:
+                self._entrada.put(None)
+            except (OSError, ValueError):
+                pass
+            self._proceso.join(1.0)
+            if self._proceso.is_alive():
+                self._proceso.terminate()
+                self._proceso.join(1.0)
+        self._proceso = None
+
+    def _reiniciar(self):
+        ahora = time.monotonic()
+        self._t_reinicios.append(ahora)
+        while self._t_reinicios and ahora - self._t_reinicios[0] > self.ventana_reinicios:
+            self._t_reinicios.popleft()
+        if len(self._t_reinicios) > self.max_reinicios:
+            raise RuntimeError(
+                f"El proceso de inferencia se reinició más de {self.max_reinicios} veces "
+                f"en {self.ventana_reinicios:.0f} s"
+            )
+        self.reinicios += 1
+        self.fallos += len(self._en_vuelo)
+        self._en_vuelo.clear()
+        self._libres = deque(range(self.ranuras))
+        self._terminar()
+        self._arrancar()
+
+    @property
+    def vivo(self):
+        return self._proceso is not None and self._proceso.is_alive()
+
+    # — Inferencia —
+
+    def _preparar(self, frame_rgb):
+        if frame_rgb.nbytes <= self.tam_ranura and frame_rgb.dtype == np.uint8:
+            return frame_rgb
+        # No entra en la ranura: se reduce (los landmarks son normalizados)
+        self.reducidos += 1
+        alto, ancho = frame_rgb.shape[:2]
+        escala = min(self.forma_maxima[0] / alto, self.forma_maxima[1] / ancho)
+        return cv2.resize(frame_rgb, (int(ancho * escala), int(alto * escala)), interpolation=cv2.INTER_AREA)
+
+    def enviar(self, frame_rgb):
+        """
+        Copia 'frame_rgb' a una ranura libre y lo encola. Si no hay ranuras
+        libres espera el resultado más viejo (que se pierde).
+        """
+        with self._lock:
+            return self._enviar(frame_rgb)
+
+    def _enviar(self, frame_rgb):
+        if not self._libres:
+            self._recibir()
+        frame_rgb = self._preparar(frame_rgb)
+        ranura = self._libres.popleft()
+        destino = np.ndarray(frame_rgb.shape, dtype=np.uint8, buffer=self._memoria.buf,
+                             offset=ranura * self.tam_ranura)
+        np.copyto(destino, frame_rgb)
+        self._secuencia += 1
+        self._en_vuelo.append((self._secuencia, ranura))
+        self._entrada.put((self._secuencia, ranura, frame_rgb.shape))
+        return self._secuencia
+
+    def recibir(self):
+        """
+        Resultado (ResultadoPose, segundos de inferencia) del frame enviado
+        hace más tiempo, o None si no hay frames en vuelo.
+        """
+        with self._lock:
+            return self._recibir()
+
+    def _recibir(self):
+        if not self._en_vuelo:
+            return None
+        limite = time.monotonic() + self.timeout
+        while True:
+            try:
+                secuencia, ranura, detectado, t_inferencia = self._salida.get(timeout=0.1)
+                break
+            except queue.Empty:
+                if not self._proceso.is_alive() or time.monotonic() > limite:
+                    self._reiniciar()
+                    return ResultadoPose(), 0.0
+        esperado, _ = self._en_vuelo.popleft()
+        if secuencia != esperado:
+            # No debería pasar (la cola es FIFO): se resincroniza reiniciando
+            self._reiniciar()
+            return ResultadoPose(), 0.0
+        datos = self._landmarks[ranura].copy() if detectado else None
+        self._libres.append(ranura)
+        self.frames += 1
+        return ResultadoPose(datos), t_inferencia
+
+    def process(self, frame_rgb):
+        """
+        Envía el frame y espera su resultado, como mp_pose.Pose.process().
+        """
+        with self._lock:
+            # Resultados pendientes de enviar() sin recibir() se descartan
+            while self._en_vuelo:
+                self._recibir()
+            self._enviar(frame_rgb)
+            resultado, _ = self._recibir()
+            return resultado
+
+    def estadisticas(self):
+        return {
+            "frames_proceso": self.frames,
+            "reinicios_proceso": self.reinicios,
+            "fallos_proceso": self.fallos,
+            "reducidos_proceso": self.reducidos,
+        }
+
+    def close(self):
+        with self._lock:
+            self._terminar()
+            del self._landmarks
+            self._finalizador()
+
+
+class ModeloPoseProceso:
+    """
+    Equivalente de ModeloPose con la inferencia en otro proceso: arranca el
+    proceso (que importa MediaPipe y construye el modelo) en un hilo de fondo
+    y obtener() devuelve el PoseEnProceso.
+    """
+
+    def __init__(self, **opciones):
+        self.opciones = opciones or {"min_detection_confidence": 0.5, "min_tracking_confidence": 0.5}
+        self._pose = None
+        self._error = None
+        self._listo = threading.Event()
+        self._hilo = None
+
+    def cargar_en_segundo_plano(self):
+        if self._hilo is None:
+            self._hilo = threading.Thread(target=self._cargar, name="carga-modelo-proceso", daemon=True)
+            self._hilo.start()
+        return self
+
+    def _cargar(self):
+        try:
+            pose = PoseEnProceso(self.opciones)
+            # Calentamiento, igual que ModeloPose
+            pose.process(np.zeros((256, 256, 3), dtype=np.uint8))
+            self._pose = pose
+        except Exception as e:
+            self._error = e
+        finally:
+            self._listo.set()
+
+    @property
+    def listo(self):
+        return self._listo.is_set()
+
+    @property
+    def error(self):
+        return self._error
+
+    def obtener(self, timeout=None):
+        self.cargar_en_segundo_plano()
+        if not self._listo.wait(timeout):
+            raise TimeoutError("El modelo de pose todavía se está cargando")
+        if self._error is not None:
+            raise RuntimeError("No se pudo cargar el modelo de pose") from self._error
+        return self._pose
+
+    def cerrar(self):
+        if self._pose is not None:
+            self._pose.close()
+            self._pose = None
@@ -1,8 +1,76 @@
-import tkinter as tk
-from gui import PoseAppGUI
+import arranque
+
+import argparse
+
+with arranque.medir_importaciones():
+    import tkinter as tk
+    from gui import PoseAppGUI, modelo
+
+
+def reportar_arranque(root, ruta):
+    # El reporte se emite cuando el modelo termina de cargarse en segundo plano
+    if not modelo.listo:
+        root.after(200, reportar_arranque, root, ruta)
+        return
+    arranque.marcar("modelo listo")
+    print(arranque.texto_reporte())
+    if ruta:
+        arranque.guardar_reporte(ruta)
+
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument(
+        "--reporte-arranque",
+        nargs="?",
+        const="",
+        default=None,
+        metavar="ARCHIVO.json",
+        help="Muestra los tiempos de arranque (y opcionalmente los guarda en JSON)"
+    )
+    parser.add_argument(
+        "--metricas",
+        default=None,
+        metavar="ARCHIVO",
+        help="Exporta métricas de rendimiento periódicamente (.csv o líneas JSON)"
+    )
+    parser.add_argument(
+        "--intervalo-metricas",
+        type=float,
+        default=10.0,
+        metavar="SEGUNDOS",
+        help="Cada cuántos segundos se exportan las métricas"
+    )
+    parser.add_argument(
+        "--historial",
+        default=None,
+        metavar="ARCHIVO.db",
+        help="Base SQLite del historial de sesiones (por defecto historial/sesiones.db)"
+    )
+    parser.add_argument(
+        "--inferencia-proceso",
+        action="store_true",
+        help="Corre MediaPipe en un proceso aparte (memoria compartida) en lugar del de la GUI"
+    )
+    parser.add_argument(
+        "--registro-autoajuste",
+        default=None,
+        metavar="ARCHIVO.jsonl",
+        help="Registra cada decisión del autoajuste de calidad (una línea JSON por decisión)"
+    )
+    args = parser.parse_args()
+
     root = tk.Tk()
     ejercicio_var = tk.IntVar(value=1)
-    app = PoseAppGUI(root, root.destroy, ejercicio_var)
-    root.mainloop()
\ No newline at end of file
+    with arranque.medir("PoseAppGUI()"):
+        app = PoseAppGUI(root, root.destroy, ejercicio_var)
+    root.after_idle(arranque.marcar, "ventana visible")
+    if args.metricas:
+        app.exportar_metricas(args.metricas, args.intervalo_metricas)
+    app.ruta_registro_autoajuste = args.registro_autoajuste
+    if args.historial:
+        app.ruta_historial = args.historial
+    app.proceso_var.set(args.inferencia_proceso)
+    if args.reporte_arranque is not None:
+        reportar_arranque(root, args.reporte_arranque)
+    root.mainloop()
@@ -0,0 +1,228 @@
+# metricas.py
+
+import csv
+import json
+import os
+import threading
+import time
+
+import cv2
+import numpy as np
+
+# Etapas del camino caliente que se miden (segundos por frame)
+ETAPAS = (
+    "captura",      # cap.read()
+    "conversion",   # cvtColor BGR -> RGB
+    "inferencia",   # recorte + pose.process()
+    "prediccion",   # frames extrapolados (inferencia adaptativa)
+    "filtro",       # FiltroLandmarks (suavizado y predicción en huecos)
+    "dibujo",       # esqueleto sobre el frame
+    "conteo",       # ángulo + ContadorRepeticiones en el hilo de Tk
+    "render",       # RenderizadorPanel.mostrar()
+    "latencia",     # captura -> pantalla
+)
+PERCENTILES = (50, 95, 99)
+
+
+class BufferCircular:
+    """
+    Últimas 'capacidad' muestras en un array float64 preasignado.
+    Pensado para un único hilo escritor: agregar() no toma locks (escribe la
+    muestra y después avanza el contador) y los lectores copian el array,
+    así que a lo sumo leen una muestra a medio reemplazar.
+    """
+    __slots__ = ("datos", "capacidad", "total")
+
+    def __init__(self, capacidad=512):
+        self.capacidad = capacidad
+        self.datos = np.zeros(capacidad, dtype=np.float64)
+        self.total = 0
+
+    def agregar(self, valor):
+        self.datos[self.total % self.capacidad] = valor
+        self.total += 1
+
+    def valores(self):
+        """
+        Copia de las muestras disponibles (sin orden temporal).
+        """
+        n = min(self.total, self.capacidad)
+        return self.datos[:n].copy()
+
+    def ultimo(self):
+        if not self.total:
+            return None
+        return float(self.datos[(self.total - 1) % self.capacidad])
+
+
+class Metricas:
+    """
+    Tiempos por etapa del camino caliente. Cada etapa tiene su propio
+    BufferCircular y la escribe un solo hilo (captura, inferencia o Tk), así
+    registrar() cuesta una asignación en un array y nada más.
+    """
+
+    def __init__(self, capacidad=512, etapas=ETAPAS):
+        self.buffers = {etapa: BufferCircular(capacidad) for etapa in etapas}
+        self.frames = BufferCircular(capacidad)     # Instantes de frames mostrados (para FPS)
+
+    def registrar(self, etapa, segundos):
+        self.buffers[etapa].agregar(segundos)
+
+    def marcar_frame(self, instante):
+        self.frames.agregar(instante)
+
+    def media(self, etapa):
+        valores = self.buffers[etapa].valores()
+        return float(valores.mean()) if len(valores) else 0.0
+
+    def fps(self):
+        """
+        FPS de las últimas muestras de frames mostrados.
+        """
+        instantes = self.frames.valores()
+        if len(instantes) < 2:
+            return 0.0
+        transcurrido = instantes.max() - instantes.min()
+        return (len(instantes) - 1) / transcurrido if transcurrido > 0 else 0.0
+
+    def instantanea(self):
+        """
+        Resumen serializable: FPS y, por etapa, n, media y percentiles en ms
+        (None mientras la etapa no tenga muestras; las claves son siempre las
+        mismas, así las filas CSV no cambian de columnas).
+        """
+        etapas = {}
+        for etapa, buffer in self.buffers.items():
+            valores = buffer.valores() * 1000.0
+            resumen = {"n": buffer.total, "media_ms": float(valores.mean()) if len(valores) else None}
+            percentiles = np.percentile(valores, PERCENTILES) if len(valores) else [None] * len(PERCENTILES)
+            for p, v in zip(PERCENTILES, percentiles):
+                resumen[f"p{p}_ms"] = None if v is None else float(v)
+            etapas[etapa] = resumen
+        return {"t": time.time(), "fps": self.fps(), "etapas": etapas}
+
+
+# ————— HUD —————
+
+class HUDRendimiento:
+    """
+    Superposición con FPS, inferencia, render y frames descartados.
+    El texto se recalcula como mucho cada 'intervalo' segundos; por frame
+    solo se dibuja (sobre el buffer ya escalado del RenderizadorPanel, así el
+    tamaño del texto no depende de la resolución de la cámara).
+    """
+
+    def __init__(self, fuente, intervalo=0.25):
+        self.fuente = fuente            # Callable que devuelve la instantánea
+        self.intervalo = intervalo
+        self.activo = False
+        self._lineas = []
+        self._t_lineas = 0.0
+
+    def _actualizar_lineas(self):
+        datos = self.fuente()
+        etapas = datos["etapas"]
+
+        def ms(etapa):
+            e = etapas.get(etapa)
+            return f"{e['media_ms']:.1f} ms (p95 {e['p95_ms']:.1f})" if e and e["n"] else "-"
+
+        self._lineas = [
+            f"FPS: {datos['fps']:.1f}",
+            f"Inferencia: {ms('inferencia')}",
+            f"Render: {ms('render')}",
+            f"Latencia: {ms('latencia')}",
+            f"Descartados: {datos.get('descartados', 0)}",
+            f"Pool: {datos.get('pool_en_uso', 0)} en uso, {datos.get('pool_esperas', 0)} esperas",
+        ]
+
+    def __call__(self, imagen_rgb):
+        if not self.activo:
+            return
+        ahora = time.perf_counter()
+        if ahora - self._t_lineas >= self.intervalo:
+            self._actualizar_lineas()
+            self._t_lineas = ahora
+
+        alto_linea = 18
+        cv2.rectangle(imagen_rgb, (4, 4), (250, 10 + alto_linea * len(self._lineas)), (0, 0, 0), -1)
+        for i, linea in enumerate(self._lineas):
+            cv2.putText(imagen_rgb, linea, (10, 4 + alto_linea * (i + 1)),
+                        cv2.FONT_HERSHEY_SIMPLEX, 0.45, (0, 255, 0), 1, cv2.LINE_AA)
+
+
+# ————— Exportación periódica —————
+
+def _aplanar(datos, prefijo=""):
+    plano = {}
+    for clave, valor in datos.items():
+        nombre = f"{prefijo}{clave}"
+        if isinstance(valor, dict):
+            plano.update(_aplanar(valor, nombre + "."))
+        else:
+            plano[nombre] = valor
+    return plano
+
+
+class ExportadorMetricas:
+    """
+    Escribe una instantánea de métricas cada 'intervalo' segundos desde un
+    hilo propio. Con extensión .csv agrega una fila por instantánea
+    (columnas aplanadas, p. ej. 'etapas.inferencia.p95_ms'); con cualquier
+    otra, una línea JSON por instantánea.
+    """
+
+    def __init__(self, fuente, ruta, intervalo=10.0):
+        self.fuente = fuente
+        self.ruta = ruta
+        self.intervalo = intervalo
+        self.error = None
+        self._columnas = None
+        self._detener = threading.Event()
+        self._hilo = None
+
+    def iniciar(self):
+        self._detener.clear()
+        self._hilo = threading.Thread(target=self._bucle, name="exportador-metricas", daemon=True)
+        self._hilo.start()
+
+    def detener(self):
+        """
+        Escribe una última instantánea y termina el hilo.
+        """
+        if self._hilo is None:
+            return
+        self._detener.set()
+        self._hilo.join()
+        self._hilo = None
+
+    def _bucle(self):
+        while not self._detener.wait(self.intervalo):
+            self.exportar()
+        self.exportar()
+
+    def exportar(self):
+        try:
+            datos = self.fuente()
+            if self.ruta.lower().endswith(".csv"):
+                self._escribir_csv(_aplanar(datos))
+            else:
+                with open(self.ruta, "a", encoding="utf-8") as f:
+                    f.write(json.dumps(datos, ensure_ascii=False) + "\n")
+        except (OSError, ValueError) as e:
+            self.error = e
+
+    def _escribir_csv(self, fila):
+        nuevo = not os.path.exists(self.ruta) or os.path.getsize(self.ruta) == 0
+        if self._columnas is None:
+            if nuevo:
+                self._columnas = list(fila)
+            else:
+                with open(self.ruta, newline="", encoding="utf-8") as f:
+                    self._columnas = next(csv.reader(f), None) or list(fila)
+        with open(self.ruta, "a", newline="", encoding="utf-8") as f:
+            escritor = csv.DictWriter(f, fieldnames=self._columnas, extrasaction="ignore", restval="")
+            if nuevo:
+                escritor.writeheader()
+            escritor.writerow(fila)
@@ -0,0 +1,62 @@
+# modelo.py
+
+import threading
+
+import numpy as np
+
+from arranque import medir
+
+
+class ModeloPose:
+    """
+    Construcción diferida de mp_pose.Pose.
+    MediaPipe se importa, el modelo se construye y se "calienta" con una
+    inferencia sobre una imagen vacía en un hilo de fondo, mientras el
+    usuario elige ejercicio y cámara. obtener() espera a que termine.
+    """
+
+    def __init__(self, **opciones):
+        self.opciones = opciones or {"min_detection_confidence": 0.5, "min_tracking_confidence": 0.5}
+        self._pose = None
+        self._error = None
+        self._listo = threading.Event()
+        self._hilo = None
+
+    def cargar_en_segundo_plano(self):
+        if self._hilo is None:
+            self._hilo = threading.Thread(target=self._cargar, name="carga-modelo", daemon=True)
+            self._hilo.start()
+        return self
+
+    def _cargar(self):
+        try:
+            with medir("import mediapipe"):
+                import mediapipe as mp
+            with medir("mp_pose.Pose()"):
+                pose = mp.solutions.pose.Pose(**self.opciones)
+            with medir("calentamiento (inferencia vacía)"):
+                pose.process(np.zeros((256, 256, 3), dtype=np.uint8))
+            self._pose = pose
+        except Exception as e:
+            self._error = e
+        finally:
+            self._listo.set()
+
+    @property
+    def listo(self):
+        return self._listo.is_set()
+
+    @property
+    def error(self):
+        return self._error
+
+    def obtener(self, timeout=None):
+        """
+        Devuelve la instancia de Pose, cargándola si nadie lo pidió antes.
+        """
+        self.cargar_en_segundo_plano()
+        if not self._listo.wait(timeout):
+            raise TimeoutError("El modelo de pose todavía se está cargando")
+        if self._error is not None:
+            raise RuntimeError("No se pudo cargar el modelo de pose") from self._error
+        return self._pose
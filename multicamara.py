@@ -0,0 +1,393 @@
+# multicamara.py
+
+import math
+import multiprocessing
+import os
+import queue
+import threading
+import time
+import tkinter as tk
+from collections import deque
+from tkinter import ttk, messagebox
+
+import cv2
+
+from contador import ContadorRepeticiones, EVENTO_FIN
+from pipeline import ColaUltimo, ResultadoFrame, dibujar_landmarks, reducir_frame
+from pose_utils import LandmarkFrame, detectar_angulo, feedback_ejercicio, obtener_rango_ejercicio
+from render import RenderizadorPanel
+
+
+def _trabajador_inferencia(entrada, salida, opciones):
+    """
+    Proceso de inferencia. Mantiene una instancia de Pose por flujo (el
+    seguimiento temporal de MediaPipe es por secuencia de video) y devuelve
+    solo los landmarks como array (33, 4), nunca la imagen. Si MediaPipe
+    falla, responde datos None con el mensaje de error y sigue atendiendo.
+    """
+    import mediapipe as mp
+    from pose_utils import landmarks_a_array
+
+    cv2.setNumThreads(1)
+    poses = {}
+    while True:
+        item = entrada.get()
+        if item is None:
+            break
+        indice, frame_rgb, t_captura = item
+        t0 = time.perf_counter()
+        try:
+            pose = poses.get(indice)
+            if pose is None:
+                pose = poses[indice] = mp.solutions.pose.Pose(**opciones)
+            resultados = pose.process(frame_rgb)
+        except Exception as e:
+            # La Pose del flujo se descarta y se recrea con su próximo frame
+            pose = poses.pop(indice, None)
+            if pose is not None:
+                pose.close()
+            salida.put((indice, None, t_captura, 0.0, str(e)))
+            continue
+        t_inferencia = time.perf_counter() - t0
+
+        datos = None
+        if resultados.pose_landmarks:
+            datos = landmarks_a_array(resultados.pose_landmarks.landmark)
+        salida.put((indice, datos, t_captura, t_inferencia, None))
+
+    for pose in poses.values():
+        pose.close()
+
+
+class FlujoCamara:
+    """
+    Estado de una cámara dentro de la sesión: captura, configuración del
+    ejercicio, contador de repeticiones y estadísticas de FPS/latencia.
+    """
+
+    def __init__(self, indice, cap, ejercicio, lado, target_reps, target_series):
+        self.indice = indice
+        self.cap = cap
+        self.ejercicio = ejercicio
+        self.lado = lado
+        self.contador = ContadorRepeticiones(target_reps, target_series)   # Arranca con el primer frame
+        # t_captura (perf_counter) -> epoch con un único desfase por flujo
+        self._desfase = time.time() - time.perf_counter()
+
+        self.frames = ColaUltimo()          # Captura -> planificador
+        self.resultados = ColaUltimo()      # Resultados -> Tk
+        self.en_vuelo = None                # (frame, t_captura) enviado a inferencia
+        self.error = None                   # Último error de inferencia del flujo
+
+        self._mostrados = deque(maxlen=30)
+        self._latencias = deque(maxlen=30)
+
+    def instante(self, t_captura):
+        return self._desfase + t_captura
+
+    def marcar_mostrado(self, resultado):
+        ahora = time.perf_counter()
+        self._mostrados.append(ahora)
+        self._latencias.append(ahora - resultado.t_captura)
+
+    def fps(self):
+        mostrados = tuple(self._mostrados)
+        if len(mostrados) < 2 or mostrados[-1] == mostrados[0]:
+            return 0.0
+        return (len(mostrados) - 1) / (mostrados[-1] - mostrados[0])
+
+    def latencia_ms(self):
+        latencias = tuple(self._latencias)
+        return sum(latencias) / len(latencias) * 1000 if latencias else 0.0
+
+
+class PlanificadorInferencia:
+    """
+    Reparte la inferencia de N flujos entre P procesos (P ≤ núcleos).
+    Cada flujo está asignado a un proceso fijo (donde vive su Pose) y tiene
+    como mucho un frame en vuelo: el planificador recorre los flujos en
+    turno rotativo y a cada uno le envía su frame más reciente cuando el
+    anterior ya volvió, así ningún flujo acapara los núcleos.
+
+    Si un proceso muere, sus flujos recuperan el turno (el frame en vuelo se
+    pierde) y se reinicia, como PoseEnProceso: hasta 'max_reinicios' veces
+    por 'ventana_reinicios' segundos. Pasado eso sus flujos pasan a los
+    procesos que sigan vivos; si no queda ninguno, 'error' lo indica.
+    """
+
+    def __init__(self, flujos, procesos=None, resolucion=480, opciones=None,
+                 max_reinicios=5, ventana_reinicios=60.0, intervalo_vigilancia=0.5):
+        self.flujos = flujos
+        self.resolucion = resolucion
+        procesos = procesos or os.cpu_count() or 1
+        self.procesos = max(1, min(procesos, len(flujos)))
+        self.opciones = opciones or {"min_detection_confidence": 0.5, "min_tracking_confidence": 0.5}
+        self.max_reinicios = max_reinicios
+        self.ventana_reinicios = ventana_reinicios
+        self.intervalo_vigilancia = intervalo_vigilancia
+        self.reinicios = 0
+        self.error = None
+
+        self._contexto = multiprocessing.get_context("spawn")
+        self._salida = self._contexto.Queue()
+        self._entradas = [self._contexto.Queue() for _ in range(self.procesos)]
+        self._trabajadores = [self._crear_trabajador(i) for i in range(self.procesos)]
+        self._asignacion = [i % self.procesos for i in range(len(flujos))]     # Flujo -> proceso
+        self._t_reinicios = [deque() for _ in range(self.procesos)]
+        self._caidos = set()
+        # Despachar (en_vuelo + put) y reiniciar un proceso no se intercalan
+        self._lock = threading.Lock()
+        self._activo = threading.Event()
+        self._hilos = []
+
+    def _crear_trabajador(self, proceso):
+        return self._contexto.Process(
+            target=_trabajador_inferencia,
+            args=(self._entradas[proceso], self._salida, self.opciones),
+            name=f"inferencia-{proceso}",
+            daemon=True
+        )
+
+    def iniciar(self):
+        self._activo.set()
+        for trabajador in self._trabajadores:
+            trabajador.start()
+        self._hilos = [threading.Thread(target=self._bucle_captura, args=(f,), daemon=True) for f in self.flujos]
+        self._hilos.append(threading.Thread(target=self._bucle_despacho, name="planificador", daemon=True))
+        self._hilos.append(threading.Thread(target=self._bucle_resultados, name="resultados", daemon=True))
+        for hilo in self._hilos:
+            hilo.start()
+
+    def detener(self):
+        self._activo.clear()
+        for hilo in self._hilos:
+            hilo.join(1.0)
+        for entrada in self._entradas:
+            entrada.put(None)
+        for trabajador in self._trabajadores:
+            trabajador.join(2.0)
+            if trabajador.is_alive():
+                trabajador.terminate()
+
+    def _bucle_captura(self, flujo):
+        while self._activo.is_set():
+            ret, frame = flujo.cap.read()
+            if not ret:
+                time.sleep(0.1)
+                continue
+            flujo.frames.poner((frame, time.perf_counter()))
+
+    def _bucle_despacho(self):
+        turno = 0
+        n = len(self.flujos)
+        while self._activo.is_set():
+            despachado = False
+            for k in range(n):
+                i = (turno + k) % n
+                flujo = self.flujos[i]
+                if flujo.en_vuelo is not None:
+                    continue
+                item = flujo.frames.tomar(timeout=0)
+                if item is None:
+                    continue
+                frame, t_captura = item
+                frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB, dst=frame)
+                reducido = reducir_frame(frame, self.resolucion)
+                with self._lock:
+                    proceso = self._asignacion[i]
+                    if proceso is None:
+                        continue
+                    flujo.en_vuelo = (frame, t_captura)
+                    self._entradas[proceso].put((i, reducido, t_captura))
+                despachado = True
+            turno = (turno + 1) % n
+            if not despachado:
+                time.sleep(0.002)
+
+    def _bucle_resultados(self):
+        proxima_vigilancia = time.monotonic() + self.intervalo_vigilancia
+        while self._activo.is_set():
+            if time.monotonic() >= proxima_vigilancia:
+                self._vigilar_trabajadores()
+                proxima_vigilancia = time.monotonic() + self.intervalo_vigilancia
+            try:
+                i, datos, t_captura, t_inferencia, error = self._salida.get(timeout=0.1)
+            except queue.Empty:
+                continue
+            flujo = self.flujos[i]
+            en_vuelo = flujo.en_vuelo
+            if en_vuelo is None or en_vuelo[1] != t_captura:
+                # Respuesta de un proceso ya reiniciado: el flujo siguió sin ella
+                continue
+            frame, _ = en_vuelo
+            flujo.error = error
+            landmarks = None
+            if datos is not None:
+                landmarks = LandmarkFrame(datos, t_captura)
+                dibujar_landmarks(frame, landmarks)
+            flujo.en_vuelo = None
+            flujo.resultados.poner(ResultadoFrame(frame, landmarks, t_captura, t_inferencia))
+
+    def _vigilar_trabajadores(self):
+        for proceso, trabajador in enumerate(self._trabajadores):
+            if proceso not in self._caidos and not trabajador.is_alive():
+                self._reiniciar_trabajador(proceso)
+
+    def _reiniciar_trabajador(self, proceso):
+        """
+        Devuelve el turno a los flujos del proceso muerto y lo reinicia, o
+        reparte sus flujos entre los vivos si agotó sus reinicios.
+        """
+        codigo = self._trabajadores[proceso].exitcode
+        # Lo que el proceso muerto dejó sin leer en su cola se abandona: si
+        # no, el hilo que la alimenta bloquea la salida del intérprete
+        self._entradas[proceso].cancel_join_thread()
+        ahora = time.monotonic()
+        recientes = self._t_reinicios[proceso]
+        recientes.append(ahora)
+        while recientes and ahora - recientes[0] > self.ventana_reinicios:
+            recientes.popleft()
+
+        with self._lock:
+            afectados = [i for i, asignado in enumerate(self._asignacion) if asignado == proceso]
+            if len(recientes) > self.max_reinicios:
+                self._caidos.add(proceso)
+                vivos = [p for p in range(self.procesos) if p not in self._caidos]
+                for i in afectados:
+                    self._asignacion[i] = vivos[i % len(vivos)] if vivos else None
+                if not vivos:
+                    self.error = f"Los procesos de inferencia terminaron (código {codigo})"
+            else:
+                self.reinicios += 1
+                # Cola nueva: la anterior pudo quedar con frames sin leer o
+                # con su lock tomado por el proceso muerto
+                self._entradas[proceso] = self._contexto.Queue()
+                self._trabajadores[proceso] = self._crear_trabajador(proceso)
+                self._trabajadores[proceso].start()
+            for i in afectados:
+                self.flujos[i].en_vuelo = None
+
+
+class SesionMulticamara:
+    """
+    Ventana con N cámaras en cuadrícula. Cada celda tiene su propio
+    ejercicio, lado y contador de repeticiones, además de su FPS y latencia.
+    """
+
+    def __init__(self, root, indices, ejercicio=1, lado="izq", target_reps=10, target_series=3):
+        self.root = root
+        self.ventana = tk.Toplevel(root)
+        self.ventana.title("Sesión multicámara")
+        self.ventana.geometry("1200x800")
+        self.ventana.protocol("WM_DELETE_WINDOW", self.cerrar)
+
+        self.flujos = []
+        self.celdas = []
+        for indice in indices:
+            cap = cv2.VideoCapture(indice)
+            if not cap.isOpened():
+                continue
+            cap.set(cv2.CAP_PROP_BUFFERSIZE, 1)
+            self.flujos.append(FlujoCamara(indice, cap, ejercicio, lado, target_reps, target_series))
+
+        if not self.flujos:
+            messagebox.showerror("Error", "No se pudo abrir ninguna cámara.", parent=self.ventana)
+            self.ventana.destroy()
+            self.planificador = None
+            return
+
+        columnas = math.ceil(math.sqrt(len(self.flujos)))
+        for n, flujo in enumerate(self.flujos):
+            self.celdas.append(self._crear_celda(flujo, n // columnas, n % columnas))
+        for c in range(columnas):
+            self.ventana.grid_columnconfigure(c, weight=1)
+        for r in range((len(self.flujos) + columnas - 1) // columnas):
+            self.ventana.grid_rowconfigure(r, weight=1)
+
+        self.planificador = PlanificadorInferencia(self.flujos)
+        self.planificador.iniciar()
+        self._after_id = self.ventana.after(15, self.actualizar)
+
+    def _crear_celda(self, flujo, fila, columna):
+        marco = ttk.Frame(self.ventana, padding=4)
+        marco.grid(row=fila, column=columna, sticky="nsew")
+        marco.grid_columnconfigure(0, weight=1)
+        marco.grid_rowconfigure(1, weight=1)
+
+        barra = ttk.Frame(marco)
+        barra.grid(row=0, column=0, sticky="ew")
+        ttk.Label(barra, text=f"Cámara {flujo.indice}").pack(side="left")
+        ejercicio_var = tk.StringVar(value="Brazos" if flujo.ejercicio == 1 else "Piernas")
+        lado_var = tk.StringVar(value=flujo.lado)
+        ttk.Combobox(barra, values=["Brazos", "Piernas"], textvariable=ejercicio_var,
+                     state="readonly", width=8).pack(side="left", padx=4)
+        ttk.Combobox(barra, values=["izq", "der"], textvariable=lado_var,
+                     state="readonly", width=4).pack(side="left")
+
+        def cambiar_config(*_):
+            # Igual que en la vista principal: cambiar ejercicio/lado reinicia el conteo
+            flujo.ejercicio = 1 if ejercicio_var.get() == "Brazos" else 2
+            flujo.lado = lado_var.get()
+            flujo.contador = ContadorRepeticiones(flujo.contador.target_reps, flujo.contador.target_series)
+
+        ejercicio_var.trace_add("write", cambiar_config)
+        lado_var.trace_add("write", cambiar_config)
+
+        panel = tk.Canvas(marco, bg="black", highlightthickness=0)
+        panel.grid(row=1, column=0, sticky="nsew")
+        renderizador = RenderizadorPanel(panel)
+        panel.bind("<Configure>", lambda e: renderizador.redimensionar(max(50, e.width), max(50, e.height)))
+
+        estado = ttk.Label(marco, text="", font=("Arial", 11))
+        estado.grid(row=2, column=0)
+        rendimiento = ttk.Label(marco, text="", font=("Arial", 8))
+        rendimiento.grid(row=3, column=0)
+        return {"renderizador": renderizador, "estado": estado, "rendimiento": rendimiento}
+
+    def actualizar(self):
+        for flujo, celda in zip(self.flujos, self.celdas):
+            resultado = flujo.resultados.tomar(timeout=0)
+            if resultado is None:
+                continue
+
+            angulo = None
+            if resultado.landmarks is not None:
+                angulo = detectar_angulo(resultado.landmarks, flujo.ejercicio, flujo.lado)
+            ang_min, ang_max = obtener_rango_ejercicio(flujo.ejercicio, flujo.lado)
+            # Instante de captura: la espera en las colas o en Tk no cambia los intervalos
+            ahora = flujo.instante(resultado.t_captura)
+            if flujo.contador.start_time is None:
+                flujo.contador.iniciar(ahora)
+            evento = flujo.contador.actualizar(angulo, ang_min, ang_max, ahora)
+
+            celda["renderizador"].mostrar(resultado.frame)
+            flujo.marcar_mostrado(resultado)
+
+            if evento == EVENTO_FIN or flujo.contador.terminado:
+                texto, color = "¡Ejercicio completado!", (0, 128, 0)
+            else:
+                texto, color = feedback_ejercicio(angulo, ang_min, ang_max)
+            celda["estado"].config(
+                text=f"{texto} | Reps: {flujo.contador.reps} | Series restantes: {flujo.contador.series_left}",
+                foreground="#{:02x}{:02x}{:02x}".format(color[2], color[1], color[0])
+            )
+            error = self.planificador.error or flujo.error
+            celda["rendimiento"].config(
+                text=f"FPS: {flujo.fps():.1f} | Latencia: {flujo.latencia_ms():.0f} ms | "
+                     f"Inferencia: {resultado.t_inferencia * 1000:.0f} ms"
+                     + (f" | Error: {error}" if error else "")
+            )
+        if self.planificador.error is not None:
+            for celda in self.celdas:
+                celda["estado"].config(text=f"Error de inferencia: {self.planificador.error}", foreground="#c80000")
+        self._after_id = self.ventana.after(15, self.actualizar)
+
+    def cerrar(self):
+        if getattr(self, "_after_id", None) is not None:
+            self.ventana.after_cancel(self._after_id)
+            self._after_id = None
+        if self.planificador is not None:
+            self.planificador.detener()
+        for flujo in self.flujos:
+            flujo.cap.release()
+        self.ventana.destroy()
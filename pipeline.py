@@ -0,0 +1,450 @@
+# pipeline.py
+
+import threading
+import time
+
+import cv2
+
+from metricas import Metricas
+from pool_frames import PoolFrames
+from pose_utils import CONEXIONES_POSE, LandmarkFrame, UMBRAL_VISIBILIDAD
+from seguimiento import ControlInferencia, PredictorVelocidad
+
+
+# Colores (RGB) del esqueleto: los de MediaPipe para landmarks inferidos y
+# gris para los predichos entre inferencias
+COLOR_LINEAS = (224, 224, 224)
+COLOR_PUNTOS = (255, 0, 0)
+COLOR_PREDICHO = (160, 160, 160)
+
+# Claves de PipelinePose.contadores()
+CONTADORES = (
+    "descartados_captura", "descartados_pantalla", "descartados",
+    "frames_capturados", "frames_inferidos", "frames_mostrados", "k",
+    "pool_en_uso", "pool_esperas",
+)
+
+def reducir_frame(frame, resolucion):
+    """
+    Reduce 'frame' para que su lado mayor no supere 'resolucion' píxeles
+    (None = sin cambios). Las coordenadas normalizadas de los landmarks no
+    dependen del tamaño, así que no hace falta remapearlas.
+    """
+    if resolucion is None:
+        return frame
+    alto, ancho = frame.shape[:2]
+    escala = resolucion / max(alto, ancho)
+    if escala >= 1.0:
+        return frame
+    return cv2.resize(frame, (round(ancho * escala), round(alto * escala)), interpolation=cv2.INTER_AREA)
+
+
+def dibujar_landmarks(frame, landmarks, color_lineas=COLOR_LINEAS, color_puntos=COLOR_PUNTOS, umbral=0.5):
+    """
+    Dibuja el esqueleto de un LandmarkFrame sobre 'frame' (in place) con
+    OpenCV, a partir de las coordenadas normalizadas del array.
+    """
+    alto, ancho = frame.shape[:2]
+    puntos = (landmarks.xy * (ancho, alto)).astype(int)
+    visibles = landmarks.visibilidad > umbral
+    for a, b in CONEXIONES_POSE:
+        if visibles[a] and visibles[b]:
+            cv2.line(frame, tuple(puntos[a]), tuple(puntos[b]), color_lineas, 2)
+    for x, y in puntos[visibles]:
+        cv2.circle(frame, (int(x), int(y)), 3, color_puntos, -1)
+
+
+class ColaUltimo:
+    """
+    Cola acotada de un solo elemento: "gana el último frame".
+    Si el consumidor va más lento que el productor, el elemento pendiente se
+    reemplaza por el más reciente y se contabiliza como descartado, así nunca
+    se acumulan frames viejos (ni latencia). 'al_descartar' recibe cada
+    elemento reemplazado (p. ej. para devolver su buffer al PoolFrames).
+    """
+
+    def __init__(self, al_descartar=None):
+        self._cond = threading.Condition()
+        self._item = None
+        self.al_descartar = al_descartar
+        self.descartados = 0
+
+    def poner(self, item):
+        with self._cond:
+            anterior, self._item = self._item, item
+            if anterior is not None:
+                self.descartados += 1
+            self._cond.notify()
+        if anterior is not None and self.al_descartar is not None:
+            self.al_descartar(anterior)
+
+    def vaciar(self):
+        """
+        Saca el elemento pendiente (si hay) pasándolo por 'al_descartar'.
+        """
+        item = self.tomar(timeout=0)
+        if item is not None and self.al_descartar is not None:
+            self.al_descartar(item)
+
+    def tomar(self, timeout=None):
+        """
+        Devuelve el elemento pendiente (y lo saca de la cola).
+        Espera como mucho 'timeout' segundos; si no hay nada devuelve None.
+        """
+        with self._cond:
+            if self._item is None and timeout != 0:
+                self._cond.wait(timeout)
+            item, self._item = self._item, None
+            return item
+
+
+class ResultadoFrame:
+    """
+    Frame ya procesado por el hilo de inferencia, listo para mostrarse.
+      - frame: imagen RGB (la misma que recibió la inferencia) con el esqueleto dibujado
+      - landmarks: LandmarkFrame con los 33 landmarks (o None si no hubo pose)
+      - t_captura: instante (perf_counter) en que se leyó de la cámara
+      - t_inferencia: segundos de inferencia (recorte y pose.process())
+      - buffer: BufferFrame del PoolFrames que contiene 'frame' (o None)
+
+    Con buffer, quien recibe el resultado es dueño de su referencia y llama
+    a liberar() cuando ya no usa 'frame'.
+    """
+    __slots__ = ("frame", "landmarks", "t_captura", "t_inferencia", "buffer")
+
+    def __init__(self, frame, landmarks, t_captura, t_inferencia, buffer=None):
+        self.frame = frame
+        self.landmarks = landmarks
+        self.t_captura = t_captura
+        self.t_inferencia = t_inferencia
+        self.buffer = buffer
+
+    def liberar(self):
+        if self.buffer is not None:
+            self.buffer.liberar()
+            self.buffer = None
+
+
+class PipelinePose:
+    """
+    Motor en tres etapas para sacar el trabajo pesado del mainloop de Tk:
+
+        hilo de captura  ->  hilo de inferencia  ->  hilo de Tk
+             cap.read()        pose.process()         conteo + dibujo
+                       (ColaUltimo)         (ColaUltimo)
+
+    El hilo de Tk solo consulta obtener_resultado() sin bloquear y, una vez
+    mostrado el frame, llama a marcar_mostrado() para registrar la latencia
+    captura -> pantalla.
+
+    Con 'adaptativo=True' la inferencia completa corre solo en uno de cada k
+    frames (k ajustado por ControlInferencia a 'presupuesto_ms'); en los
+    demás los landmarks se propagan con PredictorVelocidad, de modo que cada
+    frame mostrado sigue trayendo un LandmarkFrame (con confianza < 1).
+
+    Con 'roi' (un RecorteROI) el modelo recibe solo la zona alrededor de la
+    persona, reducida a la resolución de inferencia configurada.
+
+    Con 'filtro' (un FiltroLandmarks) los landmarks inferidos se suavizan y,
+    si la pose o alguna articulación se pierde por poco tiempo, se predicen
+    (dibujados en gris) en lugar de devolver None.
+
+    'modelo' es un ModeloPose (o un ModeloPoseProceso, con la inferencia en
+    otro proceso): si todavía se está cargando, el hilo de inferencia espera
+    a que esté listo (sin bloquear a Tk).
+
+    Los tiempos de cada etapa se registran en 'metricas' (una Metricas; se
+    puede compartir entre pipelines para no perder el historial al reiniciar).
+
+    Los frames viven en un PoolFrames de 'capacidad_pool' buffers: la
+    cámara lee dentro de ellos y pasan de etapa en etapa sin copias; cada
+    ColaUltimo devuelve al pool lo que descarta. El hilo de Tk libera cada
+    ResultadoFrame cuando deja de mostrarlo.
+
+    'resolucion' limita el lado mayor de la imagen que recibe el modelo.
+    configurar() cambia modelo, resolución y tamaño de captura en marcha
+    (lo usa AutoAjuste); cada cambio lo aplica el hilo dueño del recurso.
+    """
+
+    def __init__(self, cap, modelo, muestras_latencia=120, adaptativo=False, presupuesto_ms=33.0, roi=None,
+                 metricas=None, resolucion=None, capacidad_pool=6, filtro=None):
+        self.cap = cap
+        self.modelo = modelo
+        self.pose = None
+        self.error = None
+        self.roi = roi
+        self.filtro = filtro
+        self.resolucion = resolucion
+        self.captura = None             # (ancho, alto) que entrega la cámara
+        self._modelo_pendiente = None
+        self._captura_pendiente = None
+        self._ultimos = None    # Últimos landmarks (referencia para el ROI)
+        self.control = ControlInferencia(presupuesto_ms) if adaptativo else None
+        self.predictor = PredictorVelocidad()
+
+        # Captura, cola de frames, inferencia, cola de resultados y el frame
+        # que muestra Tk: 5 buffers en uso como mucho, más uno de margen
+        self.pool = PoolFrames(capacidad_pool)
+        self._frames = ColaUltimo(al_descartar=lambda item: item[0].liberar())
+        self._resultados = ColaUltimo(al_descartar=ResultadoFrame.liberar)
+        self._activo = threading.Event()
+        self._hilos = []
+
+        # ————— Estadísticas —————
+        self.frames_capturados = 0
+        self.frames_procesados = 0
+        self.frames_inferidos = 0
+        self.frames_mostrados = 0
+        self.confianza = 0.0
+        self.metricas = metricas if metricas is not None else Metricas(muestras_latencia)
+        self._t_inicio = None
+
+    def iniciar(self):
+        if self._activo.is_set():
+            return
+        self._activo.set()
+        self._t_inicio = time.perf_counter()
+        self.captura = (int(self.cap.get(cv2.CAP_PROP_FRAME_WIDTH)), int(self.cap.get(cv2.CAP_PROP_FRAME_HEIGHT)))
+        self._hilos = [
+            threading.Thread(target=self._bucle_captura, name="captura", daemon=True),
+            threading.Thread(target=self._bucle_inferencia, name="inferencia", daemon=True),
+        ]
+        for hilo in self._hilos:
+            hilo.start()
+
+    def detener(self, timeout=1.0):
+        self._activo.clear()
+        for hilo in self._hilos:
+            hilo.join(timeout)
+        self._hilos = []
+        self._frames.vaciar()
+        self._resultados.vaciar()
+
+    @property
+    def activo(self):
+        return self._activo.is_set()
+
+    def configurar(self, modelo=None, resolucion=None, captura=None):
+        """
+        Pide cambios en marcha sin bloquear: 'modelo' (un ModeloPose) se
+        adopta cuando termina de cargarse, 'resolucion' en la próxima
+        inferencia y 'captura' (ancho, alto) en la próxima lectura de la
+        cámara.
+        """
+        if modelo is not None:
+            self._modelo_pendiente = modelo if modelo is not self.modelo else None
+        if resolucion is not None:
+            self.resolucion = resolucion
+            if self.roi is not None:
+                self.roi.resolucion = resolucion
+        if captura is not None:
+            self._captura_pendiente = captura
+
+    @property
+    def cambiando(self):
+        """
+        True mientras haya un modelo o un tamaño de captura pendiente.
+        """
+        return self._modelo_pendiente is not None or self._captura_pendiente is not None
+
+    def _aplicar_captura(self):
+        ancho, alto = self._captura_pendiente
+        self._captura_pendiente = None
+        self.cap.set(cv2.CAP_PROP_FRAME_WIDTH, ancho)
+        self.cap.set(cv2.CAP_PROP_FRAME_HEIGHT, alto)
+        # El driver puede elegir otro tamaño: se guarda el que quedó
+        self.captura = (int(self.cap.get(cv2.CAP_PROP_FRAME_WIDTH)), int(self.cap.get(cv2.CAP_PROP_FRAME_HEIGHT)))
+
+    def _adoptar_modelo(self):
+        modelo = self._modelo_pendiente
+        if not modelo.listo:
+            return
+        self._modelo_pendiente = None
+        if modelo.error is not None:
+            return      # Se sigue con el modelo actual
+        self.modelo = modelo
+        self.pose = modelo.obtener()
+        # El seguimiento del modelo anterior no sirve para el nuevo
+        self.predictor.reiniciar()
+        if self.filtro is not None:
+            self.filtro.reiniciar()
+
+    def _bucle_captura(self):
+        while self._activo.is_set():
+            if self._captura_pendiente is not None:
+                self._aplicar_captura()
+            buffer = self.pool.adquirir(timeout=0.1)
+            if buffer is None:
+                continue    # Atasco: todos los buffers en uso (queda en pool.esperas)
+            t0 = time.perf_counter()
+            if buffer.array is not None:
+                ret, frame = self.cap.read(image=buffer.array)
+            else:
+                ret, frame = self.cap.read()
+            if not ret:
+                buffer.liberar()
+                time.sleep(0.1)
+                continue
+            if frame is not buffer.array:
+                # Primer frame o la cámara cambió de tamaño
+                self.pool.adoptar(buffer, frame)
+            t_captura = time.perf_counter()
+            self.metricas.registrar("captura", t_captura - t0)
+            self.frames_capturados += 1
+            self._frames.poner((buffer, t_captura))
+
+    def _bucle_inferencia(self):
+        try:
+            self.pose = self.modelo.obtener()
+        except Exception as e:
+            self.error = e
+            return
+
+        while self._activo.is_set():
+            item = self._frames.tomar(timeout=0.1)
+            if item is None:
+                continue
+            buffer, t_captura = item
+            try:
+                frame, landmarks, t_inferencia = self._procesar(buffer.array, t_captura)
+            except Exception as e:
+                # P. ej. PoseEnProceso agotó sus reinicios o falló pose.process():
+                # el hilo termina y la GUI muestra el error en vez de congelarse
+                self.error = e
+                buffer.liberar()
+                return
+
+            self.frames_procesados += 1
+            self.confianza = landmarks.confianza if landmarks is not None else 0.0
+            self._resultados.poner(ResultadoFrame(frame, landmarks, t_captura, t_inferencia, buffer))
+
+    def _procesar(self, frame, t_captura):
+        if self._modelo_pendiente is not None:
+            self._adoptar_modelo()
+
+        # Conversión a RGB una sola vez y en el mismo buffer: la usan la
+        # inferencia, el dibujo del esqueleto y la pantalla
+        t0 = time.perf_counter()
+        frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB, dst=frame)
+        self.metricas.registrar("conversion", time.perf_counter() - t0)
+
+        if self._debe_inferir():
+            landmarks, t_inferencia = self._inferir(frame, t_captura)
+        else:
+            # Frame intermedio: se extrapolan los landmarks sin correr el modelo
+            t0 = time.perf_counter()
+            landmarks = self.predictor.predecir(t_captura)
+            dibujar_landmarks(frame, landmarks, COLOR_PREDICHO, COLOR_PREDICHO)
+            self._ultimos = landmarks
+            t_inferencia = time.perf_counter() - t0
+            self.metricas.registrar("prediccion", t_inferencia)
+        return frame, landmarks, t_inferencia
+
+    def _debe_inferir(self):
+        if self.control is None or not self.predictor.tiene_estado:
+            return True
+        return self.control.debe_inferir()
+
+    def _inferir(self, frame_rgb, t_captura):
+        t0 = time.perf_counter()
+        if self.roi is not None:
+            entrada, caja = self.roi.preparar(frame_rgb, self._ultimos)
+        else:
+            entrada = reducir_frame(frame_rgb, self.resolucion)
+        resultados = self.pose.process(entrada)
+        t_inferencia = time.perf_counter() - t0
+
+        landmarks = None
+        if resultados.pose_landmarks:
+            landmarks = LandmarkFrame.desde_mediapipe(resultados.pose_landmarks.landmark, t_captura)
+            if self.roi is not None:
+                alto, ancho = frame_rgb.shape[:2]
+                landmarks = self.roi.mapear(landmarks, caja, ancho, alto)
+        detectado = landmarks is not None
+        if self.filtro is not None:
+            t1 = time.perf_counter()
+            landmarks = self.filtro.filtrar(landmarks, t_captura)
+            self.metricas.registrar("filtro", time.perf_counter() - t1)
+
+        if landmarks is not None:
+            t1 = time.perf_counter()
+            if detectado:
+                dibujar_landmarks(frame_rgb, landmarks)
+            else:
+                dibujar_landmarks(frame_rgb, landmarks, COLOR_PREDICHO, COLOR_PREDICHO, UMBRAL_VISIBILIDAD)
+            self.metricas.registrar("dibujo", time.perf_counter() - t1)
+        if detectado:
+            self.predictor.observar(landmarks)
+        else:
+            # Sin pose no hay nada que seguir: volver a inferir (y buscar en
+            # el frame completo) en el próximo frame
+            self.predictor.reiniciar()
+        self._ultimos = landmarks
+
+        self.frames_inferidos += 1
+        self.metricas.registrar("inferencia", t_inferencia)
+        if self.control is not None:
+            self.control.registrar_inferencia(t_inferencia)
+        return landmarks, t_inferencia
+
+    def obtener_resultado(self):
+        """
+        Devuelve el último ResultadoFrame disponible sin bloquear, o None.
+        Pensado para llamarse desde el hilo de Tk, que pasa a ser dueño de
+        su buffer (ResultadoFrame.liberar()).
+        """
+        return self._resultados.tomar(timeout=0)
+
+    def marcar_mostrado(self, resultado):
+        ahora = time.perf_counter()
+        self.frames_mostrados += 1
+        self.metricas.registrar("latencia", ahora - resultado.t_captura)
+        self.metricas.marcar_frame(ahora)
+
+    def contadores(self):
+        """
+        Contadores del pipeline que acompañan a la instantánea de métricas.
+        """
+        return {
+            "descartados_captura": self._frames.descartados,
+            "descartados_pantalla": self._resultados.descartados,
+            "descartados": self._frames.descartados + self._resultados.descartados,
+            "frames_capturados": self.frames_capturados,
+            "frames_inferidos": self.frames_inferidos,
+            "frames_mostrados": self.frames_mostrados,
+            "k": self.control.k if self.control is not None else 1,
+            "pool_en_uso": self.pool.en_uso,
+            "pool_esperas": self.pool.esperas,
+        }
+
+    def estadisticas(self):
+        """
+        Resumen de rendimiento del pipeline:
+          - latencia_ms: latencia media captura -> pantalla (últimas muestras)
+          - inferencia_ms: tiempo medio de pose.process()
+          - descartados_captura: frames reemplazados antes de llegar a inferencia
+          - descartados_pantalla: resultados reemplazados antes de mostrarse
+          - fps: frames mostrados por segundo desde iniciar()
+          - k: se infiere uno de cada k frames (1 si no es adaptativo)
+          - confianza: confianza de los últimos landmarks (1.0 = inferidos)
+          - ahorro_pixeles: fracción de píxeles ahorrados por el ROI (0 sin ROI)
+          - pool_*: ocupación, asignaciones y esperas del PoolFrames
+          - *_filtro: frames y huecos del FiltroLandmarks (si hay)
+        """
+        latencia = self.metricas.media("latencia")
+        inferencia = self.metricas.media("inferencia")
+        transcurrido = time.perf_counter() - self._t_inicio if self._t_inicio else 0.0
+        estadisticas = {
+            "latencia_ms": latencia * 1000,
+            "inferencia_ms": inferencia * 1000,
+            "descartados_captura": self._frames.descartados,
+            "descartados_pantalla": self._resultados.descartados,
+            "fps": self.frames_mostrados / transcurrido if transcurrido > 0 else 0.0,
+            "k": self.control.k if self.control is not None else 1,
+            "confianza": self.confianza,
+            "ahorro_pixeles": self.roi.estadisticas()["ahorro_pixeles"] if self.roi is not None else 0.0,
+        }
+        estadisticas.update(self.pool.estadisticas())
+        if self.filtro is not None:
+            estadisticas.update(self.filtro.estadisticas())
+        return estadisticas
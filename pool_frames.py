@@ -0,0 +1,149 @@
+# pool_frames.py
+
+import threading
+import time
+
+import numpy as np
+
+
+class BufferFrame:
+    """
+    Buffer de imagen de un PoolFrames con cuenta de referencias.
+    Quien lo recibe es dueño de una referencia y debe llamar a liberar()
+    (o pasarlo a otra etapa, que pasa a ser la dueña). retener() agrega un
+    dueño más, p. ej. un hilo que escribe el frame a disco mientras se
+    muestra. Con la última liberación el buffer vuelve al pool.
+    """
+    __slots__ = ("array", "refs", "pool", "generacion")
+
+    def __init__(self, array, pool, generacion):
+        self.array = array
+        self.refs = 0
+        self.pool = pool
+        self.generacion = generacion
+
+    def retener(self):
+        self.pool._retener(self)
+        return self
+
+    def liberar(self):
+        self.pool._liberar(self)
+
+
+class PoolFrames:
+    """
+    Anillo fijo de 'capacidad' buffers preasignados para la captura.
+
+    La cámara lee dentro de un buffer libre (cap.read(image=...)), la
+    conversión de color escribe en el mismo (cvtColor(dst=...)) y el buffer
+    pasa de etapa en etapa sin copiarse; en régimen no se asigna ningún
+    frame nuevo. Si la cámara cambia de tamaño, redimensionar() descarta
+    los buffers del tamaño viejo a medida que se liberan.
+
+    adquirir() espera si todos los buffers están en uso: cada espera cuenta
+    como un atasco ('esperas'), síntoma de que alguna etapa retiene frames
+    o de que el pool es chico para el pipeline.
+    """
+
+    def __init__(self, capacidad=6, forma=None, dtype=np.uint8):
+        self.capacidad = capacidad
+        self.forma = tuple(forma) if forma is not None else None
+        self.dtype = dtype
+        self._cond = threading.Condition()
+        self._libres = []
+        self._creados = 0           # Buffers vivos de la generación actual
+        self._generacion = 0
+
+        # ————— Estadísticas —————
+        self.en_uso = 0
+        self.en_uso_max = 0
+        self.asignaciones = 0       # Arrays creados (en régimen no aumenta)
+        self.esperas = 0
+        self.tiempo_espera = 0.0
+
+    def redimensionar(self, forma):
+        """
+        Cambia el tamaño de los buffers futuros. Los del tamaño anterior que
+        están en uso se descartan al liberarse.
+        """
+        with self._cond:
+            self._redimensionar(tuple(forma))
+
+    def _redimensionar(self, forma):
+        if forma == self.forma:
+            return
+        self.forma = forma
+        self._generacion += 1
+        self._libres.clear()
+        self._creados = 0
+        self._cond.notify_all()
+
+    def adquirir(self, timeout=None):
+        """
+        Devuelve un BufferFrame libre (con una referencia) o None si no se
+        liberó ninguno en 'timeout' segundos. Sin forma definida el buffer
+        viene con array None: la primera lectura de la cámara lo adopta.
+        """
+        with self._cond:
+            if not self._libres and self._creados >= self.capacidad:
+                self.esperas += 1
+                t0 = time.perf_counter()
+                self._cond.wait_for(lambda: self._libres or self._creados < self.capacidad, timeout)
+                self.tiempo_espera += time.perf_counter() - t0
+            if self._libres:
+                buffer = self._libres.pop()
+            elif self._creados < self.capacidad:
+                array = None
+                if self.forma is not None:
+                    array = np.empty(self.forma, dtype=self.dtype)
+                    self.asignaciones += 1
+                buffer = BufferFrame(array, self, self._generacion)
+                self._creados += 1
+            else:
+                return None
+            buffer.refs = 1
+            self.en_uso += 1
+            self.en_uso_max = max(self.en_uso_max, self.en_uso)
+            return buffer
+
+    def adoptar(self, buffer, array):
+        """
+        Reemplaza el array de 'buffer' por 'array' (el que devolvió la cámara
+        al no coincidir el tamaño) y adopta su forma para el pool.
+        """
+        with self._cond:
+            if array.shape != self.forma:
+                self._redimensionar(array.shape)
+            if buffer.generacion != self._generacion:
+                # El buffer pasa a contar en la generación nueva
+                buffer.generacion = self._generacion
+                self._creados += 1
+            self.asignaciones += 1
+            buffer.array = array
+
+    def _retener(self, buffer):
+        with self._cond:
+            buffer.refs += 1
+
+    def _liberar(self, buffer):
+        with self._cond:
+            buffer.refs -= 1
+            if buffer.refs > 0:
+                return
+            if buffer.refs < 0:
+                raise RuntimeError("BufferFrame liberado más veces de las retenidas")
+            self.en_uso -= 1
+            if buffer.generacion == self._generacion:
+                self._libres.append(buffer)
+                self._cond.notify()
+
+    def estadisticas(self):
+        with self._cond:
+            return {
+                "pool_capacidad": self.capacidad,
+                "pool_en_uso": self.en_uso,
+                "pool_en_uso_max": self.en_uso_max,
+                "pool_asignaciones": self.asignaciones,
+                "pool_esperas": self.esperas,
+                "pool_tiempo_espera_ms": self.tiempo_espera * 1000.0,
+            }
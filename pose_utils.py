@@ -1,31 +1,239 @@
 # pose_utils.py
 
+from enum import IntEnum
+
 import numpy as np
-import mediapipe as mp
 
-mp_pose = mp.solutions.pose
+# MediaPipe no se importa aquí: es lento de cargar y este módulo solo
+# necesita los índices de los landmarks, que son fijos.
+
+class PoseLandmark(IntEnum):
+    """
+    Índices de los 33 landmarks de MediaPipe Pose (mismos nombres y valores
+    que mp.solutions.pose.PoseLandmark).
+    """
+    NOSE = 0
+    LEFT_EYE_INNER = 1
+    LEFT_EYE = 2
+    LEFT_EYE_OUTER = 3
+    RIGHT_EYE_INNER = 4
+    RIGHT_EYE = 5
+    RIGHT_EYE_OUTER = 6
+    LEFT_EAR = 7
+    RIGHT_EAR = 8
+    MOUTH_LEFT = 9
+    MOUTH_RIGHT = 10
+    LEFT_SHOULDER = 11
+    RIGHT_SHOULDER = 12
+    LEFT_ELBOW = 13
+    RIGHT_ELBOW = 14
+    LEFT_WRIST = 15
+    RIGHT_WRIST = 16
+    LEFT_PINKY = 17
+    RIGHT_PINKY = 18
+    LEFT_INDEX = 19
+    RIGHT_INDEX = 20
+    LEFT_THUMB = 21
+    RIGHT_THUMB = 22
+    LEFT_HIP = 23
+    RIGHT_HIP = 24
+    LEFT_KNEE = 25
+    RIGHT_KNEE = 26
+    LEFT_ANKLE = 27
+    RIGHT_ANKLE = 28
+    LEFT_HEEL = 29
+    RIGHT_HEEL = 30
+    LEFT_FOOT_INDEX = 31
+    RIGHT_FOOT_INDEX = 32
+
+# Umbral de visibilidad por defecto (reducido a 0.3 para captar mejor ambos lados)
+UMBRAL_VISIBILIDAD = 0.3
+
+# Articulaciones evaluables: nombre -> (extremo, vértice, extremo)
+ARTICULACIONES = {
+    "codo_izq": (PoseLandmark.LEFT_SHOULDER, PoseLandmark.LEFT_ELBOW, PoseLandmark.LEFT_WRIST),
+    "codo_der": (PoseLandmark.RIGHT_SHOULDER, PoseLandmark.RIGHT_ELBOW, PoseLandmark.RIGHT_WRIST),
+    "rodilla_izq": (PoseLandmark.LEFT_HIP, PoseLandmark.LEFT_KNEE, PoseLandmark.LEFT_ANKLE),
+    "rodilla_der": (PoseLandmark.RIGHT_HIP, PoseLandmark.RIGHT_KNEE, PoseLandmark.RIGHT_ANKLE),
+    "hombro_izq": (PoseLandmark.LEFT_ELBOW, PoseLandmark.LEFT_SHOULDER, PoseLandmark.LEFT_HIP),
+    "hombro_der": (PoseLandmark.RIGHT_ELBOW, PoseLandmark.RIGHT_SHOULDER, PoseLandmark.RIGHT_HIP),
+    "cadera_izq": (PoseLandmark.LEFT_SHOULDER, PoseLandmark.LEFT_HIP, PoseLandmark.LEFT_KNEE),
+    "cadera_der": (PoseLandmark.RIGHT_SHOULDER, PoseLandmark.RIGHT_HIP, PoseLandmark.RIGHT_KNEE),
+}
+NOMBRES_ARTICULACIONES = tuple(ARTICULACIONES)
+
+# Pares de landmarks que forman el esqueleto (para dibujarlo sin MediaPipe)
+CONEXIONES_POSE = (
+    (0, 1), (0, 4), (1, 2), (2, 3), (3, 7), (4, 5), (5, 6), (6, 8), (9, 10),
+    (11, 12), (11, 13), (11, 23), (12, 14), (12, 24), (13, 15), (14, 16),
+    (15, 17), (15, 19), (15, 21), (16, 18), (16, 20), (16, 22), (17, 19),
+    (18, 20), (23, 24), (23, 25), (24, 26), (25, 27), (26, 28), (27, 29),
+    (27, 31), (28, 30), (28, 32), (29, 31), (30, 32),
+)
+
+# Índices de cada triple como array, para indexar los landmarks de una vez
+_INDICES = {
+    nombre: np.array([int(i) for i in triple], dtype=np.intp)
+    for nombre, triple in ARTICULACIONES.items()
+}
+
+# Índices (J,) de cada extremo/vértice, para indexar arrays de landmarks de una vez
+_IDX_P1, _IDX_P2, _IDX_P3 = (
+    np.array([int(triple[i]) for triple in ARTICULACIONES.values()], dtype=np.intp)
+    for i in range(3)
+)
+
+def calcular_angulos_vector(p1, p2, p3):
+    """
+    Versión vectorizada de calcular_angulo: p1, p2, p3 son arrays (..., 2)
+    con coordenadas (x, y) y p2 es el vértice. Devuelve un array (...) con
+    el ángulo interior (≤ 180°) de cada triple.
+    """
+    ang = np.degrees(
+        np.arctan2(p3[..., 1] - p2[..., 1], p3[..., 0] - p2[..., 0]) -
+        np.arctan2(p1[..., 1] - p2[..., 1], p1[..., 0] - p2[..., 0])
+    )
+    ang = np.where(ang < 0, ang + 360, ang)
+    ang = np.where(ang > 180, 360 - ang, ang)
+    return ang
 
 def calcular_angulo(p1, p2, p3):
     """
     Calcula el ángulo interior formado por los puntos p1-p2-p3 (p2 es el vértice).
     Devuelve siempre un valor ≤ 180°.
+    Usa el mismo cálculo que calcular_angulos_vector, así el camino en vivo y
+    el análisis por lotes dan exactamente el mismo resultado.
     """
-    ang = np.degrees(
-        np.arctan2(p3[1] - p2[1], p3[0] - p2[0]) -
-        np.arctan2(p1[1] - p2[1], p1[0] - p2[0])
+    return calcular_angulos_vector(
+        np.asarray(p1[:2], dtype=np.float64),
+        np.asarray(p2[:2], dtype=np.float64),
+        np.asarray(p3[:2], dtype=np.float64)
+    )[()]
+
+NUM_LANDMARKS = 33
+
+def landmarks_a_array(landmarks):
+    """
+    Convierte la lista de landmarks de MediaPipe en un array (33, 4) float32
+    con columnas x, y, z, visibility. Un array (33, 4) (p. ej. el de
+    PoseEnProceso) se devuelve tal cual.
+    """
+    if isinstance(landmarks, np.ndarray):
+        return landmarks.astype(np.float32, copy=False).reshape(NUM_LANDMARKS, 4)
+    return np.array(
+        [(lm.x, lm.y, lm.z, lm.visibility) for lm in landmarks],
+        dtype=np.float32
     )
-    if ang < 0:
-        ang += 360
-    if ang > 180:
-        ang = 360 - ang
-    return ang
+
+class LandmarkFrame:
+    """
+    Landmarks de un frame en formato compacto: un array float32 (33, 4) con
+    x, y, z y visibility, más el instante en que se capturó.
+    Se construye una sola vez por frame (en lugar de leer el protobuf de
+    MediaPipe atributo por atributo) y es barato de copiar y serializar
+    (pickle), así sirve igual para la GUI, la grabación y el análisis por lotes.
+    'confianza' es 1.0 para landmarks inferidos y menor cuando son predichos.
+    """
+    __slots__ = ("datos", "timestamp", "confianza")
+
+    def __init__(self, datos, timestamp=0.0, confianza=1.0):
+        self.datos = np.asarray(datos, dtype=np.float32).reshape(NUM_LANDMARKS, 4)
+        self.timestamp = timestamp
+        self.confianza = confianza
+
+    @classmethod
+    def desde_mediapipe(cls, landmarks, timestamp=0.0):
+        """
+        Crea el frame a partir de 'resultados.pose_landmarks.landmark'.
+        """
+        return cls(landmarks_a_array(landmarks), timestamp)
+
+    @property
+    def xy(self):
+        return self.datos[:, :2]
+
+    @property
+    def visibilidad(self):
+        return self.datos[:, 3]
+
+    def __len__(self):
+        return NUM_LANDMARKS
+
+    def __repr__(self):
+        return f"LandmarkFrame(timestamp={self.timestamp!r}, confianza={self.confianza!r})"
+
+def como_array(landmarks):
+    """
+    Devuelve los landmarks como array (33, 4), aceptando un LandmarkFrame, un
+    array ya construido o la lista de landmarks de MediaPipe.
+    """
+    if isinstance(landmarks, LandmarkFrame):
+        return landmarks.datos
+    if isinstance(landmarks, np.ndarray):
+        return landmarks
+    return landmarks_a_array(landmarks)
+
+def _puntos(landmarks, indices):
+    """
+    Filas (x, y, z, visibility) de los landmarks 'indices' como array float64.
+    Con la lista de MediaPipe solo se leen esos landmarks, no los 33.
+    """
+    if isinstance(landmarks, (LandmarkFrame, np.ndarray)):
+        return como_array(landmarks)[indices].astype(np.float64)
+    return np.array(
+        [(landmarks[i].x, landmarks[i].y, landmarks[i].z, landmarks[i].visibility) for i in indices],
+        dtype=np.float64
+    )
+
+def calcular_angulos_articulaciones(datos, umbral=UMBRAL_VISIBILIDAD):
+    """
+    Calcula todas las articulaciones de ARTICULACIONES en una sola pasada.
+    'datos' es un array (N, 33, 4) (o (33, 4) / LandmarkFrame para un solo
+    frame) con x, y, z y visibility. Devuelve un array float64 (N, J) (o (J,)) en el orden de
+    NOMBRES_ARTICULACIONES, con NaN donde alguno de los tres puntos no supera
+    el umbral de visibilidad.
+    """
+    datos = como_array(datos) if isinstance(datos, LandmarkFrame) else np.asarray(datos)
+    unico = datos.ndim == 2
+    if unico:
+        datos = datos[np.newaxis]
+
+    xy = datos[..., :2].astype(np.float64)
+    angulos = calcular_angulos_vector(xy[:, _IDX_P1], xy[:, _IDX_P2], xy[:, _IDX_P3])
+
+    vis = datos[..., 3].astype(np.float64)
+    visibles = (vis[:, _IDX_P1] > umbral) & (vis[:, _IDX_P2] > umbral) & (vis[:, _IDX_P3] > umbral)
+    angulos[~visibles] = np.nan
+
+    return angulos[0] if unico else angulos
+
+def articulacion_ejercicio(ejercicio, lado):
+    """
+    Nombre (clave de ARTICULACIONES) de la articulación que evalúa el
+    ejercicio, con la misma convención que detectar_angulo.
+    """
+    base = "codo" if ejercicio == 1 else "rodilla"
+    return f"{base}_{'izq' if lado == 'izq' else 'der'}"
 
 def articulacion_visible(landmarks, articulacion):
     """
     Verifica si una articulación (landmark) está suficientemente visible.
     Umbral reducido a 0.3 para captar mejor ambos lados.
     """
-    return landmarks[articulacion].visibility > 0.3
+    if isinstance(landmarks, (LandmarkFrame, np.ndarray)):
+        return float(como_array(landmarks)[articulacion, 3]) > UMBRAL_VISIBILIDAD
+    return landmarks[articulacion].visibility > UMBRAL_VISIBILIDAD
+
+def angulo_articulacion(landmarks, nombre):
+    """
+    Ángulo interior de la articulación 'nombre' (clave de ARTICULACIONES).
+    Lee los tres puntos de una vez; si alguno no alcanza visibilidad
+    devuelve None.
+    """
+    puntos = _puntos(landmarks, _INDICES[nombre])
+    if (puntos[:, 3] > UMBRAL_VISIBILIDAD).all():
+        return calcular_angulos_vector(puntos[0, :2], puntos[1, :2], puntos[2, :2])[()]
+    return None
 
 def detectar_codo(landmarks, lado):
     """
@@ -33,26 +241,7 @@ def detectar_codo(landmarks, lado):
     de ese lado y devuelve el ángulo interior del codo.
     Si no alcanza visibilidad, devuelve None.
     """
-    if lado == "izq":
-        h = mp_pose.PoseLandmark.LEFT_SHOULDER
-        e = mp_pose.PoseLandmark.LEFT_ELBOW
-        w = mp_pose.PoseLandmark.LEFT_WRIST
-    else:  # lado == "der"
-        h = mp_pose.PoseLandmark.RIGHT_SHOULDER
-        e = mp_pose.PoseLandmark.RIGHT_ELBOW
-        w = mp_pose.PoseLandmark.RIGHT_WRIST
-
-    if (
-        articulacion_visible(landmarks, h)
-        and articulacion_visible(landmarks, e)
-        and articulacion_visible(landmarks, w)
-    ):
-        hombro = [landmarks[h].x, landmarks[h].y]
-        codo    = [landmarks[e].x, landmarks[e].y]
-        muñeca  = [landmarks[w].x, landmarks[w].y]
-        return calcular_angulo(hombro, codo, muñeca)
-    else:
-        return None
+    return angulo_articulacion(landmarks, "codo_izq" if lado == "izq" else "codo_der")
 
 def detectar_rodilla(landmarks, lado):
     """
@@ -60,23 +249,48 @@ def detectar_rodilla(landmarks, lado):
     de ese lado y devuelve el ángulo interior de la rodilla.
     Si no alcanza visibilidad, devuelve None.
     """
-    if lado == "izq":
-        h = mp_pose.PoseLandmark.LEFT_HIP
-        k = mp_pose.PoseLandmark.LEFT_KNEE
-        a = mp_pose.PoseLandmark.LEFT_ANKLE
-    else:  # lado == "der"
-        h = mp_pose.PoseLandmark.RIGHT_HIP
-        k = mp_pose.PoseLandmark.RIGHT_KNEE
-        a = mp_pose.PoseLandmark.RIGHT_ANKLE
-
-    if (
-        articulacion_visible(landmarks, h)
-        and articulacion_visible(landmarks, k)
-        and articulacion_visible(landmarks, a)
-    ):
-        cadera  = [landmarks[h].x, landmarks[h].y]
-        rodilla = [landmarks[k].x, landmarks[k].y]
-        tobillo = [landmarks[a].x, landmarks[a].y]
-        return calcular_angulo(cadera, rodilla, tobillo)
+    return angulo_articulacion(landmarks, "rodilla_izq" if lado == "izq" else "rodilla_der")
+
+def detectar_angulo(landmarks, ejercicio, lado):
+    """
+    Devuelve el ángulo de la articulación que evalúa el ejercicio:
+      - ejercicio == 1: codo (detectar_codo)
+      - cualquier otro: rodilla (detectar_rodilla)
+    """
+    if ejercicio == 1:
+        return detectar_codo(landmarks, lado)
+    return detectar_rodilla(landmarks, lado)
+
+def feedback_ejercicio(angulo, angulo_min, angulo_max):
+    """
+    Dado un ángulo detectado y un rango [angulo_min, angulo_max],
+    devuelve un texto y un color (BGR) según si el ángulo está dentro del rango.
+    """
+    if angulo is None:
+        return "Articulación no visible", (200, 200, 0)  # amarillo suave
+
+    if angulo_min <= angulo <= angulo_max:
+        return "Ejercicio correcto", (0, 255, 0)
     else:
-        return None
+        return f"Ángulo fuera de rango [{angulo_min}-{angulo_max}]", (0, 0, 255)
+
+# Rango válido (angulo_min, angulo_max) de la articulación que cuenta cada
+# ejercicio y lado. reglas.py arma sus ejercicios básicos con esta tabla.
+RANGOS_EJERCICIO = {
+    (1, "izq"): (150, 170),
+    (1, "der"): (160, 180),
+    (2, "izq"): (160, 180),
+    (2, "der"): (170, 180),
+}
+
+def obtener_rango_ejercicio(ejercicio, lado):
+    """
+    Devuelve (angulo_min, angulo_max) según:
+      - ejercicio == 1: parte superior (codo)
+      - ejercicio == 2: parte inferior (rodilla)
+    Los valores salen de RANGOS_EJERCICIO; un lado desconocido da (0, 180)
+    y un ejercicio desconocido (0, 360).
+    """
+    if ejercicio not in (1, 2):
+        return 0, 360
+    return RANGOS_EJERCICIO.get((ejercicio, lado), (0, 180))
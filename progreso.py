@@ -0,0 +1,266 @@
+# progreso.py
+
+import argparse
+import sqlite3
+import time
+
+import numpy as np
+
+DIA = 86400.0
+ESCALAS = ("dia", "semana")
+
+# ————— Resúmenes —————
+#
+# Una fila por paciente, ejercicio, lado y período (día o semana) con sumas
+# y cuentas, no promedios: así una repetición nueva se suma sin releer las
+# anteriores. 'resumenes_marca' guarda el rowid de la última repetición ya
+# sumada. Los períodos son días locales desde el epoch; las semanas empiezan
+# el lunes.
+
+ESQUEMA_RESUMENES = """
+CREATE TABLE IF NOT EXISTS resumenes_marca (
+    id INTEGER PRIMARY KEY CHECK (id = 0),
+    ultima_rep INTEGER NOT NULL
+);
+""" + "".join(f"""
+CREATE TABLE IF NOT EXISTS resumen_{escala} (
+    paciente_id INTEGER NOT NULL,
+    ejercicio INTEGER NOT NULL,
+    lado TEXT NOT NULL,
+    periodo INTEGER NOT NULL,
+    reps INTEGER NOT NULL,
+    suma_duracion REAL NOT NULL,
+    n_duracion INTEGER NOT NULL,
+    suma_rango REAL NOT NULL,
+    n_rango INTEGER NOT NULL,
+    rango_max REAL NOT NULL,
+    PRIMARY KEY (paciente_id, ejercicio, lado, periodo)
+) WITHOUT ROWID;
+""" for escala in ESCALAS)
+
+_FILA = np.dtype([
+    ("rowid", "i8"), ("paciente", "i8"), ("ejercicio", "i8"), ("der", "i8"),
+    ("t", "f8"), ("duracion", "f8"), ("rango", "f8"),
+])
+
+LADOS = ("izq", "der")
+
+
+def _desfase_local(t):
+    # Segundos a sumar al epoch para que los días corten a medianoche local.
+    # Se toma el de un instante del bloque: solo los cambios de horario que
+    # caigan dentro del bloque quedan desplazados una hora.
+    return time.localtime(t).tm_gmtoff
+
+
+def _periodos(t, desfase):
+    dia = np.floor((t + desfase) / DIA).astype(np.int64)
+    # El 1/1/1970 fue jueves: +3 hace que la semana 0 empiece el lunes anterior
+    return {"dia": dia, "semana": (dia + 3) // 7}
+
+
+def inicio_periodo(periodo, escala, desfase=None):
+    """
+    Epoch del comienzo de 'periodo' (escalar o array) en la escala dada.
+    """
+    desfase = _desfase_local(time.time()) if desfase is None else desfase
+    dia = periodo if escala == "dia" else np.asarray(periodo) * 7 - 3
+    return dia * DIA - desfase
+
+
+def _agregar(datos, periodo):
+    """
+    Suma las repeticiones de 'datos' por (paciente, ejercicio, lado, período)
+    en un solo paso vectorizado. Devuelve las filas para el UPSERT.
+    """
+    # Clave empaquetada en un int64 (paciente | ejercicio | lado | período
+    # relativo al bloque): np.unique en 1D ordena mucho más rápido que por filas
+    base = int(periodo.min())
+    claves = (((datos["paciente"] << 8 | datos["ejercicio"]) << 1 | datos["der"]) << 24) | (periodo - base)
+    unicas, grupo = np.unique(claves, return_inverse=True)
+    grupo = grupo.ravel()
+    n = len(unicas)
+
+    con_duracion = datos["duracion"] >= 0
+    con_rango = datos["rango"] >= 0
+    reps = np.bincount(grupo, minlength=n)
+    suma_duracion = np.bincount(grupo, np.where(con_duracion, datos["duracion"], 0.0), n)
+    n_duracion = np.bincount(grupo, con_duracion, n)
+    suma_rango = np.bincount(grupo, np.where(con_rango, datos["rango"], 0.0), n)
+    n_rango = np.bincount(grupo, con_rango, n)
+    rango_max = np.zeros(n)
+    np.maximum.at(rango_max, grupo[con_rango], datos["rango"][con_rango])
+
+    pacientes, ejercicios = unicas >> 33, (unicas >> 25) & 0xFF
+    lados, periodos = (unicas >> 24) & 1, (unicas & 0xFFFFFF) + base
+    return list(zip(
+        pacientes.tolist(), ejercicios.tolist(), [LADOS[i] for i in lados.tolist()], periodos.tolist(),
+        reps.tolist(), suma_duracion.tolist(), n_duracion.astype(np.int64).tolist(),
+        suma_rango.tolist(), n_rango.astype(np.int64).tolist(), rango_max.tolist()
+    ))
+
+
+def actualizar_resumenes(conexion, tam_bloque=200000):
+    """
+    Suma a los resúmenes diarios y semanales las repeticiones insertadas
+    desde la última llamada, en bloques de 'tam_bloque'. No hace commit:
+    HistorialPersistente la llama dentro de la transacción de cada lote, así
+    repeticiones, resúmenes y marca quedan siempre consistentes. Devuelve
+    cuántas repeticiones sumó.
+    """
+    fila = conexion.execute("SELECT ultima_rep FROM resumenes_marca WHERE id = 0").fetchone()
+    marca = fila[0] if fila is not None else 0
+    total = 0
+    while True:
+        cursor = conexion.execute(
+            "SELECT r.rowid, s.paciente_id, s.ejercicio, s.lado = 'der', r.t,"
+            " IFNULL(r.duracion, -1.0), IFNULL(r.angulo_max - r.angulo_min, -1.0)"
+            " FROM repeticiones r JOIN sesiones s ON s.id = r.sesion_id"
+            " WHERE r.rowid > ? ORDER BY r.rowid LIMIT ?",
+            (marca, tam_bloque)
+        )
+        datos = np.fromiter(cursor, dtype=_FILA)
+        if len(datos) == 0:
+            break
+        periodos = _periodos(datos["t"], _desfase_local(float(datos["t"][-1])))
+        for escala in ESCALAS:
+            conexion.executemany(
+                f"INSERT INTO resumen_{escala} VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)"
+                " ON CONFLICT (paciente_id, ejercicio, lado, periodo) DO UPDATE SET"
+                " reps = reps + excluded.reps,"
+                " suma_duracion = suma_duracion + excluded.suma_duracion,"
+                " n_duracion = n_duracion + excluded.n_duracion,"
+                " suma_rango = suma_rango + excluded.suma_rango,"
+                " n_rango = n_rango + excluded.n_rango,"
+                " rango_max = max(rango_max, excluded.rango_max)",
+                _agregar(datos, periodos[escala])
+            )
+        marca = int(datos["rowid"][-1])
+        total += len(datos)
+        if len(datos) < tam_bloque:
+            break
+    if total:
+        conexion.execute("INSERT OR REPLACE INTO resumenes_marca VALUES (0, ?)", (marca,))
+    return total
+
+
+def reconstruir_resumenes(conexion):
+    """
+    Borra los resúmenes y los recalcula desde todas las repeticiones.
+    """
+    with conexion:
+        for escala in ESCALAS:
+            conexion.execute(f"DELETE FROM resumen_{escala}")
+        conexion.execute("DELETE FROM resumenes_marca")
+        return actualizar_resumenes(conexion)
+
+
+# ————— Consultas —————
+
+def progreso(historial, paciente, escala="semana", desde=None):
+    """
+    Tendencias de 'paciente' leídas de los resúmenes: un diccionario
+    (ejercicio, lado) -> arrays 'inicio' (epoch del período), 'reps',
+    'tempo' (segundos medios por repetición), 'rango' (rango de movimiento
+    medio, grados) y 'rango_max'. NaN donde un período no tiene el dato.
+    """
+    if escala not in ESCALAS:
+        raise ValueError(f"Escala desconocida: {escala}")
+    desfase = _desfase_local(time.time())
+    condicion, parametros = "", [paciente]
+    if desde is not None:
+        condicion = " AND r.periodo >= ?"
+        parametros.append(int(_periodos(np.array([desde]), desfase)[escala][0]))
+    filas = historial.consultar(
+        "SELECT r.ejercicio, r.lado, r.periodo, r.reps, r.suma_duracion, r.n_duracion,"
+        " r.suma_rango, r.n_rango, r.rango_max"
+        f" FROM resumen_{escala} r JOIN pacientes p ON p.id = r.paciente_id"
+        f" WHERE p.nombre = ?{condicion} ORDER BY r.ejercicio, r.lado, r.periodo",
+        parametros
+    )
+
+    resultado = {}
+    if not filas:
+        return resultado
+    ejercicios = np.array([f[0] for f in filas])
+    lados = np.array([f[1] for f in filas])
+    numeros = np.array([f[2:] for f in filas], dtype=np.float64)
+    periodo, reps, suma_duracion, n_duracion, suma_rango, n_rango, rango_max = numeros.T
+    with np.errstate(invalid="ignore", divide="ignore"):
+        tempo = np.where(n_duracion > 0, suma_duracion / n_duracion, np.nan)
+        rango = np.where(n_rango > 0, suma_rango / n_rango, np.nan)
+    rango_max = np.where(n_rango > 0, rango_max, np.nan)
+    inicio = inicio_periodo(periodo, escala, desfase)
+    for ejercicio in np.unique(ejercicios):
+        for lado in LADOS:
+            m = (ejercicios == ejercicio) & (lados == lado)
+            if m.any():
+                resultado[int(ejercicio), lado] = {
+                    "inicio": inicio[m],
+                    "reps": reps[m].astype(np.int64),
+                    "tempo": tempo[m],
+                    "rango": rango[m],
+                    "rango_max": rango_max[m],
+                }
+    return resultado
+
+
+def asimetria(datos, ejercicio, campo="rango"):
+    """
+    Asimetría izquierda/derecha de 'campo' en los períodos con datos de
+    ambos lados: (inicio, porcentaje), con el porcentaje = (izq - der) sobre
+    la media de los dos. Positivo: el lado izquierdo alcanza más.
+    """
+    izq, der = datos.get((ejercicio, "izq")), datos.get((ejercicio, "der"))
+    if izq is None or der is None:
+        return np.empty(0), np.empty(0)
+    comunes, i, d = np.intersect1d(izq["inicio"], der["inicio"], return_indices=True)
+    a, b = izq[campo][i], der[campo][d]
+    with np.errstate(invalid="ignore", divide="ignore"):
+        return comunes, 100.0 * (a - b) / ((a + b) / 2.0)
+
+
+# ————— Línea de comandos —————
+
+def main(argv=None):
+    from historial import HistorialPersistente, RUTA_HISTORIAL
+
+    parser = argparse.ArgumentParser(description="Tendencias de progreso de un paciente.")
+    parser.add_argument("ruta", nargs="?", default=RUTA_HISTORIAL, help="Archivo SQLite del historial")
+    parser.add_argument("--paciente", required=True)
+    parser.add_argument("--escala", choices=ESCALAS, default="semana")
+    parser.add_argument("--dias", type=float, default=None, help="Solo los últimos N días")
+    parser.add_argument("--reconstruir", action="store_true",
+                        help="Recalcula los resúmenes desde todas las repeticiones")
+    args = parser.parse_args(argv)
+
+    historial = HistorialPersistente(args.ruta)     # Crea o migra el esquema
+    try:
+        if args.reconstruir:
+            t0 = time.perf_counter()
+            conexion = sqlite3.connect(args.ruta, timeout=10.0)
+            try:
+                n = reconstruir_resumenes(conexion)
+            finally:
+                conexion.close()
+            print(f"{n} repeticiones resumidas en {time.perf_counter() - t0:.1f} s")
+        t0 = time.perf_counter()
+        desde = time.time() - args.dias * DIA if args.dias is not None else None
+        datos = progreso(historial, args.paciente, args.escala, desde)
+        t_consulta = time.perf_counter() - t0
+        for (ejercicio, lado), serie in sorted(datos.items()):
+            print(f"Ejercicio {ejercicio} ({lado}):")
+            for inicio, reps, tempo, rango in zip(serie["inicio"], serie["reps"], serie["tempo"], serie["rango"]):
+                print(f"  {time.strftime('%Y-%m-%d', time.localtime(inicio))}  {reps:5d} reps  "
+                      f"tempo {tempo:5.2f} s  rango {rango:6.1f}°")
+        for ejercicio in sorted({e for e, _ in datos}):
+            _, porcentajes = asimetria(datos, ejercicio)
+            if len(porcentajes):
+                print(f"Asimetría media ejercicio {ejercicio}: {np.nanmean(porcentajes):+.1f} %")
+        print(f"Consulta: {t_consulta * 1000:.2f} ms")
+    finally:
+        historial.cerrar()
+
+
+if __name__ == "__main__":
+    main()
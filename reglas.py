@@ -0,0 +1,371 @@
+# reglas.py
+
+import numpy as np
+
+from pose_utils import (
+    ARTICULACIONES,
+    LandmarkFrame,
+    PoseLandmark,
+    RANGOS_EJERCICIO,
+    UMBRAL_VISIBILIDAD,
+    calcular_angulos_vector,
+    como_array,
+    feedback_ejercicio,
+)
+
+# ————— Tipos de regla —————
+TIPO_ANGULO = "angulo"              # Ángulo interior de una articulación (p1-p2-p3)
+TIPO_INCLINACION = "inclinacion"    # Ángulo del segmento p2->p1 respecto de la vertical
+TIPO_SIMETRIA = "simetria"          # |ángulo izq - ángulo der| de una articulación
+
+LADOS = ("izq", "der")
+
+# Landmark de cada segmento corporal por lado, para reglas de inclinación
+SEGMENTOS = {
+    "hombro": (PoseLandmark.LEFT_SHOULDER, PoseLandmark.RIGHT_SHOULDER),
+    "codo": (PoseLandmark.LEFT_ELBOW, PoseLandmark.RIGHT_ELBOW),
+    "muneca": (PoseLandmark.LEFT_WRIST, PoseLandmark.RIGHT_WRIST),
+    "cadera": (PoseLandmark.LEFT_HIP, PoseLandmark.RIGHT_HIP),
+    "rodilla": (PoseLandmark.LEFT_KNEE, PoseLandmark.RIGHT_KNEE),
+    "tobillo": (PoseLandmark.LEFT_ANKLE, PoseLandmark.RIGHT_ANKLE),
+}
+
+# Hacia arriba en coordenadas de imagen (y crece hacia abajo)
+_ARRIBA = np.array([0.0, -1.0])
+
+
+class Regla:
+    """
+    Condición declarativa sobre la pose: 'puntos' son los índices de
+    landmarks que mide, 'rango' el intervalo (min, max) en grados que se
+    considera correcto y 'umbral' la visibilidad mínima de esos puntos para
+    evaluarla. Para TIPO_SIMETRIA 'puntos' son dos triples (izq, der).
+    """
+    __slots__ = ("nombre", "tipo", "puntos", "rango", "umbral", "mensaje")
+
+    def __init__(self, nombre, tipo, puntos, rango, umbral=UMBRAL_VISIBILIDAD, mensaje=None):
+        self.nombre = nombre
+        self.tipo = tipo
+        self.puntos = puntos
+        self.rango = rango
+        self.umbral = umbral
+        self.mensaje = mensaje
+
+    def __repr__(self):
+        return f"Regla({self.nombre!r}, {self.tipo!r}, rango={self.rango!r})"
+
+
+def _lados(lado):
+    return LADOS if lado == "ambos" else (lado,)
+
+
+def angulo(articulacion, rango, lado="ambos", umbral=UMBRAL_VISIBILIDAD, mensaje=None):
+    """
+    Reglas de ángulo interior para 'articulacion' (p. ej. "rodilla", clave
+    de ARTICULACIONES sin el sufijo de lado) en uno o ambos lados.
+    """
+    return [
+        Regla(f"{articulacion}_{l}", TIPO_ANGULO, ARTICULACIONES[f"{articulacion}_{l}"], rango, umbral, mensaje)
+        for l in _lados(lado)
+    ]
+
+
+def inclinacion(superior, inferior, rango, lado="ambos", nombre=None, umbral=UMBRAL_VISIBILIDAD, mensaje=None):
+    """
+    Reglas de inclinación del segmento inferior -> superior respecto de la
+    vertical (0° = erguido). P. ej. inclinacion("hombro", "cadera", (0, 45))
+    limita cuánto se inclina el torso.
+    """
+    nombre = nombre or f"{inferior}_{superior}"
+    reglas = []
+    for l in _lados(lado):
+        i = LADOS.index(l)
+        p1, p2 = SEGMENTOS[superior][i], SEGMENTOS[inferior][i]
+        reglas.append(Regla(f"inclinacion_{nombre}_{l}", TIPO_INCLINACION, (p1, p2, p2), rango, umbral, mensaje))
+    return reglas
+
+
+def simetria(articulacion, max_diferencia, umbral=UMBRAL_VISIBILIDAD, mensaje=None):
+    """
+    Regla de simetría: el ángulo de 'articulacion' no puede diferir en más
+    de 'max_diferencia' grados entre ambos lados.
+    """
+    puntos = (ARTICULACIONES[f"{articulacion}_izq"], ARTICULACIONES[f"{articulacion}_der"])
+    return [Regla(f"simetria_{articulacion}", TIPO_SIMETRIA, puntos, (0.0, max_diferencia), umbral, mensaje)]
+
+
+class ResultadoReglas:
+    """
+    Resultado de evaluar un ConjuntoReglas sobre N frames. Arrays (N, R) en
+    el orden de 'nombres':
+      - valores: grados medidos (NaN si no se pudo medir)
+      - visibles: la regla tenía todos sus puntos visibles
+      - cumple: visible y dentro del rango
+    """
+    __slots__ = ("conjunto", "valores", "visibles", "cumple")
+
+    def __init__(self, conjunto, valores, visibles, cumple):
+        self.conjunto = conjunto
+        self.valores = valores
+        self.visibles = visibles
+        self.cumple = cumple
+
+    @property
+    def nombres(self):
+        return self.conjunto.nombres
+
+    @property
+    def correcto(self):
+        """
+        (N,) True si ninguna regla visible falla en el frame.
+        """
+        return (self.cumple | ~self.visibles).all(axis=1)
+
+    def mensajes(self, i=-1, excluir=()):
+        """
+        Textos de las reglas visibles que fallan en el frame i (salvo las
+        de índices en 'excluir').
+        """
+        textos = []
+        for r in np.flatnonzero(self.visibles[i] & ~self.cumple[i]):
+            if r in excluir:
+                continue
+            regla = self.conjunto.reglas[r]
+            if regla.mensaje:
+                textos.append(regla.mensaje)
+            else:
+                minimo, maximo = regla.rango
+                textos.append(f"{regla.nombre}: {self.valores[i, r]:.0f}° fuera de [{minimo:g}-{maximo:g}]")
+        return textos
+
+
+class ConjuntoReglas:
+    """
+    Reglas compiladas a arrays de índices. Cada ángulo distinto que usan las
+    reglas (triple de landmarks, o par + vertical) se calcula una sola vez
+    para todos los frames con calcular_angulos_vector; después cada regla es
+    una columna (o la diferencia de dos, para simetría) comparada contra su
+    rango. Evaluar no hace ninguna llamada de Python por regla.
+
+    'conteo' es el nombre de la regla cuyo ángulo alimenta al contador de
+    repeticiones (None si el ejercicio no cuenta repeticiones).
+    """
+
+    def __init__(self, reglas, conteo=None):
+        self.reglas = list(reglas)
+        self.nombres = tuple(r.nombre for r in self.reglas)
+        if len(set(self.nombres)) != len(self.nombres):
+            raise ValueError("Nombres de reglas repetidos")
+        if conteo is not None and conteo not in self.nombres:
+            raise ValueError(f"La regla de conteo '{conteo}' no está en el conjunto")
+        self.conteo = conteo
+        self._compilar()
+
+    def _compilar(self):
+        mediciones = {}     # (p1, p2, p3, vertical) -> columna
+
+        def columna(p1, p2, p3, vertical):
+            clave = (int(p1), int(p2), int(p3), vertical)
+            return mediciones.setdefault(clave, len(mediciones))
+
+        col_a, col_b = [], []
+        for regla in self.reglas:
+            if regla.tipo == TIPO_SIMETRIA:
+                izq, der = regla.puntos
+                col_a.append(columna(*izq, False))
+                col_b.append(columna(*der, False))
+            else:
+                a = columna(*regla.puntos, regla.tipo == TIPO_INCLINACION)
+                col_a.append(a)
+                col_b.append(a)
+
+        claves = list(mediciones)
+        self._p1 = np.array([c[0] for c in claves], dtype=np.intp)
+        self._p2 = np.array([c[1] for c in claves], dtype=np.intp)
+        self._p3 = np.array([c[2] for c in claves], dtype=np.intp)
+        self._vertical = np.array([c[3] for c in claves], dtype=bool)
+        self._col_a = np.array(col_a, dtype=np.intp)
+        self._col_b = np.array(col_b, dtype=np.intp)
+        self._simetria = np.array([r.tipo == TIPO_SIMETRIA for r in self.reglas], dtype=bool)
+        self._minimos = np.array([r.rango[0] for r in self.reglas], dtype=np.float64)
+        self._maximos = np.array([r.rango[1] for r in self.reglas], dtype=np.float64)
+        self._umbrales = np.array([r.umbral for r in self.reglas], dtype=np.float64)
+
+    def indice(self, nombre):
+        return self.nombres.index(nombre)
+
+    def evaluar(self, datos):
+        """
+        Evalúa todas las reglas sobre 'datos': array (N, 33, 4), o (33, 4) /
+        LandmarkFrame para un solo frame (el resultado tiene N = 1).
+        """
+        datos = como_array(datos) if isinstance(datos, LandmarkFrame) else np.asarray(datos)
+        if datos.ndim == 2:
+            datos = datos[np.newaxis]
+
+        xy = datos[..., :2].astype(np.float64)
+        vis = datos[..., 3].astype(np.float64)
+
+        p2 = xy[:, self._p2]
+        # Para las inclinaciones el tercer punto es el vértice desplazado hacia arriba
+        p3 = np.where(self._vertical[:, np.newaxis], p2 + _ARRIBA, xy[:, self._p3])
+        angulos = calcular_angulos_vector(xy[:, self._p1], p2, p3)
+        vis_min = np.minimum(np.minimum(vis[:, self._p1], vis[:, self._p2]), vis[:, self._p3])
+
+        a = angulos[:, self._col_a]
+        valores = np.where(self._simetria, np.abs(a - angulos[:, self._col_b]), a)
+        visibles = (vis_min[:, self._col_a] > self._umbrales) & (vis_min[:, self._col_b] > self._umbrales)
+        valores[~visibles] = np.nan
+        cumple = visibles & (valores >= self._minimos) & (valores <= self._maximos)
+        return ResultadoReglas(self, valores, visibles, cumple)
+
+    def angulo_conteo(self, resultado):
+        """
+        (N,) ángulo de la regla de conteo (NaN donde no es visible).
+        """
+        return resultado.valores[:, self.indice(self.conteo)]
+
+
+# ————— Registro de ejercicios —————
+
+EJERCICIOS = {}
+
+
+def registrar_ejercicio(nombre, reglas, conteo=None):
+    EJERCICIOS[nombre] = ConjuntoReglas(reglas, conteo)
+    return EJERCICIOS[nombre]
+
+
+def obtener_ejercicio(nombre):
+    try:
+        return EJERCICIOS[nombre]
+    except KeyError:
+        raise ValueError(f"Ejercicio desconocido '{nombre}' (disponibles: {', '.join(sorted(EJERCICIOS))})")
+
+
+# Los de la GUI (ejercicio 1 = codo, 2 = rodilla), con los mismos rangos
+for (_ejercicio, _lado), _rango in RANGOS_EJERCICIO.items():
+    _base = "codo" if _ejercicio == 1 else "rodilla"
+    registrar_ejercicio(
+        f"{'brazos' if _ejercicio == 1 else 'piernas'}_{_lado}",
+        angulo(_base, _rango, lado=_lado),
+        conteo=f"{_base}_{_lado}"
+    )
+
+registrar_ejercicio(
+    "sentadilla",
+    angulo("rodilla", (70, 180), mensaje="Rodillas demasiado flexionadas")
+    + angulo("cadera", (60, 180), mensaje="Cadera demasiado cerrada")
+    + inclinacion("hombro", "cadera", (0, 45), nombre="torso", mensaje="Torso demasiado inclinado")
+    + simetria("rodilla", 15, mensaje="Flexión de rodillas asimétrica"),
+    conteo="rodilla_izq"
+)
+
+registrar_ejercicio(
+    "curl_bilateral",
+    angulo("codo", (30, 175))
+    + angulo("hombro", (0, 30), mensaje="Codos separados del torso")
+    + inclinacion("hombro", "cadera", (0, 15), nombre="torso", mensaje="No balancee el torso")
+    + simetria("codo", 20, mensaje="Brazos desparejos"),
+    conteo="codo_izq"
+)
+
+
+# ————— Ejercicios de la GUI —————
+
+# Ejercicios del registro que se eligen en la GUI además de brazos (1) y
+# piernas (2). El código es el que guardan las grabaciones y el historial.
+CODIGOS_EJERCICIO = {3: "sentadilla", 4: "curl_bilateral"}
+
+# Mismo rojo (BGR) que feedback_ejercicio fuera de rango
+_COLOR_FALLA = (0, 0, 255)
+
+
+def nombre_ejercicio(ejercicio, lado):
+    """
+    Nombre en EJERCICIOS del ejercicio 'ejercicio' (código de la GUI).
+    """
+    if ejercicio in CODIGOS_EJERCICIO:
+        return CODIGOS_EJERCICIO[ejercicio]
+    return f"{'brazos' if ejercicio == 1 else 'piernas'}_{lado}"
+
+
+class EjercicioSesion:
+    """
+    Lo que se evalúa en cada frame de una sesión de (ejercicio, lado): todas
+    las reglas del ejercicio en una pasada de ConjuntoReglas.evaluar. El
+    ángulo de la regla de conteo alimenta al contador, tomada del lado
+    elegido si el ejercicio la tiene para ambos lados, y su rango es el de
+    conteo. Salir de ese rango es parte de la repetición, así que esa regla
+    (y la del otro lado) no genera mensajes: el feedback de las demás va
+    antes que el del rango.
+    """
+    __slots__ = ("nombre", "conjunto", "conteo", "rango", "_excluir")
+
+    def __init__(self, ejercicio, lado):
+        self.nombre = nombre_ejercicio(ejercicio, lado)
+        self.conjunto = obtener_ejercicio(self.nombre)
+        base = self.conjunto.conteo.rsplit("_", 1)[0]
+        conteo = f"{base}_{lado}"
+        if conteo not in self.conjunto.nombres:
+            conteo = self.conjunto.conteo
+        self.conteo = self.conjunto.indice(conteo)
+        self.rango = self.conjunto.reglas[self.conteo].rango
+        self._excluir = tuple(
+            i for i, nombre in enumerate(self.conjunto.nombres) if nombre in (f"{base}_{l}" for l in LADOS)
+        )
+
+    def evaluar(self, datos):
+        return self.conjunto.evaluar(datos)
+
+    def angulos(self, resultado):
+        """
+        (N,) ángulo de conteo (NaN donde no es visible).
+        """
+        return resultado.valores[:, self.conteo]
+
+    def angulo(self, resultado, i=0):
+        valor = resultado.valores[i, self.conteo]
+        return None if np.isnan(valor) else float(valor)
+
+    def con_fallas(self, resultado):
+        """
+        (N,) True en los frames donde falla alguna regla visible además de
+        la de conteo.
+        """
+        fallan = resultado.visibles & ~resultado.cumple
+        fallan[:, self._excluir] = False
+        return fallan.any(axis=1)
+
+    def mensajes(self, resultado, i=0):
+        return resultado.mensajes(i, excluir=self._excluir)
+
+
+_SESIONES = {}
+
+
+def ejercicio_sesion(ejercicio, lado):
+    """
+    EjercicioSesion de (ejercicio, lado), compilado una sola vez.
+    """
+    sesion = _SESIONES.get((ejercicio, lado))
+    if sesion is None:
+        sesion = _SESIONES[ejercicio, lado] = EjercicioSesion(ejercicio, lado)
+    return sesion
+
+
+def rango_conteo(ejercicio, lado):
+    """
+    Como obtener_rango_ejercicio, también para los ejercicios del registro.
+    """
+    return ejercicio_sesion(ejercicio, lado).rango
+
+
+def feedback_reglas(angulo, ang_min, ang_max, mensajes=()):
+    """
+    Texto y color (BGR) del feedback: los mensajes de las reglas que fallan
+    o, si no hay, el de feedback_ejercicio para el ángulo de conteo.
+    """
+    if angulo is not None and mensajes:
+        return "; ".join(mensajes), _COLOR_FALLA
+    return feedback_ejercicio(angulo, ang_min, ang_max)
@@ -0,0 +1,105 @@
+# render.py
+
+import cv2
+import numpy as np
+from PIL import Image, ImageTk
+
+
+def _imagen_en_bloque(tam):
+    """
+    Imagen PIL RGB cuya memoria es un único bloque. ImageTk.PhotoImage.paste()
+    copia estas imágenes directo a Tk; con cualquier otra crea un bloque
+    temporal en cada llamada.
+    """
+    if hasattr(Image.core, "new_block"):
+        return Image.new("RGB", (1, 1))._new(Image.core.new_block("RGB", tam))
+    return Image.new("RGB", tam)
+
+
+class RenderizadorPanel:
+    """
+    Dibuja frames RGB en un Canvas de Tk sin asignar imágenes por frame.
+
+    Por frame solo se hace:
+      1. cv2.resize() directo a un buffer NumPy preasignado,
+      2. copia de ese buffer a una imagen PIL persistente (frombytes),
+      3. paste() sobre un único PhotoImage persistente.
+
+    Buffer, imagen y PhotoImage se reconstruyen solo cuando cambia el tamaño
+    del panel (redimensionar) o del frame de origen. 'asignaciones' cuenta
+    esas reconstrucciones: en régimen estable no crece mientras 'frames' sí.
+    """
+
+    def __init__(self, canvas):
+        self.canvas = canvas
+        self.ancho_panel = None
+        self.alto_panel = None
+
+        self._tam_origen = None
+        self._tam_destino = None
+        self._buffer = None
+        self._imagen = None
+        self._photo = None
+        self._item = None
+
+        # ————— Estadísticas —————
+        self.frames = 0
+        self.asignaciones = 0
+        self.frames_sin_asignar = 0     # Frames desde la última reconstrucción
+
+    def redimensionar(self, ancho, alto):
+        """
+        Llamar desde el <Configure> del panel: los buffers se reconstruyen en
+        el próximo frame.
+        """
+        if (ancho, alto) != (self.ancho_panel, self.alto_panel):
+            self.ancho_panel = ancho
+            self.alto_panel = alto
+            self._tam_origen = None
+
+    def _reconstruir(self, ancho_src, alto_src):
+        panel_w = self.ancho_panel or self.canvas.winfo_width()
+        panel_h = self.alto_panel or self.canvas.winfo_height()
+        ratio = min(panel_w / ancho_src, panel_h / alto_src)
+        tam = (max(1, int(ancho_src * ratio)), max(1, int(alto_src * ratio)))
+
+        if tam != self._tam_destino:
+            self._buffer = np.empty((tam[1], tam[0], 3), dtype=np.uint8)
+            self._imagen = _imagen_en_bloque(tam)
+            self._photo = ImageTk.PhotoImage("RGB", tam)
+            self._tam_destino = tam
+            self.asignaciones += 1
+            self.frames_sin_asignar = 0
+
+        centro = (panel_w // 2, panel_h // 2)
+        if self._item is None:
+            self._item = self.canvas.create_image(*centro, image=self._photo)
+        else:
+            self.canvas.itemconfig(self._item, image=self._photo)
+            self.canvas.coords(self._item, *centro)
+        self._tam_origen = (ancho_src, alto_src)
+
+    def mostrar(self, frame_rgb, superponer=None):
+        """
+        'superponer(buffer)' dibuja sobre el buffer ya escalado (p. ej. el HUD
+        de rendimiento) antes de pasarlo a Tk.
+        """
+        alto_src, ancho_src = frame_rgb.shape[:2]
+        if self._tam_origen != (ancho_src, alto_src):
+            self._reconstruir(ancho_src, alto_src)
+
+        cv2.resize(frame_rgb, self._tam_destino, dst=self._buffer, interpolation=cv2.INTER_LINEAR)
+        if superponer is not None:
+            superponer(self._buffer)
+        self._imagen.frombytes(self._buffer)
+        self._photo.paste(self._imagen)
+
+        self.frames += 1
+        self.frames_sin_asignar += 1
+
+    def estadisticas(self):
+        return {
+            "frames_render": self.frames,
+            "asignaciones_render": self.asignaciones,
+            "frames_sin_asignar": self.frames_sin_asignar,
+        }
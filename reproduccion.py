@@ -0,0 +1,306 @@
+# reproduccion.py
+
+"""
+Reproducción determinista de landmarks a través del conteo de la GUI.
+
+Alimenta una secuencia de landmarks con sus instantes (de una grabación
+.fbip o generada sintéticamente) al mismo ContadorRepeticiones y al mismo
+feedback que usa PoseAppGUI.update_frame (las reglas del ejercicio de
+reglas.py), sin cámara, MediaPipe ni Tk, tan rápido como dé la CPU. Sirve
+para pruebas de regresión y para volver a puntuar sesiones viejas cuando
+cambian los rangos de las reglas.
+
+Uso:
+    python reproduccion.py grabaciones/sesion_20250101_120000.fbip --reps 10 --series 3
+    python reproduccion.py --sintetico --ejercicio 2 --lado der --reps 8 --series 2
+    python reproduccion.py grabaciones/sesion_20250101_120000.fbip --verificar
+"""
+
+import argparse
+import json
+import math
+import sys
+import time
+
+import numpy as np
+
+from contador import ContadorRepeticiones
+from pose_utils import NUM_LANDMARKS
+from reglas import CODIGOS_EJERCICIO, ejercicio_sesion, feedback_reglas, rango_conteo
+
+# Frames por bloque al reproducir una grabación (no se carga entera)
+TAM_BLOQUE = 4096
+
+LADOS = ("izq", "der")
+
+
+class Reproductor:
+    """
+    Repite paso a paso lo que hace update_frame con cada frame:
+    reglas -> ángulo de conteo -> ContadorRepeticiones.actualizar -> feedback.
+
+    Igual que en la GUI, el contador arranca con el primer frame y cambiar de
+    ejercicio o lado a mitad de la sesión lo reinicia (reset_counters), salvo
+    que el ejercicio ya haya terminado; el contador nuevo arranca con el
+    frame siguiente. 'rango' permite puntuar con otros umbrales que los de
+    la regla de conteo (rango_conteo).
+    """
+
+    def __init__(self, target_reps, target_series, rango=rango_conteo):
+        self.target_reps = target_reps
+        self.target_series = target_series
+        self.rango = rango
+        self.contador = ContadorRepeticiones(target_reps, target_series)
+        self.config = None
+        self.frames = 0
+        self.eventos = []           # (t, evento, reps, series_restantes)
+        self.transiciones = []      # (t, texto de feedback) cada vez que cambia
+        self.feedback = None        # (texto, color BGR) del último frame
+        self._rangos = {}
+
+    def paso(self, t, angulo, ejercicio, lado, mensajes=()):
+        """
+        Procesa un frame. 'angulo' es None si la articulación no es visible;
+        'mensajes' son los de las reglas que fallan (EjercicioSesion.mensajes).
+        Devuelve el evento del contador (o None).
+        """
+        if (ejercicio, lado) != self.config:
+            if self.config is not None and not self.contador.terminado:
+                self.contador = ContadorRepeticiones(self.target_reps, self.target_series)
+            self.config = (ejercicio, lado)
+        if self.contador.start_time is None:
+            self.contador.iniciar(t)
+
+        rango = self._rangos.get(self.config)
+        if rango is None:
+            rango = self._rangos[self.config] = self.rango(ejercicio, lado)
+        ang_min, ang_max = rango
+
+        evento = self.contador.actualizar(angulo, ang_min, ang_max, t)
+        if evento is not None:
+            self.eventos.append((t, evento, self.contador.reps, self.contador.series_left))
+
+        self.feedback = feedback_reglas(angulo, ang_min, ang_max, mensajes)
+        texto = self.feedback[0]
+        if not self.transiciones or self.transiciones[-1][1] != texto:
+            self.transiciones.append((t, texto))
+
+        self.frames += 1
+        return evento
+
+    def resumen(self):
+        resumen = self.contador.resumen()
+        resumen["frames"] = self.frames
+        resumen["eventos"] = list(self.eventos)
+        resumen["transiciones_feedback"] = list(self.transiciones)
+        return resumen
+
+
+def reproducir(frames, target_reps, target_series, rango=rango_conteo):
+    """
+    Reproduce frames (t, LandmarkFrame o None, ejercicio, lado), por ejemplo
+    LectorGrabacion.frames(). Evalúa las reglas frame a frame, igual que en
+    vivo.
+    """
+    reproductor = Reproductor(target_reps, target_series, rango)
+    for t, landmarks, ejercicio, lado in frames:
+        angulo, mensajes = None, ()
+        if landmarks is not None:
+            sesion = ejercicio_sesion(ejercicio, lado)
+            resultado = sesion.evaluar(landmarks.datos)
+            angulo, mensajes = sesion.angulo(resultado), sesion.mensajes(resultado)
+        reproductor.paso(t, angulo, ejercicio, lado, mensajes)
+    return reproductor.resumen()
+
+
+def evaluar_ejercicios(datos, ejercicios, lados):
+    """
+    Evalúa las reglas del ejercicio de cada frame: datos (N, 33, 4),
+    ejercicios (N,) con el código de la GUI y lados (N,) con 0=izq, 1=der.
+    Una pasada de ConjuntoReglas.evaluar por cada (ejercicio, lado) que
+    aparece. Devuelve (ángulos de conteo (N,), NaN donde no son visibles;
+    {frame: mensajes} solo de los frames con reglas que fallan).
+    """
+    ejercicios = np.asarray(ejercicios, dtype=np.intp)
+    lados = np.asarray(lados, dtype=np.intp)
+    angulos = np.full(len(ejercicios), np.nan)
+    mensajes = {}
+    claves = ejercicios * len(LADOS) + lados
+    for clave in np.unique(claves).tolist():
+        filas = np.flatnonzero(claves == clave)
+        sesion = ejercicio_sesion(clave // len(LADOS), LADOS[clave % len(LADOS)])
+        resultado = sesion.evaluar(datos[filas])
+        angulos[filas] = sesion.angulos(resultado)
+        for k in np.flatnonzero(sesion.con_fallas(resultado)).tolist():
+            mensajes[int(filas[k])] = sesion.mensajes(resultado, k)
+    return angulos, mensajes
+
+
+def reproducir_arrays(tiempos, datos, ejercicios, lados, target_reps, target_series,
+                      rango=rango_conteo, reproductor=None):
+    """
+    Igual que reproducir(), pero con arrays: tiempos (N,), datos (N, 33, 4),
+    ejercicios (N,) con el código de la GUI y lados (N,) con 0=izq, 1=der.
+    Las reglas se evalúan para todo el bloque con evaluar_ejercicios (mismo
+    resultado que frame a frame); solo el conteo queda secuencial.
+    Pasar 'reproductor' permite encadenar bloques de una misma sesión.
+    """
+    reproductor = reproductor or Reproductor(target_reps, target_series, rango)
+    n = len(tiempos)
+    if n:
+        angulos, mensajes = evaluar_ejercicios(datos, ejercicios, lados)
+        for i, (t, angulo, ejercicio, lado) in enumerate(zip(tiempos.tolist(), angulos.tolist(),
+                                                             np.asarray(ejercicios).tolist(),
+                                                             np.asarray(lados).tolist())):
+            reproductor.paso(t, None if math.isnan(angulo) else angulo, ejercicio, LADOS[lado],
+                             mensajes.get(i, ()))
+    return reproductor
+
+
+def reproducir_grabacion(lector, target_reps, target_series, rango=rango_conteo,
+                         t_inicio=None, t_fin=None, tam_bloque=TAM_BLOQUE, epoch=False):
+    """
+    Reproduce una grabación (LectorGrabacion) por bloques de 'tam_bloque'
+    registros, así una sesión de horas no se carga entera en memoria. Con
+    'epoch' los instantes se pasan a epoch con el inicio de la grabación,
+    el mismo reloj que usó el contador en vivo.
+    """
+    registros = lector.recortar(t_inicio, t_fin)
+    reproductor = Reproductor(target_reps, target_series, rango)
+    desfase = lector.inicio_epoch if epoch else 0.0
+    for i in range(0, len(registros), tam_bloque):
+        bloque = registros[i:i + tam_bloque]
+        reproducir_arrays(
+            desfase + bloque["t"], bloque["landmarks"], bloque["ejercicio"], bloque["lado"],
+            target_reps, target_series, rango, reproductor=reproductor
+        )
+    return reproductor.resumen()
+
+
+def verificar_grabacion(ruta):
+    """
+    Reproduce una grabación de la GUI y compara el resultado con el conteo
+    en vivo guardado junto a ella (ruta_resumen). Devuelve un diccionario
+    clave -> (en vivo, reproducido) con las claves de
+    ContadorRepeticiones.resumen() que no coinciden; vacío si coinciden todas.
+    """
+    from grabacion import LectorGrabacion, ruta_resumen
+
+    with open(ruta_resumen(ruta), encoding="utf-8") as f:
+        vivo = json.load(f)
+    lector = LectorGrabacion(ruta)
+    try:
+        reproducido = reproducir_grabacion(lector, vivo["target_reps"], vivo["target_series"], epoch=True)
+    finally:
+        lector.cerrar()
+    return {
+        clave: (valor, reproducido[clave])
+        for clave, valor in vivo["contador"].items()
+        if reproducido[clave] != valor
+    }
+
+
+# ————— Datos sintéticos —————
+
+# Persona de frente y de pie, en coordenadas normalizadas (x, y)
+_POSE_NEUTRA = np.array([
+    (0.50, 0.15), (0.51, 0.13), (0.52, 0.13), (0.53, 0.13), (0.49, 0.13), (0.48, 0.13),
+    (0.47, 0.13), (0.55, 0.14), (0.45, 0.14), (0.51, 0.18), (0.49, 0.18),
+    (0.60, 0.28), (0.40, 0.28), (0.63, 0.42), (0.37, 0.42), (0.64, 0.55), (0.36, 0.55),
+    (0.645, 0.58), (0.355, 0.58), (0.645, 0.58), (0.355, 0.58), (0.645, 0.58), (0.355, 0.58),
+    (0.56, 0.55), (0.44, 0.55), (0.57, 0.72), (0.43, 0.72), (0.57, 0.88), (0.43, 0.88),
+    (0.565, 0.90), (0.435, 0.90), (0.59, 0.92), (0.41, 0.92),
+], dtype=np.float32)
+
+
+def generar_sintetico(ejercicio=1, lado="izq", reps=10, fps=30.0, periodo=2.0,
+                      angulo_bajo=None, angulo_alto=None, ruido=0.0, perdidos=0.0, semilla=0):
+    """
+    Genera una sesión sintética de 'reps' repeticiones: la articulación del
+    ejercicio (la de su regla de conteo) oscila entre 'angulo_bajo' y
+    'angulo_alto' (por defecto, 60° por debajo del rango y el centro del
+    rango, o 0° si queda por debajo) con un ciclo por
+    repetición. 'ruido' es el desvío (en coordenadas normalizadas) que se
+    suma a x e y, y 'perdidos' la fracción de frames sin pose.
+    Devuelve (tiempos, datos, ejercicios, lados) para reproducir_arrays.
+    """
+    sesion = ejercicio_sesion(ejercicio, lado)
+    ang_min, ang_max = sesion.rango
+    if angulo_bajo is None:
+        angulo_bajo = max(ang_min - 60.0, 0.0)
+    if angulo_alto is None:
+        angulo_alto = (ang_min + ang_max) / 2.0
+
+    n = int(round((reps + 0.5) * periodo * fps))
+    tiempos = np.arange(n) / fps
+    fase = 2 * np.pi * tiempos / periodo
+    angulos = angulo_bajo + (angulo_alto - angulo_bajo) * (1 - np.cos(fase)) / 2
+
+    datos = np.empty((n, NUM_LANDMARKS, 4), dtype=np.float32)
+    datos[:, :, :2] = _POSE_NEUTRA
+    datos[:, :, 2] = 0.0
+    datos[:, :, 3] = 0.95
+
+    # El extremo distal gira alrededor del vértice hasta formar el ángulo pedido
+    i1, i2, i3 = sesion.conjunto.reglas[sesion.conteo].puntos
+    v1 = _POSE_NEUTRA[i1] - _POSE_NEUTRA[i2]
+    radio = np.hypot(*(_POSE_NEUTRA[i3] - _POSE_NEUTRA[i2]))
+    direccion = np.arctan2(v1[1], v1[0]) + np.radians(angulos)
+    datos[:, i3, 0] = _POSE_NEUTRA[i2, 0] + radio * np.cos(direccion)
+    datos[:, i3, 1] = _POSE_NEUTRA[i2, 1] + radio * np.sin(direccion)
+
+    rng = np.random.default_rng(semilla)
+    if ruido:
+        datos[:, :, :2] += rng.normal(0.0, ruido, size=(n, NUM_LANDMARKS, 2)).astype(np.float32)
+    if perdidos:
+        datos[rng.random(n) < perdidos] = 0.0
+
+    ejercicios = np.full(n, ejercicio, dtype=np.uint8)
+    lados = np.full(n, LADOS.index(lado), dtype=np.uint8)
+    return tiempos, datos, ejercicios, lados
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Reproducción de landmarks a través del contador de repeticiones.")
+    parser.add_argument("grabacion", nargs="?", help="Archivo .fbip de GrabadorSesion")
+    parser.add_argument("--sintetico", action="store_true", help="Usar una sesión sintética en lugar de una grabación")
+    parser.add_argument("--ejercicio", type=int, choices=(1, 2, *CODIGOS_EJERCICIO), default=1,
+                        help="1=brazo, 2=pierna, " + ", ".join(f"{c}={n}" for c, n in CODIGOS_EJERCICIO.items())
+                        + " (sintético)")
+    parser.add_argument("--lado", choices=LADOS, default="izq", help="Lado (sintético)")
+    parser.add_argument("--reps", type=int, default=10, help="Repeticiones por serie")
+    parser.add_argument("--series", type=int, default=3, help="Series")
+    parser.add_argument("--desde", type=float, default=None, help="Segundo inicial de la grabación")
+    parser.add_argument("--hasta", type=float, default=None, help="Segundo final de la grabación")
+    parser.add_argument("--verificar", action="store_true",
+                        help="Comparar la reproducción con el conteo en vivo guardado junto a la grabación")
+    args = parser.parse_args(argv)
+
+    if args.verificar:
+        if not args.grabacion:
+            parser.error("--verificar necesita una grabación")
+        diferencias = verificar_grabacion(args.grabacion)
+        for clave, (vivo, reproducido) in diferencias.items():
+            print(f"{clave}: en vivo {vivo!r}, reproducido {reproducido!r}")
+        print("La reproducción coincide con el conteo en vivo" if not diferencias else
+              f"{len(diferencias)} diferencias con el conteo en vivo")
+        return 1 if diferencias else 0
+
+    t0 = time.perf_counter()
+    if args.sintetico:
+        datos = generar_sintetico(args.ejercicio, args.lado, reps=args.reps * args.series)
+        resumen = reproducir_arrays(*datos, args.reps, args.series).resumen()
+    elif args.grabacion:
+        from grabacion import LectorGrabacion
+        lector = LectorGrabacion(args.grabacion)
+        resumen = reproducir_grabacion(lector, args.reps, args.series, t_inicio=args.desde, t_fin=args.hasta)
+    else:
+        parser.error("indique una grabación o --sintetico")
+    t_total = time.perf_counter() - t0
+
+    resumen["frames_por_segundo"] = resumen["frames"] / t_total if t_total > 0 else 0.0
+    print(json.dumps(resumen, indent=2, ensure_ascii=False))
+
+
+if __name__ == "__main__":
+    sys.exit(main())
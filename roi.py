@@ -0,0 +1,105 @@
+# roi.py
+
+import cv2
+import numpy as np
+
+from pose_utils import LandmarkFrame
+
+
+class RecorteROI:
+    """
+    Etapa de región de interés para la inferencia.
+    Con los landmarks del frame anterior recorta una caja con margen
+    alrededor de la persona, la reduce a 'resolucion' píxeles en su lado
+    mayor y, tras la inferencia, devuelve los landmarks a coordenadas del
+    frame completo. Si no hay landmarks previos (seguimiento perdido) busca
+    en el frame completo, también reducido.
+    """
+
+    def __init__(self, resolucion=320, margen=0.25, umbral=0.5, min_puntos=4):
+        self.resolucion = resolucion
+        self.margen = margen
+        self.umbral = umbral
+        self.min_puntos = min_puntos
+
+        # ————— Estadísticas —————
+        self.frames_recorte = 0
+        self.frames_completos = 0
+        self.pixeles_frame = 0       # Píxeles de los frames originales
+        self.pixeles_inferencia = 0  # Píxeles que realmente recibió el modelo
+
+    def caja(self, ancho, alto, previos):
+        """
+        Caja (x0, y0, x1, y1) en píxeles a partir de los landmarks previos
+        (LandmarkFrame en coordenadas del frame completo) o None si no hay
+        suficientes puntos visibles.
+        """
+        if previos is None:
+            return None
+        visibles = previos.visibilidad > self.umbral
+        if np.count_nonzero(visibles) < self.min_puntos:
+            return None
+
+        xy = previos.xy[visibles] * (ancho, alto)
+        x0, y0 = xy.min(axis=0)
+        x1, y1 = xy.max(axis=0)
+        pad = self.margen * max(x1 - x0, y1 - y0)
+
+        x0 = int(max(0, x0 - pad))
+        y0 = int(max(0, y0 - pad))
+        x1 = int(min(ancho, x1 + pad))
+        y1 = int(min(alto, y1 + pad))
+        if x1 - x0 < 16 or y1 - y0 < 16:
+            return None
+        return x0, y0, x1, y1
+
+    def preparar(self, frame_rgb, previos):
+        """
+        Devuelve (entrada, caja): la imagen que debe recibir pose.process() y
+        la caja (x0, y0, x1, y1) que representa dentro del frame.
+        """
+        alto, ancho = frame_rgb.shape[:2]
+        caja = self.caja(ancho, alto, previos)
+        if caja is None:
+            caja = (0, 0, ancho, alto)
+            self.frames_completos += 1
+        else:
+            self.frames_recorte += 1
+
+        x0, y0, x1, y1 = caja
+        entrada = frame_rgb[y0:y1, x0:x1]
+        escala = self.resolucion / max(x1 - x0, y1 - y0)
+        if escala < 1.0:
+            tam = (max(1, round((x1 - x0) * escala)), max(1, round((y1 - y0) * escala)))
+            entrada = cv2.resize(entrada, tam, interpolation=cv2.INTER_AREA)
+        else:
+            entrada = np.ascontiguousarray(entrada)
+
+        self.pixeles_frame += ancho * alto
+        self.pixeles_inferencia += entrada.shape[0] * entrada.shape[1]
+        return entrada, caja
+
+    def mapear(self, landmarks, caja, ancho, alto):
+        """
+        Pasa un LandmarkFrame normalizado a la caja a coordenadas normalizadas
+        del frame completo (la reducción no cambia las coordenadas normalizadas).
+        """
+        x0, y0, x1, y1 = caja
+        datos = landmarks.datos.copy()
+        datos[:, 0] = (datos[:, 0] * (x1 - x0) + x0) / ancho
+        datos[:, 1] = (datos[:, 1] * (y1 - y0) + y0) / alto
+        # z usa la misma escala que x
+        datos[:, 2] *= (x1 - x0) / ancho
+        return LandmarkFrame(datos, landmarks.timestamp, landmarks.confianza)
+
+    def estadisticas(self):
+        """
+        - ahorro_pixeles: fracción de píxeles que no llegó al modelo
+        - frames_recorte / frames_completos: frames con ROI vs búsqueda completa
+        """
+        ahorro = 1.0 - self.pixeles_inferencia / self.pixeles_frame if self.pixeles_frame else 0.0
+        return {
+            "ahorro_pixeles": ahorro,
+            "frames_recorte": self.frames_recorte,
+            "frames_completos": self.frames_completos,
+        }
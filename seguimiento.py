@@ -0,0 +1,231 @@
+# seguimiento.py
+
+import math
+
+import numpy as np
+
+from pose_utils import LandmarkFrame, NUM_LANDMARKS, UMBRAL_VISIBILIDAD
+
+
+class PredictorVelocidad:
+    """
+    Propaga los landmarks entre inferencias con un modelo de velocidad
+    constante: x(t) = x(t_obs) + v * (t - t_obs).
+    La velocidad se estima entre dos observaciones consecutivas (suavizada con
+    un promedio exponencial) y, mientras se extrapola, la confianza y la
+    visibilidad decaen geométricamente en cada frame predicho; así, si la
+    inferencia no vuelve, las articulaciones terminan cayendo bajo el umbral
+    de visibilidad y los detectores devuelven None.
+    """
+
+    def __init__(self, decaimiento=0.85, alfa_velocidad=0.5):
+        self.decaimiento = decaimiento
+        self.alfa_velocidad = alfa_velocidad
+        self.reiniciar()
+
+    def reiniciar(self):
+        self._datos = None
+        self._t = None
+        self._velocidad = np.zeros((NUM_LANDMARKS, 2), dtype=np.float32)
+        self.pasos = 0
+
+    @property
+    def tiene_estado(self):
+        return self._datos is not None
+
+    def observar(self, landmarks):
+        """
+        Registra un LandmarkFrame obtenido por inferencia.
+        """
+        if self._datos is not None and landmarks.timestamp > self._t:
+            dt = landmarks.timestamp - self._t
+            velocidad = (landmarks.xy - self._datos[:, :2]) / dt
+            self._velocidad *= 1.0 - self.alfa_velocidad
+            self._velocidad += self.alfa_velocidad * velocidad
+        self._datos = landmarks.datos.copy()
+        self._t = landmarks.timestamp
+        self.pasos = 0
+
+    def predecir(self, t):
+        """
+        Devuelve un LandmarkFrame extrapolado al instante 't' (mismo reloj que
+        los timestamps observados), con confianza < 1.
+        """
+        self.pasos += 1
+        confianza = self.decaimiento ** self.pasos
+        datos = self._datos.copy()
+        datos[:, :2] += self._velocidad * (t - self._t)
+        datos[:, 3] *= confianza
+        return LandmarkFrame(datos, t, confianza)
+
+
+class FiltroLandmarks:
+    """
+    Filtro temporal de los 33 landmarks, vectorizado: un One-Euro por
+    landmark sobre x/y (la frecuencia de corte de cada uno sube con su
+    velocidad, como FiltroUnEuro de contador.py) y un paso bajo sobre la
+    visibilidad, para que no parpadee alrededor del umbral.
+
+    Cuando la pose no llega (landmarks None) o un landmark queda con
+    visibilidad filtrada bajo 'umbral', se predice con su última velocidad
+    filtrada durante 'max_hueco' segundos como mucho. Mientras tanto su
+    visibilidad baja linealmente desde la última hacia el umbral (sigue
+    contando como visible, así detectar_codo/detectar_rodilla no devuelven
+    None); pasado el horizonte cae a 0 y el landmark vuelve a arrancar de
+    cero con la próxima observación.
+
+    Todo el estado vive en arrays preasignados que se actualizan en el
+    lugar; cada llamada solo crea el LandmarkFrame de salida (que no se
+    modifica después, como espera GrabadorSesion).
+    """
+
+    # beta en 1 / (unidades normalizadas por segundo): con el ruido típico de
+    # MediaPipe reduce a la mitad el temblor quieto sin agregar retraso en
+    # movimientos rápidos
+    def __init__(self, min_cutoff=1.0, beta=50.0, d_cutoff=1.0, cutoff_visibilidad=2.0,
+                 max_hueco=0.5, umbral=UMBRAL_VISIBILIDAD):
+        self.min_cutoff = min_cutoff
+        self.beta = beta
+        self.d_cutoff = d_cutoff
+        self.cutoff_visibilidad = cutoff_visibilidad
+        self.max_hueco = max_hueco
+        self.umbral = umbral
+
+        self._xy = np.zeros((NUM_LANDMARKS, 2))
+        self._dxy = np.zeros((NUM_LANDMARKS, 2))
+        self._z = np.zeros(NUM_LANDMARKS)
+        self._vis = np.zeros(NUM_LANDMARKS)
+        self._vis_visto = np.zeros(NUM_LANDMARKS)     # Visibilidad al dejar de verse
+        self._t_visto = np.full(NUM_LANDMARKS, -np.inf)
+        self._vivo = np.zeros(NUM_LANDMARKS, dtype=bool)
+        self._t = None
+
+        # ————— Estadísticas —————
+        self.frames_predichos = 0       # Frames sin pose cubiertos por la predicción
+        self.huecos_expirados = 0       # Landmarks que superaron 'max_hueco'
+
+    def reiniciar(self):
+        self._vivo[:] = False
+        self._t = None
+
+    @staticmethod
+    def _alfa(dt, cutoff):
+        return 1.0 / (1.0 + 1.0 / (2 * math.pi * cutoff * dt))
+
+    def filtrar(self, landmarks, t):
+        """
+        Filtra un LandmarkFrame (o None si no hubo pose) tomado en 't'.
+        Devuelve el LandmarkFrame filtrado/predicho, o None si no queda
+        ningún landmark dentro del horizonte.
+        """
+        dt = t - self._t if self._t is not None else 0.0
+        if dt < 0:
+            return None
+        self._t = t
+        if landmarks is not None:
+            datos = landmarks.datos
+            vis = datos[:, 3]
+            nuevos = ~self._vivo
+            if dt > 0:
+                self._vis += self._alfa(dt, self.cutoff_visibilidad) * (vis - self._vis)
+            # Landmarks sin estado: arrancan en la observación
+            self._vis[nuevos] = vis[nuevos]
+            observados = self._vis > self.umbral
+            if dt > 0:
+                self._actualizar(datos[:, :2], observados & ~nuevos, dt)
+            arrancan = observados & nuevos
+            self._xy[arrancan] = datos[arrancan, :2]
+            self._dxy[arrancan] = 0.0
+            self._z[observados] = datos[observados, 2]
+            self._t_visto[observados] = t
+            self._vis_visto[observados] = self._vis[observados]
+            self._vivo |= observados
+        else:
+            observados = np.zeros(NUM_LANDMARKS, dtype=bool)
+            self.frames_predichos += 1
+
+        # Landmarks en hueco: velocidad constante hasta 'max_hueco'
+        edad = t - self._t_visto
+        prediciendo = self._vivo & ~observados
+        expirados = prediciendo & (edad > self.max_hueco)
+        if expirados.any():
+            self.huecos_expirados += int(expirados.sum())
+            self._vivo &= ~expirados
+            prediciendo &= ~expirados
+        if dt > 0:
+            self._xy[prediciendo] += self._dxy[prediciendo] * dt
+
+        if not self._vivo.any():
+            self.reiniciar()
+            return None
+
+        salida = np.empty((NUM_LANDMARKS, 4), dtype=np.float32)
+        salida[:, :2] = self._xy
+        salida[:, 2] = self._z
+        # Visibles: la filtrada. En hueco: de la última hacia el umbral. Sin estado: 0
+        salida[:, 3] = np.where(observados, self._vis, 0.0)
+        salida[prediciendo, 3] = self.umbral + (self._vis_visto[prediciendo] - self.umbral) * (
+            1.0 - edad[prediciendo] / self.max_hueco
+        )
+        if landmarks is not None:
+            confianza = landmarks.confianza
+        else:
+            confianza = max(0.0, 1.0 - float(edad[self._vivo].min()) / self.max_hueco)
+        return LandmarkFrame(salida, t, confianza)
+
+    def _actualizar(self, xy, mascara, dt):
+        # One-Euro sobre los landmarks de 'mascara', con un corte por landmark
+        derivada = (xy[mascara] - self._xy[mascara]) / dt
+        self._dxy[mascara] += self._alfa(dt, self.d_cutoff) * (derivada - self._dxy[mascara])
+        velocidad = np.hypot(self._dxy[mascara, 0], self._dxy[mascara, 1])
+        alfa = self._alfa(dt, self.min_cutoff + self.beta * velocidad)
+        self._xy[mascara] += alfa[:, np.newaxis] * (xy[mascara] - self._xy[mascara])
+
+    def estadisticas(self):
+        return {
+            "frames_predichos_filtro": self.frames_predichos,
+            "huecos_expirados_filtro": self.huecos_expirados,
+        }
+
+
+class ControlInferencia:
+    """
+    Decide en qué frames correr la inferencia completa: una de cada k.
+    El costo medio por frame es aproximadamente t_inferencia / k (la
+    predicción es casi gratis), así que k se ajusta al menor valor que deja
+    ese costo dentro de 'presupuesto_ms'. k cambia de a un paso por
+    inferencia para no oscilar.
+    """
+
+    def __init__(self, presupuesto_ms=33.0, k_max=6, alfa=0.2):
+        self.presupuesto = presupuesto_ms / 1000.0
+        self.k_max = k_max
+        self.alfa = alfa
+        self.k = 1
+        self.t_inferencia = None     # Promedio exponencial, en segundos
+        self._frames_desde_inferencia = 0
+
+    def debe_inferir(self):
+        self._frames_desde_inferencia += 1
+        if self._frames_desde_inferencia >= self.k:
+            self._frames_desde_inferencia = 0
+            return True
+        return False
+
+    def forzar(self):
+        """
+        Pide inferencia completa en el próximo frame (p. ej. si se perdió la pose).
+        """
+        self._frames_desde_inferencia = self.k
+
+    def registrar_inferencia(self, segundos):
+        if self.t_inferencia is None:
+            self.t_inferencia = segundos
+        else:
+            self.t_inferencia += self.alfa * (segundos - self.t_inferencia)
+
+        k_objetivo = max(1, min(self.k_max, math.ceil(self.t_inferencia / self.presupuesto)))
+        if k_objetivo > self.k:
+            self.k += 1
+        elif k_objetivo < self.k:
+            self.k -= 1
@@ -0,0 +1,870 @@
+# servidor.py
+
+"""
+Servicio de inferencia en red local.
+
+Los clientes livianos (tablets, Raspberry Pi) envían frames JPEG por HTTP y
+el servidor corre pose -> detectar_angulo -> obtener_rango_ejercicio ->
+ContadorRepeticiones, igual que PoseAppGUI.update_frame, y responde con el
+texto y color del feedback, los contadores y la latencia de cada etapa.
+
+Protocolo (HTTP/1.1 con keep-alive, cuerpos JSON salvo el JPEG):
+    POST   /sesiones                  {"ejercicio": 1, "lado": "izq", "reps": 10, "series": 3}
+    POST   /sesiones/<id>/frames      cuerpo: JPEG. Cabecera opcional X-Timestamp
+                                      (segundos, instante de captura en el cliente).
+                                      Query opcional: ejercicio, lado, landmarks=1
+    GET    /sesiones/<id>             resumen del contador
+    DELETE /sesiones/<id>
+    GET    /estado                    métricas del servidor
+
+Uso:
+    python servidor.py --puerto 8765 --procesos 4
+    python servidor.py --loopback --clientes 4 --frames 300
+"""
+
+import argparse
+import asyncio
+import itertools
+import json
+import multiprocessing
+import os
+import threading
+import time
+import uuid
+from collections import deque
+from urllib.parse import parse_qs, urlsplit
+
+import cv2
+import numpy as np
+
+from contador import ContadorRepeticiones
+from metricas import BufferCircular, Metricas
+from pose_utils import LandmarkFrame, detectar_angulo, feedback_ejercicio, obtener_rango_ejercicio
+
+# Etapas que mide el servidor por frame (segundos)
+ETAPAS_SERVIDOR = (
+    "cola",             # recibido -> enviado al proceso de inferencia
+    "decodificacion",   # imdecode + reducción + BGR -> RGB (en el proceso)
+    "inferencia",       # pose.process() (en el proceso)
+    "conteo",           # ángulo + ContadorRepeticiones (en el bucle asyncio)
+    "total",            # cuerpo recibido -> respuesta lista
+)
+
+MAX_CUERPO = 8 * 1024 * 1024
+LADOS = ("izq", "der")
+
+_ESTADOS_HTTP = {
+    200: "OK", 201: "Created", 400: "Bad Request", 404: "Not Found",
+    405: "Method Not Allowed", 413: "Payload Too Large", 503: "Service Unavailable",
+    504: "Gateway Timeout",
+}
+
+
+class ErrorHTTP(Exception):
+    def __init__(self, estado, mensaje):
+        super().__init__(mensaje)
+        self.estado = estado
+        self.mensaje = mensaje
+
+
+# ————— Proceso de inferencia —————
+
+def _trabajador_servidor(entrada, salida, indice, opciones, resolucion):
+    """
+    Proceso de inferencia del servidor. Recibe lotes de (id_peticion,
+    id_sesion, jpeg) y devuelve un lote de (id_peticion, datos, t_decod,
+    t_inferencia, error), con error None o (estado HTTP, mensaje).
+    Decodifica aquí el JPEG para no ocupar el bucle asyncio, y mantiene una
+    Pose por sesión, igual que _trabajador_inferencia de multicamara.py.
+    Un fallo de MediaPipe se responde como error de esa petición: el
+    proceso sigue atendiendo a las demás sesiones.
+    """
+    import mediapipe as mp
+    from pose_utils import landmarks_a_array
+
+    cv2.setNumThreads(1)
+    poses = {}
+    while True:
+        mensaje = entrada.get()
+        if mensaje is None:
+            break
+        tipo, contenido = mensaje
+        if tipo == "cerrar":
+            pose = poses.pop(contenido, None)
+            if pose is not None:
+                pose.close()
+            continue
+
+        resultados = []
+        for id_peticion, id_sesion, jpeg in contenido:
+            t0 = time.perf_counter()
+            frame = cv2.imdecode(np.frombuffer(jpeg, dtype=np.uint8), cv2.IMREAD_COLOR)
+            if frame is None:
+                resultados.append((id_peticion, None, 0.0, 0.0, (400, "JPEG inválido")))
+                continue
+            alto, ancho = frame.shape[:2]
+            escala = resolucion / max(alto, ancho)
+            if escala < 1.0:
+                frame = cv2.resize(frame, (round(ancho * escala), round(alto * escala)),
+                                   interpolation=cv2.INTER_AREA)
+            frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB, dst=frame)
+            t_decodificacion = time.perf_counter() - t0
+
+            t0 = time.perf_counter()
+            try:
+                pose = poses.get(id_sesion)
+                if pose is None:
+                    pose = poses[id_sesion] = mp.solutions.pose.Pose(**opciones)
+                pose_resultado = pose.process(frame)
+            except Exception as e:
+                # P. ej. el modelo no se pudo descargar; la Pose de la sesión
+                # se descarta y se vuelve a crear con el próximo frame
+                pose = poses.pop(id_sesion, None)
+                if pose is not None:
+                    pose.close()
+                resultados.append((id_peticion, None, t_decodificacion, 0.0, (503, f"Error de inferencia: {e}")))
+                continue
+            t_inferencia = time.perf_counter() - t0
+
+            datos = None
+            if pose_resultado.pose_landmarks:
+                datos = landmarks_a_array(pose_resultado.pose_landmarks.landmark)
+            resultados.append((id_peticion, datos, t_decodificacion, t_inferencia, None))
+        salida.put((indice, resultados))
+
+    for pose in poses.values():
+        pose.close()
+
+
+# ————— Estado por cliente —————
+
+class SesionCliente:
+    """
+    Estado de un cliente: configuración del ejercicio, contador de
+    repeticiones y el proceso de inferencia al que está asignado (donde vive
+    su Pose). Cambiar de ejercicio o lado reinicia el contador, como
+    reset_counters en la GUI, salvo que el ejercicio ya haya terminado.
+    """
+
+    def __init__(self, id, ejercicio, lado, target_reps, target_series, trabajador):
+        self.id = id
+        self.ejercicio = ejercicio
+        self.lado = lado
+        self.target_reps = target_reps
+        self.target_series = target_series
+        self.trabajador = trabajador
+        self.contador = ContadorRepeticiones(target_reps, target_series)
+        self.pendiente = None       # Peticion encolada y todavía no despachada
+        self.ultimo_uso = time.monotonic()
+        self.frames = 0
+        self.descartados = 0
+        self._rangos = {}
+
+    def configurar(self, ejercicio, lado):
+        if (ejercicio, lado) == (self.ejercicio, self.lado):
+            return
+        self.ejercicio, self.lado = ejercicio, lado
+        if self.contador.start_time is not None and not self.contador.terminado:
+            self.contador = ContadorRepeticiones(self.target_reps, self.target_series)
+
+    def rango(self):
+        clave = (self.ejercicio, self.lado)
+        rango = self._rangos.get(clave)
+        if rango is None:
+            rango = self._rangos[clave] = obtener_rango_ejercicio(self.ejercicio, self.lado)
+        return rango
+
+    def procesar(self, landmarks, t):
+        """
+        Ángulo -> rango -> contador -> feedback, como update_frame.
+        """
+        if self.contador.start_time is None:
+            self.contador.iniciar(t)
+        angulo = detectar_angulo(landmarks, self.ejercicio, self.lado) if landmarks is not None else None
+        ang_min, ang_max = self.rango()
+        evento = self.contador.actualizar(angulo, ang_min, ang_max, t)
+        texto, color = feedback_ejercicio(angulo, ang_min, ang_max)
+        self.frames += 1
+        return angulo, evento, texto, color
+
+    def contadores(self):
+        return {
+            "reps": self.contador.reps,
+            "series_restantes": self.contador.series_left,
+            "terminado": self.contador.terminado,
+        }
+
+
+class Peticion:
+    __slots__ = ("id", "sesion", "jpeg", "t", "landmarks", "futuro", "t_recibido", "t_despacho")
+
+    def __init__(self, id, sesion, jpeg, t, landmarks, futuro):
+        self.id = id
+        self.sesion = sesion
+        self.jpeg = jpeg
+        self.t = t                          # Instante para el contador
+        self.landmarks = landmarks          # Incluir los puntos en la respuesta
+        self.futuro = futuro
+        self.t_recibido = time.perf_counter()
+        self.t_despacho = None
+
+
+def _color_hex(bgr):
+    # Mismo criterio que PoseAppGUI.rgb_to_hex: el color de feedback es BGR
+    return "#{:02x}{:02x}{:02x}".format(bgr[2], bgr[1], bgr[0])
+
+
+# ————— Servidor —————
+
+class ServidorInferencia:
+    """
+    Servidor asyncio con P procesos de inferencia.
+
+    Cada sesión queda asignada al proceso con menos sesiones (su Pose vive
+    ahí) y tiene como mucho un frame esperando: si llega uno nuevo antes de
+    que el anterior salga, el anterior se responde como descartado (gana el
+    más reciente, como ColaUltimo).
+
+    Por proceso hay una cola asyncio y un despachador que arma lotes
+    dinámicos: mientras el proceso está ocupado con un lote, los frames de
+    todos sus clientes se acumulan y salen juntos en el siguiente mensaje;
+    con poca carga el lote es de uno y solo espera 'espera_lote' segundos.
+    Así el costo de IPC se reparte entre clientes sin sumar latencia en
+    reposo. Decodificar el JPEG y correr MediaPipe ocurre en el proceso; el
+    bucle asyncio solo hace E/S y el conteo.
+
+    Si un proceso muere, sus peticiones en vuelo se responden con 503 y se
+    reinicia (las Pose de sus sesiones se recrean), como PoseEnProceso:
+    hasta 'max_reinicios' veces por 'ventana_reinicios' segundos. Pasado
+    eso queda caído: sus sesiones reciben 503 y las nuevas van a los demás.
+    """
+
+    def __init__(self, host="0.0.0.0", puerto=8765, procesos=None, max_lote=8, espera_lote=0.002,
+                 resolucion=480, opciones=None, expiracion=300.0, timeout=5.0,
+                 max_reinicios=5, ventana_reinicios=60.0, intervalo_vigilancia=0.5):
+        self.host = host
+        self.puerto = puerto
+        self.procesos = max(1, procesos or os.cpu_count() or 1)
+        self.max_lote = max_lote
+        self.espera_lote = espera_lote
+        self.resolucion = resolucion
+        self.opciones = opciones or {"min_detection_confidence": 0.5, "min_tracking_confidence": 0.5}
+        self.expiracion = expiracion
+        self.timeout = timeout
+        self.max_reinicios = max_reinicios
+        self.ventana_reinicios = ventana_reinicios
+        self.intervalo_vigilancia = intervalo_vigilancia
+
+        self.sesiones = {}
+        self.metricas = Metricas(etapas=ETAPAS_SERVIDOR)
+        self.lotes = BufferCircular()       # Tamaño de cada lote despachado
+        self.descartados = 0
+        self.errores = 0
+        self.reinicios = 0
+
+        self._ids = itertools.count()
+        self._en_vuelo = {}                 # id de petición -> Peticion
+        self._loop = None
+        self._servidor = None
+        self._tareas = []
+        self._contexto = multiprocessing.get_context("spawn")
+        self._salida = None
+        self._entradas = []
+        self._trabajadores = []
+        self._colas = []
+        self._libres = []
+        self._t_reinicios = []              # Por proceso: instantes de sus reinicios recientes
+        self._caidos = set()                # Procesos sin más reinicios disponibles
+        self._hilo_resultados = None
+
+    # — Ciclo de vida —
+
+    async def iniciar(self):
+        self._loop = asyncio.get_running_loop()
+        self._salida = self._contexto.Queue()
+        self._entradas = [self._contexto.Queue() for _ in range(self.procesos)]
+        self._trabajadores = [self._crear_trabajador(i) for i in range(self.procesos)]
+        self._t_reinicios = [deque() for _ in range(self.procesos)]
+        self._caidos = set()
+        self._hilo_resultados = threading.Thread(target=self._bucle_resultados, name="resultados", daemon=True)
+        self._hilo_resultados.start()
+
+        self._colas = [asyncio.Queue() for _ in range(self.procesos)]
+        # Un lote en vuelo por proceso: lo que llega mientras tanto forma el siguiente
+        self._libres = [asyncio.Event() for _ in range(self.procesos)]
+        for libre in self._libres:
+            libre.set()
+        self._tareas = [asyncio.create_task(self._despachar(i)) for i in range(self.procesos)]
+        self._tareas.append(asyncio.create_task(self._expirar_sesiones()))
+        self._tareas.append(asyncio.create_task(self._vigilar_trabajadores()))
+
+        self._servidor = await asyncio.start_server(self._atender, self.host, self.puerto)
+        self.puerto = self._servidor.sockets[0].getsockname()[1]
+
+    async def detener(self):
+        if self._servidor is not None:
+            self._servidor.close()
+            await self._servidor.wait_closed()
+            self._servidor = None
+        for tarea in self._tareas:
+            tarea.cancel()
+        await asyncio.gather(*self._tareas, return_exceptions=True)
+        self._tareas = []
+        for entrada in self._entradas:
+            entrada.put(None)
+        for trabajador in self._trabajadores:
+            await asyncio.to_thread(trabajador.join, 2.0)
+            if trabajador.is_alive():
+                trabajador.terminate()
+        self._salida.put(None)
+        self._hilo_resultados.join(1.0)
+        for peticion in self._en_vuelo.values():
+            if not peticion.futuro.done():
+                peticion.futuro.set_exception(ErrorHTTP(503, "Servidor detenido"))
+        self._en_vuelo.clear()
+
+    def _crear_trabajador(self, indice):
+        trabajador = self._contexto.Process(
+            target=_trabajador_servidor,
+            args=(self._entradas[indice], self._salida, indice, self.opciones, self.resolucion),
+            name=f"servidor-inferencia-{indice}",
+            daemon=True
+        )
+        trabajador.start()
+        return trabajador
+
+    async def _vigilar_trabajadores(self):
+        while True:
+            await asyncio.sleep(self.intervalo_vigilancia)
+            for indice, trabajador in enumerate(self._trabajadores):
+                if indice not in self._caidos and not trabajador.is_alive():
+                    self._reiniciar_trabajador(indice)
+
+    def _reiniciar_trabajador(self, indice):
+        """
+        Responde con 503 lo que el proceso muerto tenía en vuelo y lo
+        reinicia, salvo que haya agotado sus reinicios.
+        """
+        codigo = self._trabajadores[indice].exitcode
+        # Lo que el proceso muerto dejó sin leer en su cola se abandona: si
+        # no, el hilo que la alimenta bloquea la salida del intérprete
+        self._entradas[indice].cancel_join_thread()
+        for id_peticion in [i for i, p in self._en_vuelo.items() if p.sesion.trabajador == indice]:
+            peticion = self._en_vuelo.pop(id_peticion)
+            if not peticion.futuro.done():
+                self.errores += 1
+                peticion.futuro.set_exception(
+                    ErrorHTTP(503, f"El proceso de inferencia terminó (código {codigo})")
+                )
+
+        ahora = time.monotonic()
+        recientes = self._t_reinicios[indice]
+        recientes.append(ahora)
+        while recientes and ahora - recientes[0] > self.ventana_reinicios:
+            recientes.popleft()
+        if len(recientes) > self.max_reinicios:
+            self._caidos.add(indice)
+        else:
+            self.reinicios += 1
+            # Cola nueva: la anterior pudo quedar con lotes sin leer o con su
+            # lock tomado por el proceso muerto
+            self._entradas[indice] = self._contexto.Queue()
+            self._trabajadores[indice] = self._crear_trabajador(indice)
+        self._libres[indice].set()
+
+    async def servir(self):
+        await self.iniciar()
+        print(f"Servidor de inferencia en http://{self.host}:{self.puerto} ({self.procesos} procesos)")
+        try:
+            await self._servidor.serve_forever()
+        finally:
+            await self.detener()
+
+    # — Planificación —
+
+    def _asignar_trabajador(self):
+        if len(self._caidos) == self.procesos:
+            raise ErrorHTTP(503, "No quedan procesos de inferencia")
+        carga = [0] * self.procesos
+        for sesion in self.sesiones.values():
+            carga[sesion.trabajador] += 1
+        for indice in self._caidos:
+            carga[indice] = float("inf")
+        return carga.index(min(carga))
+
+    def _encolar(self, sesion, jpeg, t, landmarks):
+        anterior = sesion.pendiente
+        if anterior is not None and not anterior.futuro.done():
+            # Gana el frame más reciente del cliente
+            anterior.futuro.set_result(None)
+            sesion.descartados += 1
+            self.descartados += 1
+        peticion = Peticion(next(self._ids), sesion, jpeg, t, landmarks, self._loop.create_future())
+        sesion.pendiente = peticion
+        self._colas[sesion.trabajador].put_nowait(peticion)
+        return peticion
+
+    async def _despachar(self, indice):
+        cola = self._colas[indice]
+        libre = self._libres[indice]
+        while True:
+            await libre.wait()
+            lote = [await cola.get()]
+            limite = self._loop.time() + self.espera_lote
+            while len(lote) < self.max_lote:
+                if cola.empty():
+                    restante = limite - self._loop.time()
+                    if restante <= 0:
+                        break
+                    try:
+                        lote.append(await asyncio.wait_for(cola.get(), restante))
+                    except asyncio.TimeoutError:
+                        break
+                else:
+                    lote.append(cola.get_nowait())
+
+            # Las descartadas (o vencidas) mientras esperaban no se envían
+            lote = [p for p in lote if not p.futuro.done()]
+            if not lote:
+                continue
+            if indice in self._caidos:
+                for peticion in lote:
+                    self.errores += 1
+                    peticion.futuro.set_exception(ErrorHTTP(503, "Proceso de inferencia caído"))
+                continue
+            ahora = time.perf_counter()
+            for peticion in lote:
+                peticion.t_despacho = ahora
+                if peticion.sesion.pendiente is peticion:
+                    peticion.sesion.pendiente = None
+                self._en_vuelo[peticion.id] = peticion
+            self.lotes.agregar(len(lote))
+            libre.clear()
+            self._entradas[indice].put(("lote", [(p.id, p.sesion.id, p.jpeg) for p in lote]))
+
+    def _bucle_resultados(self):
+        while True:
+            mensaje = self._salida.get()
+            if mensaje is None:
+                break
+            self._loop.call_soon_threadsafe(self._resolver_lote, *mensaje)
+
+    def _resolver_lote(self, indice, resultados):
+        self._libres[indice].set()
+        for id_peticion, datos, t_decodificacion, t_inferencia, error in resultados:
+            peticion = self._en_vuelo.pop(id_peticion, None)
+            if peticion is None or peticion.futuro.done():
+                continue
+            if error is not None:
+                self.errores += 1
+                peticion.futuro.set_exception(ErrorHTTP(*error))
+                continue
+            self.metricas.registrar("cola", peticion.t_despacho - peticion.t_recibido)
+            self.metricas.registrar("decodificacion", t_decodificacion)
+            self.metricas.registrar("inferencia", t_inferencia)
+            peticion.futuro.set_result(self._responder_frame(peticion, datos, len(resultados),
+                                                             t_decodificacion, t_inferencia))
+
+    def _responder_frame(self, peticion, datos, tam_lote, t_decodificacion, t_inferencia):
+        t0 = time.perf_counter()
+        sesion = peticion.sesion
+        landmarks = LandmarkFrame(datos, peticion.t) if datos is not None else None
+        angulo, evento, texto, color = sesion.procesar(landmarks, peticion.t)
+        ahora = time.perf_counter()
+        self.metricas.registrar("conteo", ahora - t0)
+        self.metricas.registrar("total", ahora - peticion.t_recibido)
+        self.metricas.marcar_frame(ahora)
+
+        respuesta = {
+            "sesion": sesion.id,
+            "descartado": False,
+            "pose": datos is not None,
+            "angulo": angulo,
+            "feedback": texto,
+            "color": _color_hex(color),
+            "evento": evento,
+            **sesion.contadores(),
+            "lote": tam_lote,
+            "latencia_ms": {
+                "cola": (peticion.t_despacho - peticion.t_recibido) * 1000,
+                "decodificacion": t_decodificacion * 1000,
+                "inferencia": t_inferencia * 1000,
+                "total": (ahora - peticion.t_recibido) * 1000,
+            },
+        }
+        if peticion.landmarks and datos is not None:
+            respuesta["landmarks"] = np.round(datos, 4).tolist()
+        return respuesta
+
+    async def _expirar_sesiones(self):
+        while True:
+            await asyncio.sleep(min(30.0, self.expiracion))
+            limite = time.monotonic() - self.expiracion
+            for id_sesion in [s.id for s in self.sesiones.values() if s.ultimo_uso < limite]:
+                self._cerrar_sesion(id_sesion)
+
+    def _cerrar_sesion(self, id_sesion):
+        sesion = self.sesiones.pop(id_sesion, None)
+        if sesion is None:
+            return None
+        if sesion.pendiente is not None and not sesion.pendiente.futuro.done():
+            sesion.pendiente.futuro.set_exception(ErrorHTTP(404, "Sesión cerrada"))
+        self._entradas[sesion.trabajador].put(("cerrar", id_sesion))
+        return sesion
+
+    # — HTTP —
+
+    async def _atender(self, lector, escritor):
+        try:
+            while True:
+                try:
+                    peticion = await _leer_mensaje(lector)
+                except ErrorHTTP as e:
+                    await _escribir_respuesta(escritor, e.estado, {"error": e.mensaje}, mantener=False)
+                    break
+                if peticion is None:
+                    break
+                (metodo, ruta), cabeceras, cuerpo = peticion
+                try:
+                    estado, datos = await self._rutear(metodo, ruta, cabeceras, cuerpo)
+                except ErrorHTTP as e:
+                    estado, datos = e.estado, {"error": e.mensaje}
+                mantener = cabeceras.get("connection", "").lower() != "close"
+                await _escribir_respuesta(escritor, estado, datos, mantener)
+                if not mantener:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            escritor.close()
+
+    def _obtener_sesion(self, id_sesion):
+        sesion = self.sesiones.get(id_sesion)
+        if sesion is None:
+            raise ErrorHTTP(404, f"Sesión desconocida '{id_sesion}'")
+        sesion.ultimo_uso = time.monotonic()
+        return sesion
+
+    async def _rutear(self, metodo, ruta, cabeceras, cuerpo):
+        partes = urlsplit(ruta)
+        segmentos = [s for s in partes.path.split("/") if s]
+        consulta = {k: v[-1] for k, v in parse_qs(partes.query).items()}
+
+        if segmentos == ["estado"] and metodo == "GET":
+            return 200, self.estadisticas()
+        if segmentos == ["sesiones"] and metodo == "POST":
+            return 201, self._crear_sesion(_leer_json(cuerpo))
+        if len(segmentos) == 2 and segmentos[0] == "sesiones":
+            if metodo == "GET":
+                return 200, self._obtener_sesion(segmentos[1]).contador.resumen()
+            if metodo == "DELETE":
+                sesion = self._cerrar_sesion(segmentos[1])
+                if sesion is None:
+                    raise ErrorHTTP(404, f"Sesión desconocida '{segmentos[1]}'")
+                return 200, sesion.contador.resumen()
+        if len(segmentos) == 3 and segmentos[0] == "sesiones" and segmentos[2] == "frames" and metodo == "POST":
+            return 200, await self._frame(segmentos[1], cabeceras, consulta, cuerpo)
+        raise ErrorHTTP(404 if metodo in ("GET", "POST", "DELETE") else 405, f"{metodo} {partes.path}")
+
+    def _crear_sesion(self, datos):
+        ejercicio, lado = _validar_config(datos.get("ejercicio", 1), datos.get("lado", "izq"))
+        try:
+            target_reps = int(datos.get("reps", 10))
+            target_series = int(datos.get("series", 3))
+        except (TypeError, ValueError):
+            raise ErrorHTTP(400, "reps y series deben ser enteros")
+        id_sesion = uuid.uuid4().hex[:12]
+        sesion = SesionCliente(id_sesion, ejercicio, lado, target_reps, target_series, self._asignar_trabajador())
+        self.sesiones[id_sesion] = sesion
+        return {"sesion": id_sesion, "ejercicio": ejercicio, "lado": lado, "rango": sesion.rango()}
+
+    async def _frame(self, id_sesion, cabeceras, consulta, cuerpo):
+        sesion = self._obtener_sesion(id_sesion)
+        if not cuerpo:
+            raise ErrorHTTP(400, "Cuerpo vacío: se esperaba un JPEG")
+        if "ejercicio" in consulta or "lado" in consulta:
+            sesion.configurar(*_validar_config(consulta.get("ejercicio", sesion.ejercicio),
+                                               consulta.get("lado", sesion.lado)))
+        try:
+            t = float(cabeceras["x-timestamp"]) if "x-timestamp" in cabeceras else time.time()
+        except ValueError:
+            raise ErrorHTTP(400, "X-Timestamp inválido")
+
+        peticion = self._encolar(sesion, cuerpo, t, consulta.get("landmarks") == "1")
+        try:
+            respuesta = await asyncio.wait_for(asyncio.shield(peticion.futuro), self.timeout)
+        except asyncio.TimeoutError:
+            self._en_vuelo.pop(peticion.id, None)
+            peticion.futuro.cancel()
+            raise ErrorHTTP(504, "La inferencia no respondió a tiempo")
+        if respuesta is None:
+            return {"sesion": sesion.id, "descartado": True, **sesion.contadores()}
+        return respuesta
+
+    def estadisticas(self):
+        lotes = self.lotes.valores()
+        datos = self.metricas.instantanea()
+        datos.update({
+            "procesos": self.procesos,
+            "sesiones": len(self.sesiones),
+            "sesiones_por_proceso": [
+                sum(1 for s in self.sesiones.values() if s.trabajador == i) for i in range(self.procesos)
+            ],
+            "en_vuelo": len(self._en_vuelo),
+            "lote_medio": float(lotes.mean()) if len(lotes) else None,
+            "lote_maximo": int(lotes.max()) if len(lotes) else None,
+            "descartados": self.descartados,
+            "errores": self.errores,
+            "reinicios": self.reinicios,
+            "procesos_caidos": sorted(self._caidos),
+        })
+        return datos
+
+
+def _validar_config(ejercicio, lado):
+    try:
+        ejercicio = int(ejercicio)
+    except (TypeError, ValueError):
+        ejercicio = None
+    if ejercicio not in (1, 2) or lado not in LADOS:
+        raise ErrorHTTP(400, "ejercicio debe ser 1 o 2 y lado 'izq' o 'der'")
+    return ejercicio, lado
+
+
+def _leer_json(cuerpo):
+    if not cuerpo:
+        return {}
+    try:
+        datos = json.loads(cuerpo)
+    except ValueError:
+        raise ErrorHTTP(400, "JSON inválido")
+    if not isinstance(datos, dict):
+        raise ErrorHTTP(400, "Se esperaba un objeto JSON")
+    return datos
+
+
+async def _leer_mensaje(lector):
+    """
+    Lee un mensaje HTTP/1.1 (petición o respuesta) con Content-Length.
+    Devuelve (partes de la primera línea, cabeceras, cuerpo), o None si la
+    conexión se cerró antes de empezar.
+    """
+    linea = await lector.readline()
+    if not linea:
+        return None
+    partes = linea.decode("latin-1").split(" ", 2)
+    if len(partes) < 3:
+        raise ErrorHTTP(400, "Línea inicial inválida")
+    cabeceras = {}
+    while True:
+        linea = await lector.readline()
+        if linea in (b"\r\n", b"\n", b""):
+            break
+        clave, _, valor = linea.decode("latin-1").partition(":")
+        cabeceras[clave.strip().lower()] = valor.strip()
+    try:
+        largo = int(cabeceras.get("content-length", 0))
+    except ValueError:
+        raise ErrorHTTP(400, "Content-Length inválido")
+    if largo > MAX_CUERPO:
+        raise ErrorHTTP(413, f"Cuerpo mayor a {MAX_CUERPO} bytes")
+    cuerpo = await lector.readexactly(largo) if largo else b""
+    return tuple(partes[:2]), cabeceras, cuerpo
+
+
+async def _escribir_respuesta(escritor, estado, datos, mantener=True):
+    cuerpo = json.dumps(datos, ensure_ascii=False).encode("utf-8")
+    escritor.write(
+        f"HTTP/1.1 {estado} {_ESTADOS_HTTP.get(estado, '')}\r\n"
+        f"Content-Type: application/json; charset=utf-8\r\n"
+        f"Content-Length: {len(cuerpo)}\r\n"
+        f"Connection: {'keep-alive' if mantener else 'close'}\r\n\r\n".encode("latin-1") + cuerpo
+    )
+    await escritor.drain()
+
+
+# ————— Cliente de prueba (loopback) —————
+
+class ClienteInferencia:
+    """
+    Cliente mínimo sobre una conexión keep-alive. Sirve para pruebas y para
+    el benchmark de loopback; un cliente real solo necesita HTTP.
+    """
+
+    def __init__(self, host, puerto):
+        self.host = host
+        self.puerto = puerto
+        self.sesion = None
+        self._lector = None
+        self._escritor = None
+
+    async def conectar(self):
+        self._lector, self._escritor = await asyncio.open_connection(self.host, self.puerto)
+
+    async def cerrar(self):
+        if self._escritor is not None:
+            self._escritor.close()
+            await self._escritor.wait_closed()
+            self._escritor = None
+
+    async def pedir(self, metodo, ruta, cuerpo=b"", tipo="application/json", cabeceras=None):
+        extra = "".join(f"{k}: {v}\r\n" for k, v in (cabeceras or {}).items())
+        self._escritor.write(
+            f"{metodo} {ruta} HTTP/1.1\r\nHost: {self.host}\r\n"
+            f"Content-Type: {tipo}\r\nContent-Length: {len(cuerpo)}\r\n{extra}\r\n".encode("latin-1") + cuerpo
+        )
+        await self._escritor.drain()
+        mensaje = await _leer_mensaje(self._lector)
+        if mensaje is None:
+            raise ConnectionError("El servidor cerró la conexión")
+        (_, estado), _, cuerpo = mensaje
+        return int(estado), json.loads(cuerpo)
+
+    async def crear_sesion(self, ejercicio=1, lado="izq", reps=10, series=3):
+        cuerpo = json.dumps({"ejercicio": ejercicio, "lado": lado, "reps": reps, "series": series}).encode()
+        estado, datos = await self.pedir("POST", "/sesiones", cuerpo)
+        if estado != 201:
+            raise RuntimeError(datos.get("error"))
+        self.sesion = datos["sesion"]
+        return datos
+
+    async def enviar_frame(self, jpeg, t=None):
+        cabeceras = {"X-Timestamp": repr(t)} if t is not None else None
+        return await self.pedir("POST", f"/sesiones/{self.sesion}/frames", jpeg, "image/jpeg", cabeceras)
+
+
+def frames_jpeg(video=None, frames=300, ancho=640, alto=480, calidad=80):
+    """
+    Frames JPEG para el loopback: de 'video' si se indica, si no la figura
+    sintética de benchmark.py.
+    """
+    if video:
+        cap = cv2.VideoCapture(video)
+        origen = []
+        while len(origen) < frames:
+            ret, frame = cap.read()
+            if not ret:
+                break
+            origen.append(frame)
+        cap.release()
+        if not origen:
+            raise RuntimeError(f"No se pudo leer {video}")
+    else:
+        from benchmark import frames_sinteticos
+        origen = frames_sinteticos(ancho, alto, frames)
+    parametros = [cv2.IMWRITE_JPEG_QUALITY, calidad]
+    return [cv2.imencode(".jpg", frame, parametros)[1].tobytes() for frame in origen]
+
+
+async def _cliente_loopback(host, puerto, jpegs, fps, ejercicio, lado):
+    cliente = ClienteInferencia(host, puerto)
+    await cliente.conectar()
+    await cliente.crear_sesion(ejercicio, lado)
+    viajes, servidor, descartados = [], [], 0
+    periodo = 1.0 / fps if fps else 0.0
+    inicio = time.perf_counter()
+    try:
+        for i, jpeg in enumerate(jpegs):
+            if periodo:
+                espera = inicio + i * periodo - time.perf_counter()
+                if espera > 0:
+                    await asyncio.sleep(espera)
+            t0 = time.perf_counter()
+            estado, datos = await cliente.enviar_frame(jpeg, t=i * (periodo or 1 / 30.0))
+            viajes.append(time.perf_counter() - t0)
+            if estado != 200:
+                raise RuntimeError(datos.get("error"))
+            if datos["descartado"]:
+                descartados += 1
+            else:
+                servidor.append(datos["latencia_ms"]["total"] / 1000.0)
+        _, resumen = await cliente.pedir("DELETE", f"/sesiones/{cliente.sesion}")
+    finally:
+        await cliente.cerrar()
+    return viajes, servidor, descartados, resumen
+
+
+async def benchmark_loopback(clientes=4, frames=300, fps=30.0, procesos=None, max_lote=8,
+                             video=None, ejercicio=1, lado="izq", resolucion=480):
+    """
+    Levanta el servidor en 127.0.0.1 y 'clientes' clientes concurrentes que
+    envían 'frames' JPEG cada uno a 'fps' (0 = tan rápido como responda).
+    Devuelve latencias de ida y vuelta y del servidor, rendimiento total y
+    las estadísticas del servidor (incluye el tamaño medio de lote).
+    """
+    from benchmark import resumir_tiempos
+
+    jpegs = frames_jpeg(video, frames)
+    servidor = ServidorInferencia("127.0.0.1", 0, procesos=procesos, max_lote=max_lote,
+                                  resolucion=resolucion, timeout=60.0)
+    await servidor.iniciar()
+    try:
+        # El primer frame de cada proceso paga la carga del modelo: no se mide
+        calentamiento = ClienteInferencia("127.0.0.1", servidor.puerto)
+        await calentamiento.conectar()
+        for _ in range(servidor.procesos):
+            await calentamiento.crear_sesion(ejercicio, lado)
+            await calentamiento.enviar_frame(jpegs[0])
+        await calentamiento.cerrar()
+        for id_sesion in list(servidor.sesiones):
+            servidor._cerrar_sesion(id_sesion)
+
+        t0 = time.perf_counter()
+        resultados = await asyncio.gather(*[
+            _cliente_loopback("127.0.0.1", servidor.puerto, jpegs, fps, ejercicio, lado)
+            for _ in range(clientes)
+        ])
+        duracion = time.perf_counter() - t0
+        estadisticas = servidor.estadisticas()
+    finally:
+        await servidor.detener()
+
+    viajes = np.concatenate([r[0] for r in resultados])
+    en_servidor = np.concatenate([r[1] for r in resultados])
+    respondidos = sum(len(r[1]) for r in resultados)
+    return {
+        "clientes": clientes,
+        "frames_por_cliente": len(jpegs),
+        "fps_objetivo": fps,
+        "duracion_s": duracion,
+        "frames_procesados_por_segundo": respondidos / duracion if duracion > 0 else 0.0,
+        "descartados": sum(r[2] for r in resultados),
+        "ida_y_vuelta": resumir_tiempos(viajes),
+        "servidor": resumir_tiempos(en_servidor),
+        "reps_por_cliente": [r[3]["reps_totales"] for r in resultados],
+        "estadisticas_servidor": estadisticas,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Servicio de inferencia de pose en red local.")
+    parser.add_argument("--host", default="0.0.0.0", help="Dirección de escucha")
+    parser.add_argument("--puerto", type=int, default=8765, help="Puerto HTTP")
+    parser.add_argument("--procesos", type=int, default=None, help="Procesos de inferencia (por defecto, núcleos)")
+    parser.add_argument("--max-lote", type=int, default=8, help="Frames máximos por mensaje a un proceso")
+    parser.add_argument("--resolucion", type=int, default=480, help="Lado mayor del frame para la inferencia")
+    parser.add_argument("--loopback", action="store_true", help="Benchmark con clientes locales y salir")
+    parser.add_argument("--clientes", type=int, default=4, help="Clientes del loopback")
+    parser.add_argument("--frames", type=int, default=300, help="Frames por cliente del loopback")
+    parser.add_argument("--fps", type=float, default=30.0, help="FPS de cada cliente del loopback (0 = sin límite)")
+    parser.add_argument("--video", default=None, help="Video para el loopback (por defecto uno sintético)")
+    args = parser.parse_args(argv)
+
+    if args.loopback:
+        resultado = asyncio.run(benchmark_loopback(
+            args.clientes, args.frames, args.fps, args.procesos, args.max_lote, args.video,
+            resolucion=args.resolucion
+        ))
+        print(json.dumps(resultado, indent=2, ensure_ascii=False))
+        return
+
+    servidor = ServidorInferencia(args.host, args.puerto, procesos=args.procesos,
+                                  max_lote=args.max_lote, resolucion=args.resolucion)
+    try:
+        asyncio.run(servidor.servir())
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()